@@ -15,7 +15,8 @@ class AST(Visitor):
         tree = tree or Tree(f"[bold white]{type(node).__name__}[/bold white]")
 
         if node is not None:
-            for field_name, field_value in node.__dict__.items():
+            for field_name in node._fields:
+                field_value = getattr(node, field_name)
                 if isinstance(field_value, list):
                     for item in field_value:
                         self.visualize_tree(item, tree.add(f"[blue]{field_name}[/blue]"))
@@ -222,8 +223,9 @@ class AST(Visitor):
 
         dot.node(str(current_node_id), label=type(node).__name__)
 
-        if hasattr(node, '__dict__'):
-            for field_name, field_value in node.__dict__.items():
+        if isinstance(node, Node):
+            for field_name in node._fields:
+                field_value = getattr(node, field_name)
                 if isinstance(field_value, list):
                     for item in field_value:
                         self._add_nodes_edges(dot, item)
@@ -0,0 +1,141 @@
+# arrays.py
+'''
+Arreglos de PL0
+===============
+Almacenamiento
+--------------
+Un int[N] es un array('q') y un float[N] un array('d'): N valores de 8
+bytes contiguos en lugar de una lista de N referencias a objetos de Python.
+Cada función guarda un prototipo en cero de cada arreglo local y en cada
+llamada lo copia (prototype(...)[:], una copia de memoria).  Un arreglo
+pasado como argumento (mrgsort(nums, p, q)) viaja como referencia al mismo
+array: no se copia.
+
+Si NumPy está instalado, view() devuelve un numpy.ndarray sobre el mismo
+buffer, también sin copiar, para las operaciones vectoriales.  Los accesos
+elemento a elemento siguen usando el array, que es más rápido que indexar un
+ndarray desde Python.
+
+Un int[N] guarda enteros de 64 bits: guardar un valor mayor produce un
+OverflowError, que los motores informan como error de ejecución.
+
+Verificación de índices
+-----------------------
+El array ya rechaza los índices >= N, pero como una lista acepta los
+negativos (a[-1] es el último elemento).  Los accesos hacen por eso una
+verificación explícita de índice negativo salvo cuando el índice es
+demostrablemente >= 0: nonnegative() calcula, sin tener en cuenta el flujo,
+los registros y variables locales de una función cuyas definiciones son
+todas constantes no negativas, sumas, productos y cocientes de no negativos
+o comparaciones.  Por ejemplo i en
+
+    i := 0;
+    while i < n do begin a[i] := 0; i := i + 1 end
+
+Los parámetros (pueden llegar negativos) y las variables que escribe una
+función anidada no se consideran.
+'''
+from array import array
+
+from intcode import Register
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TYPECODES = {'int': 'q', 'float': 'd'}
+
+# Operaciones cuyo resultado es >= 0 si sus operandos lo son
+_NONNEG_OPS = {'MOVI', 'ADDI', 'MULI', 'DIVI'}
+# Operaciones que siempre dan 0 o 1
+_BOOL_OPS = {'LT', 'LTE', 'GT', 'GTE', 'EQ', 'NEQ', 'AND', 'OR', 'NOT'}
+
+
+def prototype(type, size):
+    '''Arreglo de size elementos en cero para una variable de tipo type'''
+    return array(TYPECODES[type], bytes(8 * size))
+
+
+def view(arr):
+    '''ndarray de NumPy sobre el buffer de arr, o None sin NumPy'''
+    if numpy is None:
+        return None
+    return numpy.frombuffer(arr, dtype=numpy.int64 if arr.typecode == 'q' else numpy.float64)
+
+
+def nonnegative(func, functions):
+    '''
+    Registros y variables escalares de func (IRFunction) que nunca son
+    negativos.  functions (dict nombre -> IRFunction) permite ver qué
+    variables escriben las funciones anidadas.
+    '''
+    params = {v.name for v in func.params}
+    scalars = {v.name for v in func.locals if v.size is None}
+    for other in functions.values():
+        if other.name.startswith(func.name + '.'):
+            for instr in other.code:
+                for name in instr.defs():
+                    if isinstance(name, str) and other.lookup(name) is None:
+                        scalars.discard(name)
+
+    defs = {}
+    for instr in func.code:
+        for name in instr.defs():
+            defs.setdefault(name, []).append(instr)
+    result = {name for name in defs
+              if isinstance(name, Register) or (name in scalars and name not in params)}
+
+    def known(op):
+        if isinstance(op, (Register, str)):
+            return op in result
+        return type(op) is int and op >= 0
+
+    def holds(instr):
+        if instr.op in _BOOL_OPS:
+            return True
+        return instr.op in _NONNEG_OPS and all(known(op) for op in instr.args[:-1])
+
+    changed = True
+    while changed:
+        changed = False
+        for name in list(result):
+            if not all(holds(instr) for instr in defs[name]):
+                result.discard(name)
+                changed = True
+    return result
+
+
+def checked(index, safe):
+    '''True si un acceso con index necesita la verificación de índice negativo'''
+    if isinstance(index, (Register, str)):
+        return index not in safe
+    return not (type(index) is int and index >= 0)
+
+
+def main(argv):
+    if len(argv) != 2:
+        print(f"Usage: python {argv[0]} filename")
+        exit(1)
+
+    from plex import Lexer
+    from pparser import Parser
+    from intcode import IntermediateCodeGenerator
+    from cleanup import cleanup_program
+
+    ast = Parser().parse(Lexer().tokenize_file(argv[1]))
+    gen = IntermediateCodeGenerator()
+    gen.generate_code(ast)
+    cleanup_program(gen.functions)
+
+    print(f'{"function":<24} {"accesses":>8} {"checked":>8}')
+    for name, func in gen.functions.items():
+        safe = nonnegative(func, gen.functions)
+        accesses = [instr.args[1] if instr.op.startswith('ALOAD') else instr.args[2]
+                    for instr in func.code if instr.op.startswith(('ALOAD', 'ASTORE'))]
+        print(f'{name:<24} {len(accesses):>8} {sum(checked(i, safe) for i in accesses):>8}')
+
+
+if __name__ == '__main__':
+    import sys
+    main(sys.argv)
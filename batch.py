@@ -0,0 +1,218 @@
+# batch.py
+'''
+usage: batch.py [-h] [-j JOBS] [--json OUT] [--chunksize N] paths [paths ...]
+
+Compilación por lotes de programas PL0.
+
+Recibe archivos, directorios (se recorren buscando *.pl0) o patrones glob y
+reparte lex -> parse -> check -> fold -> resolve -> IR entre un
+ProcessPoolExecutor.  Cada proceso crea una sola vez su Lexer y su Parser y
+los reutiliza para todos los archivos que le toquen.  Los resultados vuelven
+por archivo como FileResult y al final se informa el rendimiento total en
+archivos/s y líneas/s.
+'''
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional
+import argparse
+import glob
+import io
+import json
+import os
+import sys
+import time
+
+from plex    import Lexer
+from pparser import Parser
+from checker import Checker, Symtab
+from fold    import fold
+from resolve import resolve
+from intcode import IntermediateCodeGenerator
+
+
+STAGES = ('lex', 'parse', 'check', 'fold', 'resolve', 'ir')
+
+
+@dataclass
+class FileResult:
+    filename: str
+    lines: int = 0
+    tokens: int = 0
+    instructions: int = 0
+    ok: bool = False
+    stage: Optional[str] = None          # Etapa en la que falló (None si todo fue bien)
+    diagnostics: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+
+# Instancias por proceso (ver _init_worker)
+_lexer = None
+_parser = None
+
+
+def _init_worker():
+    global _lexer, _parser
+    _lexer = Lexer()
+    _parser = Parser()
+
+
+def compile_file(filename):
+    '''
+    Ejecuta todas las etapas sobre un archivo con el Lexer/Parser del proceso
+    '''
+    if _parser is None:
+        _init_worker()
+
+    result = FileResult(filename)
+    start = time.perf_counter()
+    out = io.StringIO()
+    stage = 'lex'
+    try:
+        with open(filename, encoding='utf-8') as f:
+            text = f.read()
+        result.lines = text.count('\n') + 1
+
+        with redirect_stdout(out):
+            tokens = list(_lexer.tokenize(text))
+            result.tokens = len(tokens)
+
+            stage = 'parse'
+            # sly guarda posiciones por id(); no deben acumularse entre archivos
+            _parser._line_positions = {}
+            _parser._index_positions = {}
+            ast = _parser.parse(iter(tokens))
+            if ast is None:
+                raise SyntaxError('el programa no se pudo analizar')
+
+            stage = 'check'
+            errors = Checker().check(ast, Symtab())
+            if errors:
+                result.diagnostics.extend(message for message, _ in errors)
+                raise Symtab.SemanticError(f'{len(errors)} errores')
+
+            stage = 'fold'
+            fold(ast)
+
+            stage = 'resolve'
+            resolve(ast)
+
+            stage = 'ir'
+            code = IntermediateCodeGenerator().generate_code(ast)
+            result.instructions = len(code)
+
+        result.ok = True
+    except Exception as e:
+        result.stage = stage
+        result.diagnostics.append(f'{type(e).__name__}: {e}')
+
+    # Los mensajes del lexer y del parser se imprimen; se conservan solo los de error
+    messages = [line for line in out.getvalue().splitlines() if 'error' in line.lower()]
+    result.diagnostics[:0] = messages
+    if messages and result.ok:
+        result.ok = False
+        result.stage = 'lex' if any(m.startswith('Lexer error') for m in messages) else 'parse'
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def expand_paths(paths):
+    '''
+    Convierte archivos, directorios y globs en una lista ordenada de archivos .pl0
+    '''
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, '**', '*.pl0'), recursive=True))
+        elif glob.has_magic(path):
+            files.extend(glob.glob(path, recursive=True))
+        else:
+            files.append(path)
+    return sorted(set(files))
+
+
+def compile_many(files, jobs=None, chunksize=8):
+    '''
+    Compila files en paralelo.  Devuelve (resultados, segundos)
+    '''
+    start = time.perf_counter()
+    if jobs == 1:
+        results = [compile_file(f) for f in files]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as pool:
+            results = list(pool.map(compile_file, files, chunksize=chunksize))
+    return results, time.perf_counter() - start
+
+
+def summary(results, elapsed):
+    nfiles = len(results)
+    nlines = sum(r.lines for r in results)
+    return {
+        'files': nfiles,
+        'ok': sum(r.ok for r in results),
+        'failed': {stage: sum(r.stage == stage for r in results) for stage in STAGES},
+        'lines': nlines,
+        'seconds': elapsed,
+        'files_per_sec': nfiles / elapsed if elapsed else 0.0,
+        'lines_per_sec': nlines / elapsed if elapsed else 0.0,
+    }
+
+
+def parse_args(argv=None):
+    cli = argparse.ArgumentParser(
+        prog='batch.py',
+        description='Batch compiler for PL0 programs')
+
+    cli.add_argument(
+        'paths',
+        nargs='+',
+        help='PL0 files, directories or glob patterns')
+
+    cli.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=None,
+        help='Number of worker processes (default: CPU count)')
+
+    cli.add_argument(
+        '--chunksize',
+        type=int,
+        default=8,
+        help='Files sent to a worker at a time')
+
+    cli.add_argument(
+        '--json',
+        metavar='OUT',
+        help='Write per-file results and the summary as JSON')
+
+    return cli.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    files = expand_paths(args.paths)
+    if not files:
+        print('No .pl0 files found')
+        return 1
+
+    results, elapsed = compile_many(files, args.jobs, args.chunksize)
+
+    for r in results:
+        status = 'ok' if r.ok else f'FAIL ({r.stage})'
+        print(f'{r.filename}: {status}')
+        for d in r.diagnostics:
+            print(f'    {d}')
+
+    stats = summary(results, elapsed)
+    print(f"{stats['files']} files, {stats['ok']} ok, {stats['lines']} lines in {elapsed:.3f}s "
+          f"({stats['files_per_sec']:.1f} files/sec, {stats['lines_per_sec']:.1f} lines/sec)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'results': [asdict(r) for r in results], 'summary': stats}, f, indent=2)
+
+    return 0 if stats['ok'] == stats['files'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
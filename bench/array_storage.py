@@ -0,0 +1,187 @@
+# bench/array_storage.py
+'''
+Almacenamiento de los arreglos de PL0 (arrays.py): array('q') frente a la
+lista de objetos de Python que se usaba antes.  Para cada tamaño N se
+ordena un int[N] llenado con un generador congruencial:
+
+  shell   shellsort in situ (accesos a arreglo en bucles anidados)
+  merge   mergesort recursivo; el arreglo se pasa por referencia y cada
+          merge crea un int[N] temporal
+
+Se compila con vm.compile_ast(ast, True) y se corre la VM con los
+prototipos de arrays.prototype() y con listas del mismo contenido.  Se
+informa el mejor tiempo y el pico de memoria (tracemalloc) de la ejecución.
+
+usage: python bench/array_storage.py [-n REPEAT] [sizes ...]   (por defecto 1000 10000)
+'''
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from plex import Lexer
+from pparser import Parser
+from vm import VM, compile_ast
+
+# Llenado y verificación comunes; {sort} es la llamada al ordenamiento.  and y
+# or de PL0 evalúan los dos operandos: los bucles no dependen del corte
+MAIN = '''
+fun main()
+  a : int[{n}];
+  i : int;
+  x : int;
+  bad : int;
+begin
+  i := 0;
+  x := 12345;
+  while i < {n} do begin
+    x := (x * 1103515245 + 12345) - (x * 1103515245 + 12345) / 2147483648 * 2147483648;
+    a[i] := x;
+    i := i + 1
+  end;
+  {sort};
+  bad := 0;
+  i := 1;
+  while i < {n} do begin
+    if a[i - 1] > a[i] then bad := bad + 1;
+    i := i + 1
+  end;
+  write(bad);
+  write(a[0]);
+  write(a[{n} - 1])
+end
+'''
+
+PROGRAMS = {
+    'shell': '''
+fun shellsort(a : int[{n}], n : int)
+  gap : int;
+  i : int;
+  j : int;
+  t : int;
+begin
+  gap := n / 2;
+  while gap > 0 do begin
+    i := gap;
+    while i < n do begin
+      t := a[i];
+      j := i;
+      while j >= gap do begin
+        if a[j - gap] > t then begin
+          a[j] := a[j - gap];
+          j := j - gap
+        end else
+          break
+      end;
+      a[j] := t;
+      i := i + 1
+    end;
+    gap := gap / 2
+  end
+end
+''' + MAIN.replace('{sort}', 'shellsort(a, {n})'),
+    'merge': '''
+fun merge(a : int[{n}], p : int, q : int, r : int)
+  temp : int[{n}];
+  i : int;
+  j : int;
+  k : int;
+begin
+  i := p;
+  j := q;
+  k := 0;
+  while i < q and j < r do begin
+    if a[i] <= a[j] then begin
+      temp[k] := a[i];
+      i := i + 1
+    end else begin
+      temp[k] := a[j];
+      j := j + 1
+    end;
+    k := k + 1
+  end;
+  while i < q do begin
+    temp[k] := a[i];
+    i := i + 1;
+    k := k + 1
+  end;
+  while j < r do begin
+    temp[k] := a[j];
+    j := j + 1;
+    k := k + 1
+  end;
+  i := 0;
+  while i < k do begin
+    a[p + i] := temp[i];
+    i := i + 1
+  end
+end
+
+fun mrgsort(a : int[{n}], p : int, r : int)
+  q : int;
+begin
+  if r - p > 1 then begin
+    q := (p + r) / 2;
+    mrgsort(a, p, q);
+    mrgsort(a, q, r);
+    merge(a, p, q, r)
+  end
+end
+''' + MAIN.replace('{sort}', 'mrgsort(a, 0, {n})'),
+}
+
+
+def compile_text(text):
+    with redirect_stdout(io.StringIO()):
+        ast = Parser().parse(Lexer().tokenize(text))
+    return compile_ast(ast, True)
+
+
+def as_lists(program):
+    '''Copia de los prototipos de program como listas (la representación anterior)'''
+    for func in program.values():
+        func.arrays = [(slot, list(proto)) for slot, proto in func.arrays]
+
+
+def measure(program, repeat):
+    '''(salida, mejor tiempo, pico de memoria en bytes)'''
+    best = float('inf')
+    for _ in range(repeat):
+        out = io.StringIO()
+        start = time.perf_counter()
+        VM(stdout=out).run(program)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    VM(stdout=io.StringIO()).run(program)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return out.getvalue(), best, peak
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description='Typed array storage benchmark')
+    cli.add_argument('sizes', nargs='*', type=int, default=[1000, 10000])
+    cli.add_argument('-n', '--repeat', type=int, default=1)
+    args = cli.parse_args(argv)
+
+    print(f'{"program":<16} {"array ms":>9} {"list ms":>9} {"speedup":>8} '
+          f'{"array KiB":>10} {"list KiB":>10} {"ratio":>6}')
+    for size in args.sizes:
+        for name, text in PROGRAMS.items():
+            program = compile_text(text.replace('{n}', str(size)))
+            out_a, t_a, m_a = measure(program, args.repeat)
+            as_lists(program)
+            out_l, t_l, m_l = measure(program, args.repeat)
+            assert out_a == out_l and out_a.startswith('0'), name
+            print(f'{name + " " + str(size):<16} {t_a * 1e3:>9.1f} {t_l * 1e3:>9.1f} {t_l / t_a:>7.2f}x '
+                  f'{m_a / 1024:>10.1f} {m_l / 1024:>10.1f} {m_l / m_a:>5.1f}x')
+
+
+if __name__ == '__main__':
+    main()
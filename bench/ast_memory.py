@@ -0,0 +1,107 @@
+# bench/ast_memory.py
+'''
+Memoria y número de asignaciones del AST: nodos con __slots__ (modelo.py)
+frente a la representación anterior con @dataclass y __dict__ por instancia.
+
+Cada programa se analiza una vez; luego el árbol se copia dos veces, una con
+las clases actuales y otra con gemelas @dataclass sin slots generadas a partir
+de _fields, y se mide cada copia con tracemalloc y sys.getallocatedblocks().
+
+usage: python bench/ast_memory.py [files ...]   (por defecto demo.pl0 y test2/, test3/)
+'''
+from dataclasses import make_dataclass
+import argparse
+import gc
+import glob
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.setrecursionlimit(50000)   # test2/bigexpr.pl0 es muy profundo
+
+import modelo
+from plex import Lexer
+from pparser import Parser
+
+
+def legacy_classes():
+    '''
+    Gemelas sin slots de todas las clases de nodos
+    '''
+    classes = {}
+    for name, cls in vars(modelo).items():
+        if isinstance(cls, type) and issubclass(cls, modelo.Node):
+            classes[cls] = make_dataclass(name, [(f, object) for f in cls._fields])
+    return classes
+
+
+def copy_tree(node, classes):
+    if isinstance(node, list):
+        return [copy_tree(item, classes) for item in node]
+    if isinstance(node, modelo.Node):
+        cls = classes.get(type(node), type(node))
+        return cls(*(copy_tree(getattr(node, f), classes) for f in node._fields))
+    return node
+
+
+def count_nodes(node):
+    if isinstance(node, list):
+        return sum(count_nodes(item) for item in node)
+    if isinstance(node, modelo.Node):
+        return 1 + sum(count_nodes(getattr(node, f)) for f in node._fields)
+    return 0
+
+
+def measure(ast, classes):
+    gc.collect()
+    gc.disable()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    tree = copy_tree(ast, classes)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sys.getallocatedblocks() - blocks
+    gc.enable()
+    del tree
+    return size, blocks
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description='AST memory benchmark (slots vs __dict__)')
+    cli.add_argument('files', nargs='*')
+    args = cli.parse_args(argv)
+
+    files = args.files or [os.path.join(ROOT, 'demo.pl0')] + sorted(
+        glob.glob(os.path.join(ROOT, 'test2', '*.pl0')) + glob.glob(os.path.join(ROOT, 'test3', '*.pl0')))
+
+    legacy = legacy_classes()
+    slotted = {}
+    totals = [0, 0, 0, 0, 0]
+
+    print(f"{'file':<28s} {'nodes':>7s} {'dict bytes':>11s} {'slots bytes':>11s} "
+          f"{'dict blocks':>11s} {'slots blocks':>12s}")
+    for filename in files:
+        with open(filename, encoding='utf-8') as f:
+            text = f.read()
+        ast = Parser().parse(Lexer().tokenize(text))
+        if ast is None:
+            continue
+        nodes = count_nodes(ast)
+        old_size, old_blocks = measure(ast, legacy)
+        new_size, new_blocks = measure(ast, slotted)
+        for i, v in enumerate((nodes, old_size, new_size, old_blocks, new_blocks)):
+            totals[i] += v
+        print(f'{os.path.relpath(filename, ROOT):<28s} {nodes:7d} {old_size:11d} {new_size:11d} '
+              f'{old_blocks:11d} {new_blocks:12d}')
+
+    nodes, old_size, new_size, old_blocks, new_blocks = totals
+    print(f"{'TOTAL':<28s} {nodes:7d} {old_size:11d} {new_size:11d} {old_blocks:11d} {new_blocks:12d}")
+    if old_size:
+        print(f'bytes: {100 * (1 - new_size / old_size):.1f}% menos, '
+              f'asignaciones: {100 * (1 - new_blocks / max(old_blocks, 1)):.1f}% menos')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# bench/check_errors.py
+'''
+Tiempo del análisis semántico (checker.py) sobre test3/errors/.  Para cada
+archivo se mide el análisis sintáctico y una pasada de Checker, que informa
+todos los errores.  Como referencia se estima lo que costaba obtener los
+mismos diagnósticos cuando el Checker se detenía en el primero: una
+ejecución completa (parse + check) por error.
+
+usage: python bench/check_errors.py [-n REPEAT] [files ...]   (por defecto test3/errors/*.pl0)
+'''
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from plex import Lexer
+from pparser import Parser
+from checker import Checker, Symtab
+
+
+def best(func, repeat):
+    '''(resultado, mejor tiempo) de repeat llamadas a func'''
+    elapsed = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return result, elapsed
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description='Semantic checker benchmark')
+    cli.add_argument('files', nargs='*')
+    cli.add_argument('-n', '--repeat', type=int, default=20)
+    args = cli.parse_args(argv)
+
+    files = args.files or sorted(glob.glob(os.path.join(ROOT, 'test3', 'errors', '*.pl0')))
+    lexer, parser = Lexer(), Parser()
+
+    def parse(text):
+        with redirect_stdout(io.StringIO()):
+            return parser.parse(lexer.tokenize(text))
+
+    print(f'{"file":<32} {"errors":>6} {"parse ms":>9} {"check ms":>9} {"1 pass ms":>10} {"1 per error ms":>15}')
+    total_pass = total_rerun = 0.0
+    for filename in files:
+        with open(filename, encoding='utf-8') as f:
+            text = f.read()
+        ast, t_parse = best(lambda: parse(text), args.repeat)
+        errors, t_check = best(lambda: Checker().check(ast, Symtab()), args.repeat)
+        one_pass = t_parse + t_check
+        rerun = one_pass * max(len(errors), 1)
+        total_pass += one_pass
+        total_rerun += rerun
+        print(f'{os.path.relpath(filename, ROOT):<32} {len(errors):>6} {t_parse * 1e3:>9.3f} '
+              f'{t_check * 1e3:>9.3f} {one_pass * 1e3:>10.3f} {rerun * 1e3:>15.3f}')
+    print(f'{"total":<32} {"":>6} {"":>9} {"":>9} {total_pass * 1e3:>10.3f} {total_rerun * 1e3:>15.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# bench/constant_folding.py
+'''
+Efecto de fold.py sobre los programas de prueba: nodos del AST e
+instrucciones de código intermedio antes y después del plegado.
+
+Solo se cuentan instrucciones de los archivos cuyo código intermedio se
+puede generar (los de test1/ no son programas y varios de test2/ usan
+construcciones que el generador no acepta).
+
+usage: python bench/constant_folding.py [files ...]   (por defecto test1/ test2/ test3/ y demo.pl0)
+'''
+import argparse
+import copy
+import glob
+import io
+import os
+import sys
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.setrecursionlimit(50000)   # test2/bigexpr.pl0 es muy profundo
+
+from plex import Lexer
+from pparser import Parser
+from intcode import IntermediateCodeGenerator
+from fold import fold, count_nodes
+
+
+def instructions(ast):
+    try:
+        gen = IntermediateCodeGenerator()
+        gen.generate_code(ast)
+    except Exception:
+        return None
+    return sum(len(func.code) for func in gen.functions.values())
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description='Constant folding report')
+    cli.add_argument('files', nargs='*')
+    args = cli.parse_args(argv)
+
+    files = args.files or (sorted(glob.glob(os.path.join(ROOT, 'test[123]', '**', '*.pl0'), recursive=True))
+                           + [os.path.join(ROOT, 'demo.pl0')])
+    totals = dict(files=0, nodes=0, nodes_removed=0, folded=0, simplified=0, ir=0, ir_removed=0)
+
+    print(f'{"file":<32} {"nodes":>7} {"-nodes":>7} {"folded":>7} {"simpl":>6} {"instr":>7} {"-instr":>7}')
+    for filename in files:
+        with open(filename, encoding='utf-8') as f:
+            text = f.read()
+        with redirect_stdout(io.StringIO()):
+            ast = Parser().parse(Lexer().tokenize(text))
+        if ast is None:
+            continue
+
+        before = count_nodes(ast)
+        ir_before = instructions(copy.deepcopy(ast))
+        folder = fold(ast)
+        removed = before - count_nodes(ast)
+        ir_after = instructions(ast) if ir_before is not None else None
+
+        totals['files'] += 1
+        totals['nodes'] += before
+        totals['nodes_removed'] += removed
+        totals['folded'] += folder.folded
+        totals['simplified'] += folder.simplified
+        if ir_before is not None and ir_after is not None:
+            totals['ir'] += ir_before
+            totals['ir_removed'] += ir_before - ir_after
+            ir = f'{ir_before:>7} {ir_before - ir_after:>7}'
+        else:
+            ir = f'{"-":>7} {"-":>7}'
+        if removed or folder.folded or folder.simplified:
+            print(f'{os.path.relpath(filename, ROOT):<32} {before:>7} {removed:>7} '
+                  f'{folder.folded:>7} {folder.simplified:>6} {ir}')
+
+    t = totals
+    print(f'{t["files"]} files: {t["nodes_removed"]} of {t["nodes"]} AST nodes removed '
+          f'({t["folded"]} folded, {t["simplified"]} simplified); '
+          f'{t["ir_removed"]} of {t["ir"]} IR instructions removed')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# bench/dataflow_scaling.py
+'''
+Escalamiento del CFG y de los análisis de dataflow.py con el número de
+bloques básicos: una función con N if/while seguidos (unos 3 bloques cada
+uno) y, además, test3/isprime.pl0 y test3/mergesort.pl0.
+
+Para cada análisis se informa el tiempo por bloque y cuántas veces la lista
+de trabajo procesó cada bloque en promedio; si ambos quedan constantes al
+crecer N, el costo es lineal.
+
+usage: python bench/dataflow_scaling.py [-n REPEAT] [sizes ...]   (por defecto 100 1000 5000)
+'''
+import argparse
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from plex import Lexer
+from pparser import Parser
+from intcode import IntermediateCodeGenerator
+from dataflow import CFG, Liveness, ReachingDefinitions, AvailableExpressions
+
+ANALYSES = [Liveness, ReachingDefinitions, AvailableExpressions]
+
+
+def branches(n):
+    stmts = []
+    for i in range(n):
+        if i % 2:
+            stmts.append(f'  while x < {i} do x := x + y * 2')
+        else:
+            stmts.append(f'  if x > y * 2 then y := y + {i} else x := x - 1')
+    body = ';\n'.join(stmts)
+    return f'fun main()\n  x : int;\n  y : int;\nbegin\n  read(x);\n  read(y);\n{body};\n  write(x + y)\nend\n'
+
+
+def functions(text):
+    with redirect_stdout(io.StringIO()):
+        ast = Parser().parse(Lexer().tokenize(text))
+    gen = IntermediateCodeGenerator()
+    gen.generate_code(ast)
+    return list(gen.functions.values())
+
+
+def measure(funcs, repeat):
+    '''(bloques, {nombre: (segundos, iteraciones)}) sumando todas las funciones'''
+    blocks = 0
+    results = {'cfg': [float('inf'), 0]}
+    results.update({a.__name__: [float('inf'), 0] for a in ANALYSES})
+    for _ in range(repeat):
+        totals = dict.fromkeys(results, 0.0)
+        iterations = dict.fromkeys(results, 0)
+        blocks = 0
+        for func in funcs:
+            start = time.perf_counter()
+            cfg = CFG(func)
+            totals['cfg'] += time.perf_counter() - start
+            blocks += len(cfg)
+            for analysis in ANALYSES:
+                start = time.perf_counter()
+                result = analysis(cfg).solve()
+                totals[analysis.__name__] += time.perf_counter() - start
+                iterations[analysis.__name__] += result.iterations
+        for name in results:
+            results[name] = [min(results[name][0], totals[name]), iterations[name]]
+    return blocks, results
+
+
+def report(title, funcs, repeat):
+    blocks, results = measure(funcs, repeat)
+    print(f'{title}: {blocks} blocks')
+    for name, (seconds, iterations) in results.items():
+        visits = f'{iterations / blocks:5.2f} visits/block' if iterations else ''
+        print(f'  {name:<22} {seconds * 1e3:9.2f} ms {seconds / blocks * 1e6:8.2f} us/block  {visits}')
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description='Dataflow analysis scaling benchmark')
+    cli.add_argument('sizes', nargs='*', type=int, default=[100, 1000, 5000])
+    cli.add_argument('-n', '--repeat', type=int, default=3)
+    args = cli.parse_args(argv)
+
+    for filename in ('test3/isprime.pl0', 'test3/mergesort.pl0'):
+        with open(os.path.join(ROOT, filename), encoding='utf-8') as f:
+            report(filename, functions(f.read()), args.repeat)
+    for n in args.sizes:
+        report(f'{n} branches', functions(branches(n)), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# bench/incremental.py
+'''
+Costo de editar una función en un programa grande con Context en modo
+incremental frente a volver a analizar todo el fuente.
+
+Se genera un programa sintético de ~5000 líneas (funciones de 10 líneas), se
+analiza una vez y luego se modifica el cuerpo de una función del medio.  Se
+miden parse() y parse() + check() tras la edición con incremental=True y con
+incremental=False.
+
+usage: python bench/incremental.py [-l LINES] [-n REPEAT]
+'''
+import argparse
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+import io
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from context import Context
+
+
+FUNCTION = '''fun f{n}(a : int, b : int)
+  c : int;
+begin
+  c := a * {n} + b;
+  while c > 100 do
+    c := c - a;
+  if c < 0 then
+    c := 0 - c;
+  return c + f{m}(a, b)
+end
+
+'''
+
+MAIN = '''fun main()
+begin
+  write(f0(1, 2))
+end
+'''
+
+
+def program(lines):
+    count = max(1, lines // 11)
+    text = ''.join(FUNCTION.format(n=n, m=max(n - 1, 0)) for n in range(count))
+    return text + MAIN, count
+
+
+def edit(source, count, k):
+    '''Cambia la constante de la función del medio (k distingue cada edición)'''
+    n = count // 2
+    old = f'c := a * {n} + b;'
+    return source.replace(old, f'c := a * {n + k + 1} + b;', 1)
+
+
+def measure(incremental, source, count, repeat):
+    context = Context(incremental=incremental)
+    with redirect_stdout(io.StringIO()):
+        context.parse(source)
+        context.check()
+        parse, total = [], []
+        for k in range(repeat):
+            # Se alterna entre dos versiones para que cada parse vea un cambio real
+            text = edit(source, count, k) if k % 2 == 0 else source
+            start = time.perf_counter()
+            context.parse(text)
+            parsed = time.perf_counter()
+            context.check()
+            parse.append(parsed - start)
+            total.append(time.perf_counter() - start)
+    return min(parse), min(total)
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description='Incremental reparse benchmark')
+    cli.add_argument('-l', '--lines', type=int, default=5000)
+    cli.add_argument('-n', '--repeat', type=int, default=5)
+    args = cli.parse_args(argv)
+
+    source, count = program(args.lines)
+    nlines = source.count('\n') + 1
+    full = measure(False, source, count, args.repeat)
+    incr = measure(True, source, count, args.repeat)
+    print(f'{nlines} lines, {count + 1} functions, one function edited')
+    print(f'                  {"full":>10} {"incremental":>12}')
+    for n, label in enumerate(('parse', 'parse+check')):
+        print(f'  {label:<15} {full[n] * 1e3:7.2f} ms {incr[n] * 1e3:9.2f} ms   ({full[n] / incr[n]:.0f}x)')
+
+
+if __name__ == '__main__':
+    main()
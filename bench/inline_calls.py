@@ -0,0 +1,94 @@
+# bench/inline_calls.py
+'''
+Efecto de inline.py: llamadas a funciones que ejecuta la VM (marcos
+creados, main incluido) con y sin la expansión en línea, para test3/ y
+demo.pl0.  El resto de la compilación es la de vm.compile_ast(ast, True).
+
+usage: python bench/inline_calls.py [files ...]   (por defecto test3/ y demo.pl0)
+'''
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from plex import Lexer
+from pparser import Parser
+from intcode import IntermediateCodeGenerator
+from cleanup import cleanup_program
+from inline import inline_program
+from loops import optimize_program
+from regalloc import allocate_program
+from vm import VM, compile_program
+
+# Entrada de los programas que leen
+INPUTS = {
+    'factors.pl0': '360\n',
+    'fib.pl0': '20\n',
+    'gcd.pl0': '1071\n462\n',
+    'isprime.pl0': '7919\n',
+    'simple.pl0': '20\n',
+    'sum.pl0': '999\n',
+}
+
+SKIP = {'mergesort.pl0'}    # print_arr no incrementa i: no termina
+
+
+class CountingVM(VM):
+    calls = 0
+
+    def frame(self, func, link, args):
+        self.calls += 1
+        return super().frame(func, link, args)
+
+
+def run(text, stdin, inline):
+    '''(salida, llamadas, segundos) del programa compilado con o sin inline'''
+    with redirect_stdout(io.StringIO()):
+        ast = Parser().parse(Lexer().tokenize(text))
+    gen = IntermediateCodeGenerator()
+    gen.generate_code(ast)
+    cleanup_program(gen.functions)
+    if inline:
+        inline_program(gen.functions)
+        cleanup_program(gen.functions)
+    optimize_program(gen.functions)
+    cleanup_program(gen.functions)
+    allocate_program(gen.functions)
+    program = compile_program(gen.functions)
+
+    out = io.StringIO()
+    vm = CountingVM(stdin=io.StringIO(stdin), stdout=out)
+    start = time.perf_counter()
+    vm.run(program)
+    return out.getvalue(), vm.calls, time.perf_counter() - start
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description='Inlining call-count benchmark')
+    cli.add_argument('files', nargs='*')
+    args = cli.parse_args(argv)
+
+    files = args.files or (sorted(glob.glob(os.path.join(ROOT, 'test3', '*.pl0')))
+                           + [os.path.join(ROOT, 'demo.pl0')])
+    print(f'{"program":<24} {"calls before":>12} {"calls after":>12} {"ms before":>10} {"ms after":>9}')
+    for filename in files:
+        if os.path.basename(filename) in SKIP:
+            continue
+        with open(filename, encoding='utf-8') as f:
+            text = f.read()
+        stdin = INPUTS.get(os.path.basename(filename), '10\n')
+        out0, calls0, t0 = run(text, stdin, False)
+        out1, calls1, t1 = run(text, stdin, True)
+        assert out0 == out1, filename
+        print(f'{os.path.relpath(filename, ROOT):<24} {calls0:>12} {calls1:>12} '
+              f'{t0 * 1e3:>10.2f} {t1 * 1e3:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
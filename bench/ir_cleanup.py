@@ -0,0 +1,78 @@
+# bench/ir_cleanup.py
+'''
+Efecto de cleanup.py sobre los programas de prueba: instrucciones de código
+intermedio antes y después de la limpieza, por función (--functions) o por
+archivo, y el total.  Con --fold se pliegan las constantes antes de generar
+el código, como hace pl0.py -R.
+
+usage: python bench/ir_cleanup.py [--fold] [--functions] [files ...]   (por defecto test1/ test2/ test3/ y demo.pl0)
+'''
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.setrecursionlimit(50000)   # test2/bigexpr.pl0 es muy profundo
+
+from plex import Lexer
+from pparser import Parser
+from intcode import IntermediateCodeGenerator
+from cleanup import cleanup_program
+from fold import fold
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description='IR cleanup report')
+    cli.add_argument('files', nargs='*')
+    cli.add_argument('--fold', action='store_true', help='fold constants first')
+    cli.add_argument('--functions', action='store_true', help='one line per function')
+    args = cli.parse_args(argv)
+
+    files = args.files or (sorted(glob.glob(os.path.join(ROOT, 'test[123]', '**', '*.pl0'), recursive=True))
+                           + [os.path.join(ROOT, 'demo.pl0')])
+    total_before = total_after = nfiles = 0
+    elapsed = 0.0
+
+    print(f'{"file / function":<40} {"before":>7} {"after":>7} {"removed":>8}')
+    for filename in files:
+        with open(filename, encoding='utf-8') as f:
+            text = f.read()
+        with redirect_stdout(io.StringIO()):
+            ast = Parser().parse(Lexer().tokenize(text))
+        if ast is None:
+            continue
+        if args.fold:
+            fold(ast)
+        gen = IntermediateCodeGenerator()
+        try:
+            gen.generate_code(ast)
+        except Exception:
+            continue
+
+        start = time.perf_counter()
+        stats = cleanup_program(gen.functions)
+        elapsed += time.perf_counter() - start
+
+        name = os.path.relpath(filename, ROOT)
+        before = sum(b for b, _ in stats.values())
+        after = sum(a for _, a in stats.values())
+        nfiles += 1
+        total_before += before
+        total_after += after
+        if args.functions:
+            for func, (b, a) in stats.items():
+                print(f'{name + ":" + func:<40} {b:>7} {a:>7} {b - a:>8}')
+        elif before != after:
+            print(f'{name:<40} {before:>7} {after:>7} {before - after:>8}')
+
+    print(f'{nfiles} files: {total_before - total_after} of {total_before} IR instructions removed '
+          f'({elapsed * 1e3:.1f} ms)')
+
+
+if __name__ == '__main__':
+    main()
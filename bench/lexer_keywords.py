@@ -0,0 +1,142 @@
+# bench/lexer_keywords.py
+'''
+Palabras reservadas en el lexer: una regex por palabra delante de IDENT
+(KeywordRegexLexer, como era plex.Lexer) frente a IDENT + tabla de remapeo
+(plex.Lexer actual).
+
+Se miden tokens/s sobre los archivos de test1/ (concatenados y repetidos) y
+sobre un programa sintético grande.  También se muestra cómo cada versión
+tokeniza identificadores que empiezan con una palabra reservada.
+
+usage: python bench/lexer_keywords.py [-s MB] [-n REPEAT]
+'''
+import argparse
+import glob
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+import sly
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import plex
+from lexer_stream import synthetic
+
+
+class KeywordRegexLexer(sly.Lexer):
+    '''
+    plex.Lexer antes del cambio: cada palabra reservada es una alternativa
+    más de la regex maestra, probada antes que IDENT.
+    '''
+    tokens = plex.Lexer.tokens
+    ignore = ' \t'
+    literals = '"_[]."_'
+
+    FUN = r'fun'
+    BEGIN = r'begin'
+    END = r'end'
+    RETURN = r'return'
+    SKIP = r'skip'
+    ELSE = r'else'
+    BREAK = r'break'
+    NOT = r'not'
+    OR = r'or'
+    AND = r'and'
+    IF = r'if'
+    INT = r'int'
+    FLOAT = r'float'
+    THEN = r'then'
+    WHILE = r'while'
+    DO = r'do\b'
+    PRINT = r'print'
+    WRITE = r'\bwrite\b'
+    READ = r'read'
+    IDENT = r'[A-Za-z][A-Za-z0-9_]*'
+
+    COMMENT = r'/\*(.|\n)*?\*/'
+    LBRACKET = r'\['
+    RBRACKET = r'\]'
+
+    LE = r'<='
+    GE = r'>='
+    NE = r'<>'
+    LT = r'<'
+    GT = r'>'
+    EQ = r'=='
+    DF = r'!='
+    PLUS = r'\+'
+    MINUS = r'-'
+    TIMES = r'\*'
+    DIVIDE = r'/'
+    ASSIGN = r':='
+    LPARENT = r'\('
+    RPARENT = r'\)'
+    COMMA = r','
+    SEMICOLON = r';'
+    COLON = r':'
+
+    def __init__(self):
+        self.lineno = 1
+        self.error_count = 0
+
+    # Las reglas con función son las mismas de plex.Lexer
+    FNUMBER = plex.Lexer.FNUMBER
+    INUMBER = plex.Lexer.INUMBER
+    NEWLINE = plex.Lexer.NEWLINE
+    STRING = plex.Lexer.STRING
+    ESCAPE = plex.Lexer.ESCAPE
+    COMMENT = plex.Lexer.COMMENT
+    error = plex.Lexer.error
+
+
+LEXERS = {
+    'keyword regexes': KeywordRegexLexer,
+    'IDENT + table':   plex.Lexer,
+}
+
+
+def rate(cls, text, repeat):
+    best = float('inf')
+    with redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            lexer = cls()
+            start = time.perf_counter()
+            ntokens = sum(1 for _ in lexer.tokenize(text))
+            best = min(best, time.perf_counter() - start)
+    return ntokens, ntokens / best
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description='Keyword lookup benchmark')
+    cli.add_argument('-s', '--size', type=float, default=2, help='Synthetic input size in MB')
+    cli.add_argument('-n', '--repeat', type=int, default=5)
+    args = cli.parse_args(argv)
+
+    test1 = ''
+    for filename in sorted(glob.glob(os.path.join(ROOT, 'test1', '*.pl0'))):
+        with open(filename, encoding='utf-8') as f:
+            test1 += f.read() + '\n'
+    inputs = {
+        'test1/*.pl0 x50': test1 * 50,
+        f'synthetic {args.size:g} MB': synthetic(int(args.size * 1e6)),
+    }
+
+    for label, text in inputs.items():
+        print(label)
+        base = None
+        for name, cls in LEXERS.items():
+            ntokens, tps = rate(cls, text, args.repeat)
+            base = base or tps
+            print(f'  {name:<16} {ntokens:>9} tokens {tps:>12,.0f} tokens/s  {tps / base:5.2f}x')
+
+    sample = 'ender into print_arr done readx'
+    for name, cls in LEXERS.items():
+        print(f'{name:<16} {sample!r}: {" ".join(t.type for t in cls().tokenize(sample))}')
+
+
+if __name__ == '__main__':
+    main()
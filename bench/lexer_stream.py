@@ -0,0 +1,107 @@
+# bench/lexer_stream.py
+'''
+Tokenización de archivos grandes: file.read() + list(Lexer.tokenize(texto))
+(lo que hacía plex.main) frente a Lexer.tokenize_file(), que lee el archivo
+con mmap por partes y genera los tokens a medida.
+
+Se genera un programa sintético de varios MB y se mide, para cada variante,
+tokens/s (sin tracemalloc) y el pico de memoria (con tracemalloc, en otra
+pasada).
+
+usage: python bench/lexer_stream.py [-s MB] [--chunksize BYTES] [-n REPEAT]
+'''
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from plex import Lexer
+
+
+BLOCK = '''/* función {n}: comentario
+   de dos líneas */
+fun f{n}(a : int, b : float, v : int[10])
+    c : int;
+    d : float;
+begin
+    c := a * {n} + v[c - 1];
+    d := b / 3.25 - float(c);
+    while c >= 0 and not (d <> 1.5) do
+    begin
+        print("iteración {n}\\n");
+        c := c - 1
+    end;
+    if c == 0 then write(c) else skip;
+    return c
+end
+
+'''
+
+
+def synthetic(size):
+    '''Texto PL0 de aproximadamente size caracteres'''
+    parts = []
+    total = n = 0
+    while total < size:
+        block = BLOCK.format(n=n)
+        parts.append(block)
+        total += len(block)
+        n += 1
+    return ''.join(parts)
+
+
+def read_all(filename, chunksize):
+    with open(filename, encoding='utf-8') as f:
+        text = f.read()
+    return len(list(Lexer().tokenize(text)))
+
+
+def streaming(filename, chunksize):
+    return sum(1 for _ in Lexer().tokenize_file(filename, chunksize))
+
+
+VARIANTS = {
+    'read + list(tokenize)': read_all,
+    'tokenize_file (mmap)':  streaming,
+}
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description='Streaming lexer benchmark')
+    cli.add_argument('-s', '--size', type=float, default=8, help='Input size in MB')
+    cli.add_argument('--chunksize', type=int, default=1 << 16)
+    cli.add_argument('-n', '--repeat', type=int, default=3)
+    args = cli.parse_args(argv)
+
+    with tempfile.NamedTemporaryFile('w', suffix='.pl0', encoding='utf-8', delete=False) as f:
+        f.write(synthetic(int(args.size * 1e6)))
+        filename = f.name
+
+    try:
+        nbytes = os.path.getsize(filename)
+        print(f'{nbytes / 1e6:.1f} MB, chunksize {args.chunksize}')
+        for name, func in VARIANTS.items():
+            best = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                ntokens = func(filename, args.chunksize)
+                best = min(best, time.perf_counter() - start)
+
+            tracemalloc.start()
+            func(filename, args.chunksize)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            print(f'  {name:<22} {ntokens:>9} tokens {ntokens / best:>12,.0f} tokens/s '
+                  f'{nbytes / best / 1e6:6.2f} MB/s   peak {peak / 1e6:8.2f} MB')
+    finally:
+        os.unlink(filename)
+
+
+if __name__ == '__main__':
+    main()
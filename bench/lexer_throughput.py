@@ -0,0 +1,148 @@
+# bench/lexer_throughput.py
+'''
+Rendimiento de plex.Lexer.tokenize con línea base y umbral de regresión.
+
+Entradas:
+  - cada archivo de test1/, repetido hasta ~MIN_BYTES para que el tiempo
+    sea medible;
+  - programas sintéticos (bench/lexer_stream.synthetic) de varios tamaños.
+
+Para cada entrada se informa tokens/s, bytes/s (mejor de REPEAT pasadas,
+solo tokenize(); nada de print_lexer ni de rich) y el pico de memoria
+(tracemalloc, en una pasada aparte para no afectar el tiempo).
+
+  python bench/lexer_throughput.py --save lexer_baseline.json
+  python bench/lexer_throughput.py --baseline lexer_baseline.json --threshold 0.10
+
+Con --baseline el programa termina con código 1 si alguna entrada quedó
+más de threshold (fracción) por debajo de los tokens/s de la línea base.
+'''
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import sly
+from plex import Lexer
+from lexer_stream import synthetic
+
+
+MIN_BYTES = 64 * 1024
+SIZES = (0.1, 1.0, 4.0)          # MB de las entradas sintéticas
+
+
+def inputs(sizes):
+    result = {}
+    for filename in sorted(glob.glob(os.path.join(ROOT, 'test1', '*.pl0'))):
+        with open(filename, encoding='utf-8') as f:
+            text = f.read()
+        if text:
+            text = text if text.endswith('\n') else text + '\n'
+            result['test1/' + os.path.basename(filename)] = text * max(1, MIN_BYTES // len(text))
+    for size in sizes:
+        result[f'synthetic-{size:g}MB'] = synthetic(int(size * 1e6))
+    return result
+
+
+def tokenize(text):
+    count = 0
+    for _ in Lexer().tokenize(text):
+        count += 1
+    return count
+
+
+def measure(text, repeat):
+    nbytes = len(text.encode('utf-8'))
+    best = float('inf')
+    # Los archivos bad*.pl0 generan mensajes de error: no se imprimen
+    with redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            ntokens = tokenize(text)
+            best = min(best, time.perf_counter() - start)
+
+        tracemalloc.start()
+        tokenize(text)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        'bytes': nbytes,
+        'tokens': ntokens,
+        'seconds': best,
+        'tokens_per_sec': ntokens / best,
+        'bytes_per_sec': nbytes / best,
+        'peak_bytes': peak,
+    }
+
+
+def compare(results, baseline, threshold):
+    '''
+    Lista de (entrada, actual, base, cambio) que bajaron más de threshold
+    '''
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        change = result['tokens_per_sec'] / base['tokens_per_sec'] - 1
+        result['change'] = change
+        if change < -threshold:
+            regressions.append((name, result['tokens_per_sec'], base['tokens_per_sec'], change))
+    return regressions
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description='Lexer throughput benchmark')
+    cli.add_argument('-n', '--repeat', type=int, default=5)
+    cli.add_argument('--sizes', type=float, nargs='*', default=SIZES, help='Synthetic input sizes in MB')
+    cli.add_argument('--save', metavar='JSON', help='Write the results as a new baseline')
+    cli.add_argument('--baseline', metavar='JSON', help='Compare against a saved baseline')
+    cli.add_argument('--threshold', type=float, default=0.10,
+                     help='Allowed tokens/sec drop as a fraction (default: 0.10)')
+    args = cli.parse_args(argv)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+
+    results = {name: measure(text, args.repeat) for name, text in inputs(args.sizes).items()}
+    regressions = compare(results, baseline, args.threshold)
+
+    print(f'{"input":<26} {"tokens":>9} {"tokens/s":>12} {"MB/s":>7} {"peak MB":>8}', end='')
+    print(f' {"vs base":>8}' if baseline else '')
+    for name, r in results.items():
+        print(f'{name:<26} {r["tokens"]:>9} {r["tokens_per_sec"]:>12,.0f} '
+              f'{r["bytes_per_sec"] / 1e6:>7.2f} {r["peak_bytes"] / 1e6:>8.2f}', end='')
+        print(f' {r["change"]:>+8.1%}' if 'change' in r else '')
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'sly': sly.__version__,
+                'machine': platform.machine(),
+                'results': results,
+            }, f, indent=2)
+        print(f'baseline written to {args.save}')
+
+    if regressions:
+        print(f'{len(regressions)} input(s) slower than baseline by more than {args.threshold:.0%}:')
+        for name, now, base, change in regressions:
+            print(f'  {name}: {now:,.0f} tokens/s (baseline {base:,.0f}, {change:+.1%})')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+# bench/loop_opt.py
+'''
+Efecto de loops.py (código invariante y reducción de fuerza) sobre las
+instrucciones de bytecode que ejecuta la VM.  Cada programa se compila como
+vm.compile_ast(ast, True) pero con y sin el pase de lazos, se ejecuta con
+una entrada fija y se cuentan las instrucciones ejecutadas (total y MUL).
+
+Los programas son los de test3/ que terminan y un producto de matrices de
+N x N guardadas en arreglos de una dimensión (a[i*N + k]), que es el caso
+que la reducción de fuerza apunta.
+
+usage: python bench/loop_opt.py [-n N] [files ...]   (por defecto test3/ y el producto de matrices)
+'''
+import argparse
+import glob
+import io
+import os
+import sys
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from plex import Lexer
+from pparser import Parser
+from intcode import IntermediateCodeGenerator
+from cleanup import cleanup_program
+from loops import optimize_program
+from regalloc import allocate_program
+from vm import VM, WIDTH, MUL, compile_program
+
+# Entrada de los programas de test3/ que leen
+INPUTS = {
+    'factors.pl0': '360\n',
+    'fib.pl0': '20\n',
+    'gcd.pl0': '1071\n462\n',
+    'isprime.pl0': '7919\n',
+    'simple.pl0': '20\n',
+    'sum.pl0': '999\n',
+}
+
+LIMIT = 1_000_000           # Ejecuciones de un opcode antes de abandonar (test3/mergesort.pl0 no termina)
+
+
+class Limit(Exception):
+    pass
+
+
+class Counted(list):
+    '''Código de una BytecodeFunction que cuenta los opcodes que se leen'''
+    def __init__(self, code, counts):
+        super().__init__(code)
+        self.counts = counts
+
+    def __getitem__(self, pc):
+        op = list.__getitem__(self, pc)
+        if pc % WIDTH == 0:
+            self.counts[op] = self.counts.get(op, 0) + 1
+            if self.counts[op] > LIMIT:
+                raise Limit()
+        return op
+
+
+def matmul(n):
+    return f'''fun main()
+  a : int[{n * n}];
+  b : int[{n * n}];
+  c : int[{n * n}];
+  i : int;
+  j : int;
+  k : int;
+  s : int;
+begin
+  i := 0;
+  while i < {n} do begin
+    j := 0;
+    while j < {n} do begin
+      a[i * {n} + j] := i + j;
+      b[i * {n} + j] := i - j;
+      j := j + 1
+    end;
+    i := i + 1
+  end;
+  i := 0;
+  while i < {n} do begin
+    j := 0;
+    while j < {n} do begin
+      s := 0;
+      k := 0;
+      while k < {n} do begin
+        s := s + a[i * {n} + k] * b[k * {n} + j];
+        k := k + 1
+      end;
+      c[i * {n} + j] := s;
+      j := j + 1
+    end;
+    i := i + 1
+  end;
+  write(c[{n * n - 1}])
+end
+'''
+
+
+def run(text, stdin, loops):
+    '''(salida, {opcode: ejecutadas}) del programa compilado con o sin loops'''
+    with redirect_stdout(io.StringIO()):
+        ast = Parser().parse(Lexer().tokenize(text))
+    gen = IntermediateCodeGenerator()
+    gen.generate_code(ast)
+    cleanup_program(gen.functions)
+    if loops:
+        optimize_program(gen.functions)
+        cleanup_program(gen.functions)
+    allocate_program(gen.functions)
+    program = compile_program(gen.functions)
+
+    counts = {}
+    for func in program.values():
+        func.code = Counted(func.code, counts)
+    out = io.StringIO()
+    try:
+        VM(stdin=io.StringIO(stdin), stdout=out).run(program)
+    except Limit:
+        return None, counts
+    return out.getvalue(), counts
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description='Loop optimization benchmark')
+    cli.add_argument('files', nargs='*')
+    cli.add_argument('-n', type=int, default=20, help='matrix size (default: 20)')
+    args = cli.parse_args(argv)
+
+    programs = []
+    for filename in args.files or sorted(glob.glob(os.path.join(ROOT, 'test3', '*.pl0'))):
+        with open(filename, encoding='utf-8') as f:
+            programs.append((os.path.relpath(filename, ROOT), f.read(),
+                             INPUTS.get(os.path.basename(filename), '10\n')))
+    if not args.files:
+        programs.append((f'matmul {args.n}x{args.n}', matmul(args.n), ''))
+
+    print(f'{"program":<24} {"before":>10} {"after":>10} {"saved":>7} {"MUL before":>11} {"MUL after":>10}')
+    for name, text, stdin in programs:
+        out0, before = run(text, stdin, False)
+        out1, after = run(text, stdin, True)
+        if out0 is None or out1 is None:
+            print(f'{name:<24} (did not finish: over {LIMIT} executions of one opcode)')
+            continue
+        assert out0 == out1, name
+        total0, total1 = sum(before.values()), sum(after.values())
+        print(f'{name:<24} {total0:>10} {total1:>10} {(total0 - total1) / total0:>7.1%} '
+              f'{before.get(MUL, 0):>11} {after.get(MUL, 0):>10}')
+
+
+if __name__ == '__main__':
+    main()
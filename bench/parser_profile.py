@@ -0,0 +1,179 @@
+# bench/parser_profile.py
+'''
+Dónde se va el tiempo de Parser.parse.
+
+Para cada archivo se tokeniza primero (fuera de la medición) y luego se mide:
+
+  - el tiempo de Parser.parse solo (mejor de REPEAT pasadas);
+  - reducciones/s y, por producción, cantidad de reducciones, tiempo total y
+    microsegundos por reducción (pasada aparte con las funciones de las
+    producciones envueltas; ese tiempo incluye la acción y lo que construye).
+
+Una acción cuyo costo por reducción crece con el tamaño de la entrada
+(p.ej. 'stmtlist -> stmtlist SEMICOLON stmt' que hace p.stmtlist + [p.stmt])
+aparece arriba en la tabla con us/red muy por encima del resto.
+
+Opcionalmente:
+  --profile OUT.prof     volcado de cProfile (pstats, snakeviz, gprof2dot...)
+  --folded OUT.txt       pilas colapsadas 'a;b;c microsegundos' para
+                         flamegraph.pl / speedscope / inferno
+
+usage: python bench/parser_profile.py [-n REPEAT] [--top N] [--profile F] [--folded F] [files ...]
+       (por defecto test2/bigexpr, bigstat, bigdecl y declhell)
+'''
+import argparse
+import cProfile
+import io
+import os
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager, redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.setrecursionlimit(50000)   # test2/bigexpr.pl0 es muy profundo
+
+from plex import Lexer
+from pparser import Parser
+
+
+DEFAULT_FILES = ['bigexpr.pl0', 'bigstat.pl0', 'bigdecl.pl0', 'declhell.pl0']
+
+
+def tokenize(filename):
+    with open(filename, encoding='utf-8') as f:
+        text = f.read()
+    with redirect_stdout(io.StringIO()):
+        return list(Lexer().tokenize(text))
+
+
+def parse(parser, tokens):
+    parser._line_positions = {}
+    parser._index_positions = {}
+    with redirect_stdout(io.StringIO()):
+        return parser.parse(iter(tokens))
+
+
+@contextmanager
+def counting(parser_class):
+    '''
+    Envuelve la función de cada producción para contar reducciones y tiempo.
+    Devuelve {producción: [reducciones, segundos]}
+    '''
+    stats = defaultdict(lambda: [0, 0.0])
+    productions = [p for p in parser_class._grammar.Productions if p.func]
+    originals = [p.func for p in productions]
+
+    def wrap(prod, func):
+        entry = stats[str(prod)]
+        clock = time.perf_counter
+        def counted(self, p):
+            start = clock()
+            try:
+                return func(self, p)
+            finally:
+                entry[0] += 1
+                entry[1] += clock() - start
+        return counted
+
+    for prod, func in zip(productions, originals):
+        prod.func = wrap(prod, func)
+    try:
+        yield stats
+    finally:
+        for prod, func in zip(productions, originals):
+            prod.func = func
+
+
+class FoldedProfiler:
+    '''
+    Perfilador determinista que acumula tiempo propio por pila completa de
+    llamadas, en el formato de pilas colapsadas de flamegraph.pl.
+    '''
+    def __init__(self):
+        self.stacks = defaultdict(float)
+        self.stack = []
+        self.last = 0.0
+
+    def _frame(self, frame, arg, event):
+        if event.startswith('c_'):
+            return f'{getattr(arg, "__qualname__", arg)}'
+        code = frame.f_code
+        return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+    def _callback(self, frame, event, arg):
+        now = time.perf_counter()
+        if self.stack:
+            self.stacks[';'.join(self.stack)] += now - self.last
+        if event in ('call', 'c_call'):
+            self.stack.append(self._frame(frame, arg, event))
+        elif self.stack:
+            self.stack.pop()
+        self.last = time.perf_counter()
+
+    def run(self, func, *args):
+        self.last = time.perf_counter()
+        sys.setprofile(self._callback)
+        try:
+            return func(*args)
+        finally:
+            sys.setprofile(None)
+
+    def write(self, out):
+        for stack, seconds in sorted(self.stacks.items()):
+            micro = round(seconds * 1e6)
+            if micro:
+                out.write(f'{stack} {micro}\n')
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description='Parser profiling harness')
+    cli.add_argument('files', nargs='*')
+    cli.add_argument('-n', '--repeat', type=int, default=3)
+    cli.add_argument('--top', type=int, default=8, help='Productions shown per file')
+    cli.add_argument('--profile', metavar='OUT', help='Write a cProfile (pstats) dump')
+    cli.add_argument('--folded', metavar='OUT', help='Write folded stacks for flame graphs')
+    args = cli.parse_args(argv)
+
+    files = args.files or [os.path.join(ROOT, 'test2', name) for name in DEFAULT_FILES]
+    parser = Parser()
+    profile = cProfile.Profile() if args.profile else None
+    folded = FoldedProfiler() if args.folded else None
+
+    for filename in files:
+        tokens = tokenize(filename)
+
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            parse(parser, tokens)
+            best = min(best, time.perf_counter() - start)
+
+        with counting(Parser) as stats:
+            parse(parser, tokens)
+        reductions = sum(count for count, _ in stats.values())
+
+        print(f'{os.path.relpath(filename)}: {len(tokens)} tokens, {reductions} reductions, '
+              f'parse {best * 1e3:.2f} ms, {reductions / best:,.0f} reductions/s, '
+              f'{len(tokens) / best:,.0f} tokens/s')
+        ranked = sorted(stats.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (count, seconds) in ranked[:args.top]:
+            print(f'  {count:>7} {seconds * 1e3:9.2f} ms {seconds / count * 1e6:9.2f} us/red  {name}')
+
+        if profile:
+            profile.runcall(parse, parser, tokens)
+        if folded:
+            folded.run(parse, parser, tokens)
+
+    if profile:
+        profile.dump_stats(args.profile)
+        print(f'cProfile dump written to {args.profile}')
+    if folded:
+        with open(args.folded, 'w', encoding='utf-8') as f:
+            folded.write(f)
+        print(f'folded stacks written to {args.folded}')
+
+
+if __name__ == '__main__':
+    main()
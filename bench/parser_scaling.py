@@ -0,0 +1,73 @@
+# bench/parser_scaling.py
+'''
+Escalamiento de Parser.parse con la cantidad de elementos de una lista:
+una función con N sentencias y otra con N declaraciones locales.
+
+Si las acciones de stmtlist/varlist copian la lista en cada reducción el
+tiempo por elemento crece con N; si la extienden en su lugar queda
+constante (crecimiento lineal).
+
+usage: python bench/parser_scaling.py [-n REPEAT] [sizes ...]   (por defecto 1000 10000 100000)
+'''
+import argparse
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from plex import Lexer
+from pparser import Parser
+
+
+def statements(n):
+    body = ';\n'.join(f'  x := x + {i}' for i in range(n))
+    return f'fun main()\n  x : int;\nbegin\n{body}\nend\n'
+
+
+def declarations(n):
+    decls = ''.join(f'  v{i} : int;\n' for i in range(n))
+    return f'fun main()\n{decls}begin\n  skip\nend\n'
+
+
+PROGRAMS = {
+    'statements':   statements,
+    'declarations': declarations,
+}
+
+
+def measure(text, repeat):
+    with redirect_stdout(io.StringIO()):
+        tokens = list(Lexer().tokenize(text))
+    parser = Parser()
+    best = float('inf')
+    for _ in range(repeat):
+        parser._line_positions = {}
+        parser._index_positions = {}
+        start = time.perf_counter()
+        parser.parse(iter(tokens))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description='Parser list scaling benchmark')
+    cli.add_argument('sizes', nargs='*', type=int, default=[1000, 10000, 100000])
+    cli.add_argument('-n', '--repeat', type=int, default=3)
+    args = cli.parse_args(argv)
+
+    for name, make in PROGRAMS.items():
+        print(name)
+        first = None
+        for n in args.sizes:
+            seconds = measure(make(n), args.repeat)
+            per = seconds / n * 1e6
+            first = first or per
+            print(f'  {n:>8} {seconds * 1e3:10.1f} ms {per:8.2f} us/element  ({per / first:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# bench/recursion.py
+'''
+Recursión profunda en la VM (pila de marcos explícita, TAILCALL) y en el
+intérprete de clausuras (recursión de Python).  Para cada profundidad N se
+ejecutan:
+
+  sum     return n + sum(n - 1)            recursión lineal, no de cola
+  count   return count(n - 1, acc + n)     llamada de cola
+
+La VM corre con el límite de recursión de Python en LIMIT para mostrar que
+no lo usa; el intérprete de clausuras necesita subirlo a más de N.  Además
+se mide test3/fib.pl0 con n = 22.
+
+usage: python bench/recursion.py [-n REPEAT] [depths ...]   (por defecto 1000 10000 100000 1000000)
+'''
+import argparse
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from plex import Lexer
+from pparser import Parser
+from interp import Interpreter
+from vm import VM, compile_ast
+
+LIMIT = 200                 # Límite de recursión de Python al ejecutar la VM
+
+PROGRAMS = {
+    'sum': '''fun sum(n : int)
+begin
+  if n == 0 then return 0;
+  return n + sum(n - 1)
+end
+
+fun main()
+  n : int;
+begin
+  read(n);
+  write(sum(n))
+end
+''',
+    'count': '''fun count(n : int, acc : int)
+begin
+  if n == 0 then return acc;
+  return count(n - 1, acc + n)
+end
+
+fun main()
+  n : int;
+begin
+  read(n);
+  write(count(n, 0))
+end
+''',
+}
+
+
+def parse(text):
+    with redirect_stdout(io.StringIO()):
+        return Parser().parse(Lexer().tokenize(text))
+
+
+def timed(run, repeat):
+    '''(salida, mejor tiempo) de repeat ejecuciones de run(stdout)'''
+    best = float('inf')
+    for _ in range(repeat):
+        out = io.StringIO()
+        start = time.perf_counter()
+        run(out)
+        best = min(best, time.perf_counter() - start)
+    return out.getvalue(), best
+
+
+def run_vm(ast, stdin, repeat):
+    program = compile_ast(ast, True)
+    old = sys.getrecursionlimit()
+    sys.setrecursionlimit(LIMIT)
+    try:
+        return timed(lambda out: VM(stdin=io.StringIO(stdin), stdout=out).run(program), repeat)
+    finally:
+        sys.setrecursionlimit(old)
+
+
+def run_closure(ast, stdin, depth, repeat):
+    old = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(old, 4 * depth + 1000))
+    try:
+        return timed(lambda out: Interpreter(stdin=io.StringIO(stdin), stdout=out).interpret(ast), repeat)
+    finally:
+        sys.setrecursionlimit(old)
+
+
+def report(name, ast, stdin, depth, repeat):
+    out_vm, t_vm = run_vm(ast, stdin, repeat)
+    out_cl, t_cl = run_closure(ast, stdin, depth, repeat)
+    assert out_vm == out_cl, name
+    print(f'{name:<20} {t_vm * 1e3:>10.1f} {t_cl * 1e3:>12.1f} {t_cl / t_vm:>7.2f}x')
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description='Deep recursion benchmark')
+    cli.add_argument('depths', nargs='*', type=int, default=[1000, 10000, 100000, 1000000])
+    cli.add_argument('-n', '--repeat', type=int, default=1)
+    args = cli.parse_args(argv)
+
+    print(f'{"program":<20} {"vm ms":>10} {"closure ms":>12} {"ratio":>8}')
+    for depth in args.depths:
+        for name, text in PROGRAMS.items():
+            report(f'{name} {depth}', parse(text), f'{depth}\n', depth, args.repeat)
+    with open(os.path.join(ROOT, 'test3', 'fib.pl0'), encoding='utf-8') as f:
+        report('test3/fib.pl0 22', parse(f.read()), '22\n', 100, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
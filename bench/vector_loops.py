@@ -0,0 +1,109 @@
+# bench/vector_loops.py
+'''
+Bucles sobre arreglos vectorizados con NumPy (vectorize.py) en el
+intérprete de clausuras.  Cada programa inicializa arreglos de N elementos
+y repite REPS veces un bucle contado elemento a elemento:
+
+  copy      b[i] := a[i]
+  saxpy     c[i] := a[i] * k + b[i]
+  merge     nums[p + i] := temp[i]            (la copia de test3/mergesort.pl0)
+  reverse   b[n - 1 - i] := a[i]
+  float     g[i] := float(a[i]) * 0.5 + g[i]
+  alias     b[i] := a[i]; a[i] := a[i] + 1; c[i] := b[i]
+  invariant c[i] := a[k] + i                  (índice que no depende de i)
+
+Se compara el tiempo con la vectorización y sin ella (Interpreter.vectorize)
+y se verifica que la salida sea la misma.  alias es la prueba de que el valor
+guardado en b no cambia cuando después se escribe a.
+
+usage: python bench/vector_loops.py [-n N] [-r REPS]   (por defecto N = 1000000, REPS = 3)
+'''
+import argparse
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from plex import Lexer
+from pparser import Parser
+from interp import Interpreter
+
+# {decls} y {kernel} son propios de cada programa; el bucle de r no se
+# vectoriza (su cuerpo tiene otro bucle)
+TEMPLATE = '''
+fun main()
+  a : int[{n}];
+  b : int[{n}];
+  c : int[{n}];
+  g : float[{n}];
+  i : int;
+  r : int;
+  k : int;
+  p : int;
+begin
+  k := 3;
+  p := 0;
+  i := 0;
+  while i < {n} do begin
+    a[i] := i * 7 - 3;
+    b[i] := {n} - i;
+    i := i + 1
+  end;
+  r := 0;
+  while r < {reps} do begin
+    i := 0;
+    {kernel};
+    r := r + 1
+  end;
+  write(b[0]); write(b[{n} - 1]); write(c[{n} / 2]); write(g[{n} - 1])
+end
+'''
+
+KERNELS = {
+    'copy': 'while i < {n} do begin b[i] := a[i]; i := i + 1 end',
+    'saxpy': 'while i < {n} do begin c[i] := a[i] * k + b[i]; i := i + 1 end',
+    'merge': 'while i < {n} do begin b[p + i] := a[i]; i := i + 1 end',
+    'reverse': 'while i < {n} do begin b[{n} - 1 - i] := a[i]; i := i + 1 end',
+    'float': 'while i < {n} do begin g[i] := float(a[i]) * 0.5 + g[i]; i := i + 1 end',
+    'alias': 'while i < {n} do begin b[i] := a[i]; a[i] := a[i] + 1; c[i] := b[i]; i := i + 1 end',
+    'invariant': 'while i < {n} do begin c[i] := a[k] + i; i := i + 1 end',
+}
+
+
+def parse(text):
+    with redirect_stdout(io.StringIO()):
+        return Parser().parse(Lexer().tokenize(text))
+
+
+def run(ast, vectorize):
+    '''(salida, segundos) del programa con o sin vectorización'''
+    out = io.StringIO()
+    interp = Interpreter(stdout=out)
+    interp.vectorize = vectorize
+    start = time.perf_counter()
+    interp.interpret(ast)
+    return out.getvalue(), time.perf_counter() - start
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description='Vectorized array loop benchmark')
+    cli.add_argument('-n', type=int, default=1_000_000)
+    cli.add_argument('-r', '--reps', type=int, default=3)
+    args = cli.parse_args(argv)
+
+    print(f'{"program":<10} {"scalar ms":>10} {"vector ms":>10} {"speedup":>8}')
+    for name, kernel in KERNELS.items():
+        text = TEMPLATE.replace('{kernel}', kernel)
+        ast = parse(text.replace('{n}', str(args.n)).replace('{reps}', str(args.reps)))
+        out_s, t_s = run(ast, False)
+        out_v, t_v = run(ast, True)
+        assert out_s == out_v, name
+        print(f'{name:<10} {t_s * 1e3:>10.1f} {t_v * 1e3:>10.1f} {t_s / t_v:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# bench/visitor_dispatch.py
+'''
+Costo de despacho por nodo de Visitor.visit: búsqueda con
+getattr(self, 'visit_' + nombre) en cada nodo frente a la tabla por tipo que
+modelo.Visitor arma y cachea por clase.
+
+Los dos recorridos hacen exactamente el mismo trabajo (visitar cada nodo del
+AST a través de _fields); solo cambia cómo se resuelve el método.
+
+usage: python bench/visitor_dispatch.py [-n REPEAT] [files ...]   (por defecto test2/ y test3/)
+'''
+import argparse
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.setrecursionlimit(50000)   # test2/bigexpr.pl0 es muy profundo
+
+import modelo
+from modelo import Node, Visitor
+from plex import Lexer
+from pparser import Parser
+
+
+class Walker(Visitor):
+    '''
+    Visita todos los nodos.  Define un visit_* para cada clase de modelo.py,
+    como hacen Checker e IntermediateCodeGenerator.
+    '''
+    def generic_visit(self, node):
+        self.count += 1
+        for name in node._fields:
+            value = getattr(node, name)
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, Node):
+                        self.visit(item)
+            elif isinstance(value, Node):
+                self.visit(value)
+
+
+# Antes de definir las subclases: cada una arma su tabla al crearse
+for _name, _cls in vars(modelo).items():
+    if isinstance(_cls, type) and issubclass(_cls, Node):
+        setattr(Walker, f'visit_{_name}', Walker.generic_visit)
+
+
+class CachedWalker(Walker):
+    pass
+
+
+class GetattrWalker(Walker):
+    def visit(self, node):
+        method_name = 'visit_' + node.__class__.__name__
+        visitor = getattr(self, method_name, self.generic_visit)
+        return visitor(node)
+
+
+def run(walker_class, trees, repeat):
+    walker = walker_class()
+    best = None
+    for _ in range(repeat):
+        walker.count = 0
+        start = time.perf_counter()
+        for tree in trees:
+            walker.visit(tree)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, walker.count
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description='Visitor dispatch micro-benchmark')
+    cli.add_argument('-n', '--repeat', type=int, default=20)
+    cli.add_argument('files', nargs='*')
+    args = cli.parse_args(argv)
+
+    files = args.files or sorted(glob.glob(os.path.join(ROOT, 'test2', '*.pl0')) +
+                                 glob.glob(os.path.join(ROOT, 'test3', '*.pl0')))
+    trees = []
+    for filename in files:
+        with open(filename, encoding='utf-8') as f:
+            tree = Parser().parse(Lexer().tokenize(f.read()))
+        if tree is not None:
+            trees.append(tree)
+
+    old, nodes = run(GetattrWalker, trees, args.repeat)
+    new, _ = run(CachedWalker, trees, args.repeat)
+    print(f'{len(trees)} programs, {nodes} nodes per pass (best of {args.repeat})')
+    print(f"getattr('visit_' + name): {old * 1e9 / nodes:7.1f} ns/node")
+    print(f'cached type dispatch:     {new * 1e9 / nodes:7.1f} ns/node')
+    print(f'speedup:                  {old / new:7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,27 @@
+'''
+Análisis semántico
+==================
+Checker recorre el programa una sola vez y junta en errors los pares
+(mensaje, nodo) de todos los errores, en lugar de detenerse en el primero.
+Los métodos visit_* siguen avisando con una excepción; statement() la
+atrapa, anota el error con la sentencia y sigue con la siguiente.  Así cada
+sentencia aporta a lo sumo un error y las demás se revisan igual.
+
+Los tipos de las expresiones son cadenas: 'int', 'float', 'bool', 'int[40]'
+para los arreglos, 'void' para una llamada a una función que terminó de
+revisarse sin return con valor y None cuando no se conoce (una función
+que todavía no se revisó, por ejemplo en una llamada recursiva).  Con None
+no se informan errores de tipo, para no encadenar errores falsos.
+
+Como en resolve.py, las funciones de un ámbito se declaran antes de revisar
+sus cuerpos, así que pueden llamarse entre sí sin importar el orden.
+'''
 from modelo import *
 from plex import Lexer
 from pparser import Parser
 from dataclasses import dataclass, field
-from rich import print
+from intcode import declarations, array_size
+from typesys import return_types
 import sys
 
 # ---------------------------------------------------------------------
@@ -13,10 +32,15 @@ class Symtab:
     class SymbolDefinedError(Exception):
         pass
 
+    class SemanticError(Exception):
+        pass
+
     def __init__(self, parent=None):
         self.entries = {}
         self.parent = parent
-        self.in_while_context = False 
+        self.rettype = None         # Tipo de retorno (ámbito de una función)
+        self.returns = False        # Tiene algún return con valor
+        self.complete = False       # Ya se revisó el cuerpo de la función
         if self.parent:
             self.parent.children.append(self)
         self.children = []
@@ -48,17 +72,42 @@ class Float(Literal):
     type: DataType = field(default_factory= SimpleType('float'))
 
 
+def vartype(decl):
+    '''Tipo de un Parameter o VarDef'''
+    base = decl.datatype.base_type.lower()
+    size = array_size(decl.datatype)
+    return base if size is None else f'{base}[{size}]'
+
+
+def is_array(type):
+    return type is not None and type.endswith(']')
+
+
 class Checker(Visitor):
+    def __init__(self):
+        self.errors = []            # (mensaje, nodo)
+        self.scope = None           # Symtab de la función que se revisa
+        self.loops = 0              # while abiertos en la función
+        self.rettypes = {}          # id(FunDefinition) -> tipo de retorno (typesys.return_types)
+
+    def check(self, node, symtab):
+        '''Revisa node (Program o FunDefinition) y devuelve los errores'''
+        self.visit(node, symtab)
+        return self.errors
+
+    def error(self, message, node):
+        self.errors.append((message, node))
+
     def visit(self, node: Any, symtab: Symtab):
-        method_name = 'visit_' + node.__class__.__name__
-        visitor = getattr(self, method_name, self.generic_visit)
-        return visitor(node, symtab)
+        func = self._dispatch.get(node.__class__) or self.handler(node.__class__)
+        return func(self, node, symtab)
 
     def generic_visit(self, node: Any, symtab: Symtab):
         if node is None:
             return
 
-        for field_name, field_value in node.__dict__.items():
+        for field_name in node._fields:
+            field_value = getattr(node, field_name)
             if field_value is None:
                 continue
 
@@ -67,213 +116,298 @@ class Checker(Visitor):
                     self.visit(item, symtab)
             elif isinstance(field_value, Symtab):
                 self.visit(field_value, symtab)
-            elif isinstance(field_value, Expression):
+            elif isinstance(field_value, Node):
                 self.visit(field_value, symtab)
 
-    
+    def statement(self, node, symtab):
+        '''Revisa una sentencia; un error se anota y no corta la revisión'''
+        if node is None:
+            return
+        try:
+            self.visit(node, symtab)
+        except (Symtab.SymbolDefinedError, Symtab.SemanticError) as e:
+            self.error(str(e), node)
+        except RecursionError:
+            self.error("La sentencia está demasiado anidada para revisarla.", node)
+
+    def value(self, node, symtab):
+        '''Tipo de una expresión cuyo valor se usa'''
+        type = self.visit(node, symtab)
+        if type == 'void':
+            raise Symtab.SemanticError(f"La función {node.identifier} no devuelve un valor.")
+        return type
+
+    def scalar(self, node, symtab, what):
+        type = self.value(node, symtab)
+        if is_array(type):
+            raise Symtab.SemanticError(f"No se puede usar el arreglo completo en {what}.")
+        return type
+
+    # -----------------------------------------------------------------
+    # Declaraciones
+    # -----------------------------------------------------------------
+    def declare(self, node: FunDefinition, symtab: Symtab):
+        '''
+        Agrega la función node a symtab y devuelve su ámbito.  Una función
+        repetida se informa y su cuerpo se revisa en un ámbito aparte.
+        '''
+        scope = Symtab(parent=symtab)
+        try:
+            symtab.add(node.name, (node, scope))
+        except Symtab.SymbolDefinedError:
+            symtab.children.remove(scope)
+            self.error(f"La función {node.name} ya está definida.", node)
+        return scope
+
     def visit_Program(self, node: Program, symtab: Symtab):
-        for func in node.funclist:
-            self.visit(func, symtab)
+        self.rettypes = return_types(node)
+        scopes = [self.declare(func, symtab) for func in node.funclist]
+        for func, scope in zip(node.funclist, scopes):
+            self.function(func, scope)
 
         main_function = symtab.get('main')
-        if main_function is None or not isinstance(main_function, FunDefinition):
-            raise Symtab.SymbolDefinedError("Error: No se encontró la función 'main' en el programa.")
-    
-    def visit_FunDefinition(self, node: FunDefinition, symtab: Symtab):
-        print("Fue a FunDefinition")
-        existing_function = symtab.get(node.name)
-
-        if existing_function is not None:
-            raise Symtab.SymbolDefinedError(f"La función {node.name} ya está definida.")
-        else:
-            function_symtab = Symtab(parent=symtab)
-
-            symtab.add(node.name, (node, function_symtab))
+        if not isinstance(main_function, tuple):
+            self.error("Error: No se encontró la función 'main' en el programa.", node)
 
-        if node.parameters is not None:
-            for param in node.parameters:
-                self.visit(param, function_symtab)
-
-        if node.local_variables is not None:
-            for local_var in node.local_variables:
-                self.visit(local_var, function_symtab)
+    def visit_FunDefinition(self, node: FunDefinition, symtab: Symtab):
+        self.function(node, self.declare(node, symtab))
+
+    def function(self, node: FunDefinition, scope: Symtab):
+        '''Revisa parámetros, variables, funciones anidadas y sentencias de node'''
+        outer = self.scope, self.loops
+        self.scope, self.loops = scope, 0
+
+        for param in declarations(node.parameters):
+            self.statement(param, scope)
+        decls = declarations(node.local_variables)
+        nested = []
+        for decl in decls:
+            if isinstance(decl, FunDefinition):
+                nested.append((decl, self.declare(decl, scope)))
+            else:
+                # El parser arma también las variables locales como Parameter
+                try:
+                    self.define(decl, scope, 'La variable', 'definida')
+                except Symtab.SymbolDefinedError as e:
+                    self.error(str(e), decl)
+        for decl, inner in nested:
+            self.function(decl, inner)
 
         for statement in node.statements:
-            self.visit(statement, function_symtab)
+            self.statement(statement, scope)
 
-    
-    def visit_Parameter(self, node: Parameter, symtab: Symtab):
-        print("Fue a Parameter")
-        try:
-            symtab.add(node.name, node)
-        except Symtab.SymbolDefinedError:
-            raise Symtab.SymbolDefinedError(f"El parámetro {node.name} ya está definido.")
-    
-    def visit_VarDef(self, node: VarDef, symtab: Symtab):
-        print("fue a VarDef")
+        scope.complete = True
+        self.scope, self.loops = outer
+
+    def define(self, node, symtab, kind, defined):
         try:
             symtab.add(node.name, node)
         except Symtab.SymbolDefinedError:
-            raise Symtab.SymbolDefinedError(f"La variable {node.name} ya está definida.")
+            raise Symtab.SymbolDefinedError(f"{kind} {node.name} ya está {defined}.")
 
-        self.visit(node.type_name, symtab)
-    
-    def visit_LogicalOperation(self, node: LogicalOperation, symtab: Symtab):
-        print("fue a logical operation")
-        self.visit(node.left, symtab)
-        self.visit(node.right, symtab)
-    
-    def visit_BinOp(self, node: Binop, symtab: Symtab):
-        print("visitó binop")
-        self.visit(node.left, symtab)
-        self.visit(node.right, symtab)
-    
-    def visit_UnaryOp(self, node: UnaryOp, symtab: Symtab):
-        print("visitó unop")
-        self.visit(node.expression, symtab)
-    
-    def visit_TypeName(self, node: TypeName, symtab: Symtab):
-        print("typename")
-        pass
-    
-    def visit_FunctionCall(self, node: FunctionCall, symtab: Symtab):
-        print("visitó functioncall")
-        function_name = node.identifier
-        function = symtab.get(function_name)
-
-        if function is None or not isinstance(function, FunDefinition):
-            raise Symtab.SymbolDefinedError(f"La función {function_name} no está definida.")
-
-        if len(node.arguments) != len(function.parameters):
-            raise Symtab.SymbolDefinedError(f"La función {function_name} espera {len(function.parameters)} argumentos, pero se proporcionaron {len(node.arguments)}.")
-
-        for argument in node.arguments:
-            self.visit(argument, symtab)
-    
-    def visit_SimpleLocation(self, node: SimpleLocation, symtab: Symtab):
-        print("simple location")
-        variable_name = node.name
-        variable = symtab.get(variable_name)
-
-        if variable is None or not isinstance(variable, VarDef):
-            raise Symtab.SymbolDefinedError(f"La variable {variable_name} no está definida.")
-    
-    def visit_ArrayLocation(self, node: ArrayLocation, symtab: Symtab):
-        print("array location")
-        array_name = node.name
-        array = symtab.get(array_name)
+    def visit_Parameter(self, node: Parameter, symtab: Symtab):
+        self.define(node, symtab, 'El parámetro', 'definido')
 
-        if array is None or not isinstance(array, ArrayType):
-            raise Symtab.SymbolDefinedError(f"El array {array_name} no está definido.")
+    def visit_VarDef(self, node: VarDef, symtab: Symtab):
+        self.define(node, symtab, 'La variable', 'definida')
 
-        self.visit(node.index, symtab)
-    
+    # -----------------------------------------------------------------
+    # Sentencias
+    # -----------------------------------------------------------------
     def visit_AssignmentStatement(self, node: AssignmentStatement, symtab: Symtab):
-        print("visitó assign")
         left_type = self.visit(node.location, symtab)
-        right_type = self.visit(node.expression, symtab)
+        if is_array(left_type):
+            raise Symtab.SemanticError(f"No se puede asignar al arreglo completo {node.location.identifier}.")
+        right_type = self.value(node.expression, symtab)
 
-        if left_type == right_type:
-            return left_type
-        else:
-            raise symtab.SemanticError(f"La asignación es incompatible. Se esperaba {left_type}, pero se encontró {right_type}")
-            
-    def visit_IntegerNumber(self, node: IntegerNumber, symtab: Symtab):
-        print("integer")
-        value = node.value
-        if not isinstance(value, int):
-            raise Symtab.SymbolDefinedError("El valor del entero no es un tipo entero válido.")
+        if None not in (left_type, right_type) and left_type != right_type:
+            raise Symtab.SemanticError(f"La asignación es incompatible. Se esperaba {left_type}, pero se encontró {right_type}")
+        return left_type
 
-    def visit_FloatNumber(self, node: FloatNumber, symtab: Symtab):
-        print("float")
-        value = node.value
-        if not isinstance(value, float):
-            raise Symtab.SymbolDefinedError("El valor del flotante no es un tipo flotante válido.")
-    
-    def visit_ReturnStatement(self, node: ReturnStatement, symtab: Symtab):
-        print("return")
-        if node.expression is not None:
-            self.visit(node.expression, symtab)
+    def visit_BeginEndBlock(self, node: BeginEndBlock, symtab: Symtab):
+        for statement in node.stmtlist:
+            self.statement(statement, symtab)
 
     def visit_IfStatement(self, node: IfStatement, symtab: Symtab):
-        print("if")
         self.visit(node.condition, symtab)
-
-        self.visit(node.then_body, symtab)
-
-        if node.else_body:
-            self.visit(node.else_body, symtab)
+        self.statement(node.then_body, symtab)
+        self.statement(node.else_body, symtab)
 
     def visit_IfElseStatement(self, node: IfElseStatement, symtab: Symtab):
-        print("if-else")
         self.visit(node.condition, symtab)
+        self.statement(node.then_body, symtab)
+        self.statement(node.else_body, symtab)
 
-        self.visit(node.then_body, symtab)
-
-        self.visit(node.else_body, symtab)
+    def visit_While(self, node: While, symtab: Symtab):
+        self.visit(node.relation, symtab)
+        self.loops += 1
+        self.statement(node.stmt, symtab)
+        self.loops -= 1
 
-    
     def visit_Break(self, node: Break, symtab: Symtab):
-        print("break")
-        if not symtab.in_while_context:
+        if not self.loops:
             raise Symtab.SymbolDefinedError("La declaración 'break' debe estar dentro de un bucle (while).")
-    
-    def visit_While(self, node, symtab: Symtab = None):
-        print("visitó while")
-        symtab = symtab or self.symtab
-        symtab.in_while_context = True
-
-        self.visit(node.relation, symtab)
-        self.visit(node.stmt, symtab)  
 
-        symtab.in_while_context = False
-    
-    def visit_ReadStatement(self, node: ReadStatement, symtab: Symtab):
-        print("read")
-        variable_name = node.location.name
-        variable = symtab.get(variable_name)
+    def visit_SkipStatement(self, node: SkipStatement, symtab: Symtab):
+        pass
 
-        if variable is None or not isinstance(variable, VarDef):
-            raise Symtab.SymbolDefinedError(f"La variable {variable_name} no está declarada antes de la lectura.")
+    def visit_ReturnStatement(self, node: ReturnStatement, symtab: Symtab):
+        if node.expression is None:
+            return
+        type = self.scalar(node.expression, symtab, 'un return')
+        scope = self.scope
+        scope.returns = True
+        if type is None:
+            return
+        if scope.rettype is None:
+            scope.rettype = type
+        elif scope.rettype != type:
+            raise Symtab.SemanticError(f"Tipos de retorno incompatibles: {scope.rettype} y {type}.")
 
-        if not isinstance(node.location, (SimpleLocation, ArrayLocation)):
-            raise Symtab.SymbolDefinedError(f"La ubicación {node.location} no es válida en una declaración de lectura.")
+    def visit_ReadStatement(self, node: ReadStatement, symtab: Symtab):
+        location = node.location
+        name = location.name if isinstance(location, ArrayLocation) else location.identifier
+        if symtab.get(name) is None:
+            raise Symtab.SymbolDefinedError(f"La variable {name} no está declarada antes de la lectura.")
+        if is_array(self.visit(location, symtab)):
+            raise Symtab.SemanticError(f"No se puede leer el arreglo completo {name}.")
 
-        self.visit(node.location, symtab)
+    def visit_WriteStatement(self, node: WriteStatement, symtab: Symtab):
+        self.scalar(node.expression, symtab, 'write')
 
-    
     def visit_PrintStatement(self, node: PrintStatement, symtab: Symtab):
-        print("print")
         pass
 
-    def visit_WriteStatement(self, node: WriteStatement, symtab: Symtab):
-        print("write")
+    def visit_FunctionCall(self, node: FunctionCall, symtab: Symtab):
+        function_name = node.identifier
+        function = symtab.get(function_name)
 
-        if not isinstance(node.expression, (SimpleLocation, ArrayLocation)):
-            raise Symtab.SymbolDefinedError("La expresión en la declaración 'write' no es una ubicación válida.")
+        if function is None:
+            raise Symtab.SymbolDefinedError(f"La función {function_name} no está definida.")
+        if not isinstance(function, tuple):
+            raise Symtab.SymbolDefinedError(f"{function_name} no es una función.")
+
+        definition, scope = function
+        params = declarations(definition.parameters)
+        arguments = node.arguments
+        if isinstance(arguments, ExprList):
+            arguments = arguments.expressions
+        arguments = arguments or []
+        if len(arguments) != len(params):
+            raise Symtab.SymbolDefinedError(f"La función {function_name} espera {len(params)} argumentos, pero se proporcionaron {len(arguments)}.")
+
+        for n, (argument, param) in enumerate(zip(arguments, params), 1):
+            type = self.value(argument, symtab)
+            expected = vartype(param)
+            if type is not None and type != expected:
+                raise Symtab.SemanticError(f"El argumento {n} de {function_name} debe ser {expected}, pero se encontró {type}.")
+
+        if scope.complete and not scope.returns:
+            return 'void'
+        # El mismo tipo que usan los motores; también sirve para las funciones
+        # que todavía no se revisaron (más abajo en el fuente o recursivas)
+        return self.rettypes.get(id(definition), scope.rettype)
+
+    # -----------------------------------------------------------------
+    # Expresiones
+    # -----------------------------------------------------------------
+    def variable(self, name, symtab):
+        decl = symtab.get(name)
+        if decl is None:
+            raise Symtab.SymbolDefinedError(f"La variable {name} no está definida.")
+        if isinstance(decl, tuple):
+            raise Symtab.SemanticError(f"{name} es una función, no una variable.")
+        return vartype(decl)
+
+    def visit_Identifier(self, node: Identifier, symtab: Symtab):
+        return self.variable(node.name, symtab)
+
+    def visit_Location(self, node: Location, symtab: Symtab):
+        return self.variable(node.identifier, symtab)
 
-        self.visit(node.expression, symtab)
+    def visit_ArrayLocation(self, node: ArrayLocation, symtab: Symtab):
+        array_name = node.name
+        if symtab.get(array_name) is None:
+            raise Symtab.SymbolDefinedError(f"El array {array_name} no está definido.")
+        type = self.variable(array_name, symtab)
+        if not is_array(type):
+            raise Symtab.SemanticError(f"{array_name} no es un arreglo.")
+
+        index = self.scalar(node.index, symtab, 'un índice')
+        if index not in (None, 'int'):
+            raise Symtab.SemanticError(f"El índice de {array_name} debe ser int, pero se encontró {index}.")
+        constant = node.index
+        if isinstance(constant, UnaryOperation) and constant.operator == '-' \
+                and isinstance(constant.operand, IntegerNumber) and constant.operand.value > 0:
+            raise Symtab.SemanticError(f"Índice negativo en {array_name}.")
+        size = int(type[type.index('[') + 1:-1])
+        if isinstance(constant, IntegerNumber) and constant.value >= size:
+            raise Symtab.SemanticError(f"Índice {constant.value} fuera de {array_name} ({size} elementos).")
+        return type[:type.index('[')]
 
-        return self.visit(node.expression, symtab)
+    def visit_IntegerNumber(self, node: IntegerNumber, symtab: Symtab):
+        if not isinstance(node.value, int):
+            raise Symtab.SymbolDefinedError("El valor del entero no es un tipo entero válido.")
+        return 'int'
+
+    def visit_FloatNumber(self, node: FloatNumber, symtab: Symtab):
+        if not isinstance(node.value, float):
+            raise Symtab.SymbolDefinedError("El valor del flotante no es un tipo flotante válido.")
+        return 'float'
+
+    def visit_Binop(self, node: Binop, symtab: Symtab):
+        left = self.scalar(node.left, symtab, f"una operación '{node.op}'")
+        right = self.scalar(node.right, symtab, f"una operación '{node.op}'")
+        if None in (left, right):
+            return left or right
+        if left != right:
+            raise Symtab.SemanticError(f"Operación '{node.op}' entre {left} y {right}.")
+        return left
+
+    def visit_UnaryOperation(self, node: UnaryOperation, symtab: Symtab):
+        return self.scalar(node.operand, symtab, f"una operación '{node.operator}'")
+
+    def visit_IntConversion(self, node: IntConversion, symtab: Symtab):
+        self.scalar(node.expression, symtab, 'int()')
+        return 'int'
+
+    def visit_FloatConversion(self, node: FloatConversion, symtab: Symtab):
+        self.scalar(node.expression, symtab, 'float()')
+        return 'float'
+
+    def visit_RelationalOperation(self, node: RelationalOperation, symtab: Symtab):
+        left = self.scalar(node.left_operand, symtab, 'una comparación')
+        right = self.scalar(node.right_operand, symtab, 'una comparación')
+        if None not in (left, right) and left != right:
+            raise Symtab.SemanticError(f"Comparación '{node.operator}' entre {left} y {right}.")
+        return 'bool'
+
+    def visit_LogicalOperation(self, node: LogicalOperation, symtab: Symtab):
+        self.visit(node.left_operand, symtab)
+        self.visit(node.right_operand, symtab)
+        return 'bool'
+
+    def visit_NotOperation(self, node: NotOperation, symtab: Symtab):
+        self.visit(node.operand, symtab)
+        return 'bool'
 
 
 def main(argv):
     if len(argv) != 2:
         print(f"Usage: python {argv[0]} filename")
         exit(1)
-    
-    filename = sys.argv[1]
-    with open(filename, 'r') as file:
-        text = file.read()
 
+    filename = sys.argv[1]
     lex = Lexer()
     parser = Parser()
-    Nodo = parser.parse(lex.tokenize(text))
+    Nodo = parser.parse(lex.tokenize_file(filename))
     semantico=Checker()
     Tabla= Symtab()
-    semantico.visit(Nodo,Tabla)
+    for message, node in semantico.check(Nodo,Tabla):
+        print(f'{type(node).__name__}: {message}')
+    exit(1 if semantico.errors else 0)
 
 
 if __name__ == '__main__':
     from sys import argv
-    main(argv)
\ No newline at end of file
+    main(argv)
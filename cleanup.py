@@ -0,0 +1,196 @@
+# cleanup.py
+'''
+Limpieza del código intermedio
+==============================
+Pases sobre cada IRFunction de intcode.py, después de generar el código y
+antes de bajarlo a bytecode.  Se repiten hasta que ninguno cambia nada:
+
+  thread_jumps      un salto a un bloque vacío o que solo salta a otro va
+                    directo al destino final; CBRANCH con los dos destinos
+                    iguales pasa a GOTO y un GOTO al bloque siguiente se
+                    elimina.
+  remove_unreachable  bloques sin camino desde la entrada (el código que
+                    sigue a un return o a un break, por ejemplo).
+  remove_dead       instrucciones sin efectos cuyo resultado no se usa
+                    (dataflow.Liveness): registros temporales de Binop y
+                    asignaciones a variables locales que no se vuelven a
+                    leer.  Las divisiones y lecturas de arreglos se conservan
+                    porque pueden fallar en ejecución.
+  merge_blocks      un bloque que solo se alcanza desde el anterior, cayendo
+                    en él, se une a ese bloque.
+
+cleanup_program() devuelve, por función, la cantidad de instrucciones antes
+y después.
+'''
+from intcode import Instruction, TERMINATORS
+from dataflow import CFG, Liveness, PURE_OPS
+
+# Instrucciones que se pueden borrar si su resultado no se usa
+REMOVABLE = (PURE_OPS - {'DIVI', 'DIVF'}) | {'MOVI', 'MOVF'}
+
+
+def thread_jumps(func):
+    blocks = func.basic_blocks()
+    by_label = {b.label: b for b in blocks if b.label is not None}
+
+    def forward(label):
+        '''Etiqueta a la que termina saltando label'''
+        seen = set()
+        while label not in seen:
+            seen.add(label)
+            block = by_label[label]
+            if block.instrs and block.instrs[0].op == 'GOTO':
+                label = block.instrs[0].args[0]
+            elif not block.instrs and block.index + 1 < len(blocks) \
+                    and blocks[block.index + 1].label is not None:
+                label = blocks[block.index + 1].label
+            else:
+                break
+        return label
+
+    changed = False
+    for b in blocks:
+        if not b.instrs:
+            continue
+        last = b.instrs[-1]
+        if last.op == 'GOTO':
+            target = forward(last.args[0])
+            nxt = blocks[b.index + 1] if b.index + 1 < len(blocks) else None
+            if nxt is not None and nxt.label is not None and forward(nxt.label) == target:
+                b.instrs.pop()
+                changed = True
+            elif target != last.args[0]:
+                b.instrs[-1] = Instruction('GOTO', (target,))
+                changed = True
+        elif last.op == 'CBRANCH':
+            test, iftrue, iffalse = last.args
+            iftrue, iffalse = forward(iftrue), forward(iffalse)
+            if iftrue == iffalse:
+                b.instrs[-1] = Instruction('GOTO', (iftrue,))
+                changed = True
+            elif (iftrue, iffalse) != last.args[1:]:
+                b.instrs[-1] = Instruction('CBRANCH', (test, iftrue, iffalse))
+                changed = True
+    if changed:
+        func.set_blocks(blocks)
+    return changed
+
+
+def remove_unreachable(func):
+    blocks = func.basic_blocks()
+    if not blocks:
+        return False
+    reached = [False] * len(blocks)
+    reached[0] = True
+    stack = [0]
+    while stack:
+        for s in blocks[stack.pop()].succs:
+            if not reached[s]:
+                reached[s] = True
+                stack.append(s)
+    if all(reached):
+        return False
+    func.set_blocks([b for b in blocks if reached[b.index]])
+    return True
+
+
+def remove_dead(func):
+    cfg = CFG(func)
+    live = Liveness(cfg).solve()
+    local_scalars = {v.name for v in func.params + func.locals if v.size is None}
+    changed = False
+    for b in cfg.blocks:
+        # De atrás hacia adelante: los operandos de una instrucción borrada
+        # no cuentan como usos, así una cadena de temporales muertos se
+        # elimina en una sola pasada
+        after = live.outs[b.index]
+        keep = []
+        for instr in reversed(b.instrs):
+            if instr.op in REMOVABLE:
+                dst = instr.args[-1]
+                if (not isinstance(dst, str) or dst in local_scalars) \
+                        and not after & live.universe.bit(dst):
+                    changed = True
+                    continue
+            uses, defs = live.instr_sets(instr)
+            after = (after & ~defs) | uses
+            keep.append(instr)
+        keep.reverse()
+        b.instrs = keep
+    if changed:
+        func.set_blocks(cfg.blocks)
+    return changed
+
+
+def merge_blocks(func):
+    blocks = func.basic_blocks()
+    npreds = [0] * len(blocks)
+    for b in blocks:
+        for s in b.succs:
+            npreds[s] += 1
+
+    merged = []
+    changed = False
+    for b in blocks:
+        prev = merged[-1] if merged else None
+        if prev is not None and npreds[b.index] == 1 and b.index != 0 \
+                and not (prev.instrs and prev.instrs[-1].op in TERMINATORS) \
+                and b.index in prev.succs:
+            prev.instrs.extend(b.instrs)
+            prev.succs = b.succs
+            changed = True
+            continue
+        merged.append(b)
+    if changed:
+        func.set_blocks(merged)
+    return changed
+
+
+PASSES = [thread_jumps, remove_unreachable, remove_dead, merge_blocks]
+
+
+def cleanup(func):
+    '''
+    Aplica los pases a func hasta que no cambie.  Devuelve (antes, después)
+    en cantidad de instrucciones.
+    '''
+    before = len(func.code)
+    changed = True
+    while changed:
+        changed = False
+        for apply in PASSES:
+            changed |= apply(func)
+    return before, len(func.code)
+
+
+def cleanup_program(functions):
+    '''Limpia todas las funciones (dict nombre -> IRFunction)'''
+    return {name: cleanup(func) for name, func in functions.items()}
+
+
+def main(argv):
+    if len(argv) != 2:
+        print(f"Usage: python {argv[0]} filename")
+        exit(1)
+
+    from plex import Lexer
+    from pparser import Parser
+    from intcode import IntermediateCodeGenerator
+
+    ast = Parser().parse(Lexer().tokenize_file(argv[1]))
+    gen = IntermediateCodeGenerator()
+    gen.generate_code(ast)
+    stats = cleanup_program(gen.functions)
+
+    total_before = total_after = 0
+    print(f'{"function":<24} {"before":>7} {"after":>7} {"removed":>8}')
+    for name, (before, after) in stats.items():
+        print(f'{name:<24} {before:>7} {after:>7} {before - after:>8}')
+        total_before += before
+        total_after += after
+    print(f'{"total":<24} {total_before:>7} {total_after:>7} {total_before - total_after:>8}')
+
+
+if __name__ == '__main__':
+    import sys
+    main(sys.argv)
@@ -1,45 +1,374 @@
 # context.py
 '''
-Clase de alto nivel que contiene todo sobre el análisis/ejecución de un programa PL0.
+Clase de alto nivel que contiene todo sobre el análisis/ejecución de un programa PL0.
 
-Sirve como repositorio de información sobre el programa, incluido el código fuente, informe de errores, etc.
+Sirve como repositorio de información sobre el programa, incluido el código fuente, informe de errores, etc.
+
+Modo incremental
+----------------
+Con incremental=True (por defecto) el Context conserva, de cada función de
+nivel superior, su FunDefinition, su posición en el fuente y las posiciones
+de sus nodos.  Cuando parse() recibe una nueva versión del fuente:
+
+  1. se compara con la anterior (prefijo y sufijo comunes);
+  2. las funciones que quedan completas dentro del prefijo o del sufijo se
+     reutilizan tal cual (las del sufijo solo se desplazan);
+  3. solo el tramo intermedio se vuelve a tokenizar y a analizar, función
+     por función.
+
+check() hace lo mismo con la tabla de símbolos: solo vuelve a revisar las
+funciones que cambiaron y las que las llaman.  Si el tramo modificado no se
+puede analizar por separado (errores, sentencias sueltas, comentarios sin
+cerrar...) se vuelve a analizar el programa completo como antes.
 '''
-#from interp  import Interpreter
-from modelo   import Node
+from contextlib import redirect_stdout
+import copy
+import io
+
+from vm       import VM
+from interp   import Interpreter
+from modelo   import Node, Program, FunctionCall
 from plex    import Lexer
 from pparser  import Parser
+from checker  import Checker, Symtab
+from fold     import fold
+from typesys  import return_types
+
+
+# Motores de ejecución disponibles para Context.run()
+engines = {
+  'vm'      : VM,
+  'closure' : Interpreter,
+}
+
+
+class Chunk:
+  '''
+  Una función de nivel superior del último parse.  lines/indices son las
+  posiciones de sus nodos relativas al inicio de la función.
+  '''
+  def __init__(self, name, start, end, lineno, ast, lines, indices):
+    self.name    = name
+    self.start   = start
+    self.end     = end
+    self.lineno  = lineno
+    self.ast     = ast
+    self.lines   = lines
+    self.indices = indices
+    self.errors  = []
+    self._calls  = None
+
+  @property
+  def calls(self):
+    '''Nombres de las funciones que llama (se calcula una vez)'''
+    if self._calls is None:
+      self._calls = {id_.identifier for id_ in walk(self.ast) if isinstance(id_, FunctionCall)}
+    return self._calls
+
+
+def walk(node):
+  stack = [node]
+  while stack:
+    node = stack.pop()
+    if isinstance(node, list):
+      stack.extend(node)
+    elif isinstance(node, Node):
+      yield node
+      stack.extend(getattr(node, name) for name in node._fields)
+
+
+def common_prefix(a, b):
+  lo, hi = 0, min(len(a), len(b))
+  while lo < hi:
+    mid = (lo + hi + 1) // 2
+    if a[:mid] == b[:mid]:
+      lo = mid
+    else:
+      hi = mid - 1
+  return lo
+
+
+def common_suffix(a, b, limit):
+  lo, hi = 0, limit
+  while lo < hi:
+    mid = (lo + hi + 1) // 2
+    if a[len(a) - mid:] == b[len(b) - mid:]:
+      lo = mid
+    else:
+      hi = mid - 1
+  return lo
+
+
+def function_spans(tokens):
+  '''
+  Divide tokens en funciones de nivel superior.  Devuelve una lista de
+  (primero, último) índices de token o None si hay algo fuera de una función
+  o los begin/end no cierran.
+  '''
+  spans = []
+  depth = []          # begin/end abiertos de cada función (las anidadas incluidas)
+  first = 0
+  for n, tok in enumerate(tokens):
+    if not depth:
+      if tok.type != 'FUN':
+        return None
+      first = n
+    if tok.type == 'FUN':
+      depth.append(0)
+    elif tok.type == 'BEGIN':
+      depth[-1] += 1
+    elif tok.type == 'END':
+      if depth[-1] <= 0:
+        return None
+      depth[-1] -= 1
+      if depth[-1] == 0:
+        depth.pop()
+        if not depth:
+          spans.append((first, n))
+  return spans if not depth else None
 
 
 class Context:
 
-  def __init__(self):
+  def __init__(self, engine='vm', incremental=True, optimize=True, memo=0):
     self.lexer  = Lexer()
     self.parser = Parser()
-    #self.interp = Interpreter(self)
+    self.optimize = optimize    # Plegado (fold.py), limpieza del IR (cleanup.py) y vectorize.py
+    self.memo = memo            # Entradas del caché de las funciones puras (effects.py); 0 = sin caché
+    self.interp = engines[engine](self)     # Lee optimize y memo al construirse
     self.source = ''
     self.ast    = None
     self.have_errors = False
+    self.incremental = incremental
+    self.chunks  = []           # Funciones del último parse (modo incremental)
+    self.roots   = {}           # id(FunDefinition) -> Chunk
+    self.symtab  = None
+    self.checked = {}           # nombre -> Chunk revisado por check()
 
   def parse(self, source):
     self.have_errors = False
-    self.source = source
+    old, self.source = self.source, source
+
+    if self.incremental:
+      chunks = self.reparse(old, source)
+      if chunks is not None:
+        self.chunks = chunks
+        self.roots = {id(chunk.ast): chunk for chunk in chunks}
+        self.ast = Program([chunk.ast for chunk in chunks])
+        return
+
+    self.chunks = []
+    self.roots = {}
+    self.checked = {}
+    self.parser._line_positions = {}
+    self.parser._index_positions = {}
     self.ast = self.parser.parse(self.lexer.tokenize(self.source))
 
+  def reparse(self, old, new):
+    '''
+    Vuelve a analizar solo el tramo de new que cambió respecto de old.
+    Devuelve la nueva lista de Chunk o None si hay que analizar todo.
+    '''
+    prefix = common_prefix(old, new)
+    suffix = common_suffix(old, new, min(len(old), len(new)) - prefix)
+    delta  = len(new) - len(old)
+
+    # Solo se reutilizan funciones con al menos un carácter intacto alrededor
+    head = [c for c in self.chunks if c.end < prefix]
+    tail = [c for c in self.chunks if c.start > len(old) - suffix]
+
+    start    = head[-1].end if head else 0
+    stop     = tail[0].start + delta if tail else len(new)
+    old_stop = tail[0].start if tail else len(old)
+
+    self.lexer.error_count = 0
+    self.parser.error_count = 0
+    lineno = new.count('\n', 0, start) + 1
+    chunks = []
+    with redirect_stdout(io.StringIO()):
+      tokens = list(self.lexer.tokenize(new[start:stop], lineno=lineno))
+      spans = function_spans(tokens)
+      if self.lexer.error_count or spans is None:
+        return None
+
+      for first, last in spans:
+        chunk = self.parse_function(tokens[first:last + 1], start)
+        if chunk is None:
+          return None
+        chunks.append(chunk)
+
+    dlines = new.count('\n', start, stop) - old.count('\n', start, old_stop)
+    for chunk in tail:
+      chunk.start  += delta
+      chunk.end    += delta
+      chunk.lineno += dlines
+    return head + chunks + tail
+
+  def parse_function(self, tokens, offset):
+    base, line = tokens[0].index, tokens[0].lineno
+    for tok in tokens:
+      tok.index  -= base
+      tok.end    -= base
+      tok.lineno -= line - 1
+
+    self.parser._line_positions = {}
+    self.parser._index_positions = {}
+    result = self.parser.parse(iter(tokens))
+    if self.parser.error_count or result is None:
+      return None
+    fun = result.funclist[0]
+
+    # Solo se guardan posiciones de nodos vivos de esta función: los ids de
+    # objetos temporales del parser podrían reaparecer en otra función.
+    ids = {id(node) for node in walk(fun)}
+    lines   = {k: v for k, v in self.parser._line_positions.items() if k in ids}
+    indices = {k: v for k, v in self.parser._index_positions.items() if k in ids}
+    return Chunk(fun.name, offset + base, offset + base + tokens[-1].end, line, fun, lines, indices)
+
+  def function_names(self):
+    if isinstance(self.ast, Program):
+      return [getattr(f, 'name', None) for f in self.ast.funclist]
+    return []
+
+  def define(self, text):
+    '''
+    Agrega las funciones de text al programa.  Las que ya existen con el
+    mismo nombre se reemplazan en su lugar, de modo que parse() solo vuelve
+    a analizar esas funciones.
+    '''
+    source = self.source
+    with redirect_stdout(io.StringIO()):
+      tokens = list(Lexer().tokenize(text))
+    spans = function_spans(tokens)
+    existing = {chunk.name: chunk for chunk in self.chunks}
+
+    if spans:
+      appended = []
+      replaced = []
+      for first, last in spans:
+        name = tokens[first + 1].value
+        body = text[tokens[first].index:tokens[last].end]
+        if name in existing:
+          replaced.append((existing[name], body))
+        else:
+          appended.append(body)
+      for chunk, body in sorted(replaced, key=lambda r: r[0].start, reverse=True):
+        source = source[:chunk.start] + body + source[chunk.end:]
+      text = '\n\n'.join(appended)
+
+    if text:
+      source = f'{source}\n\n{text}' if source else text
+    self.parse(source)
+    return source
+
+  def check(self):
+    '''
+    Análisis semántico.  En modo incremental solo se revisan las funciones
+    que cambiaron desde el último check() y las que llaman a alguna de ellas;
+    los errores de las demás se vuelven a informar desde la última revisión.
+    '''
+    if not self.chunks:
+      self.symtab = Symtab()
+      self.checked = {}
+      checker = Checker()
+      try:
+        checker.check(self.ast, self.symtab)
+      except Exception as e:
+        checker.error(str(e), 'check')
+      for message, node in checker.errors:
+        self.error(message, node)
+      return
+
+    if self.symtab is None or not self.checked:
+      self.symtab = Symtab()
+      self.checked = {}
+
+    current = {}
+    for chunk in self.chunks:
+      current.setdefault(chunk.name, []).append(chunk)
+
+    changed = {name for name, chunk in self.checked.items()
+               if current.get(name) != [chunk]}
+    changed |= {name for name in current if name not in self.checked}
+    recheck = {chunk.name for chunk in self.chunks
+               if chunk.name in changed or chunk.calls & changed}
+
+    for name in recheck | changed:
+      entry = self.symtab.entries.pop(name, None)
+      if isinstance(entry, tuple) and entry[1] in self.symtab.children:
+        self.symtab.children.remove(entry[1])
+      self.checked.pop(name, None)
+
+    # Primero se declaran todas las funciones a revisar, para que las
+    # llamadas a funciones que están más abajo en el fuente se resuelvan
+    checker = Checker()
+    checker.rettypes = return_types(self.ast)
+    scopes = {}
+    for chunk in self.chunks:
+      if chunk.name in recheck:
+        start = len(checker.errors)
+        scopes[id(chunk)] = checker.declare(chunk.ast, self.symtab)
+        chunk.errors = checker.errors[start:]
+
+    for chunk in self.chunks:
+      if chunk.name in recheck:
+        start = len(checker.errors)
+        try:
+          checker.function(chunk.ast, scopes[id(chunk)])
+        except Exception as e:
+          checker.error(str(e), chunk.ast)
+        chunk.errors += checker.errors[start:]
+        self.checked[chunk.name] = chunk
+      for message, node in chunk.errors:
+        self.error(message, node)
+
+    if 'main' not in current:
+      self.error("No se encontró la función 'main' en el programa.", 'check')
+
   def run(self):
     if not self.have_errors:
-      return self.interp.interpret(self.ast)
+      ast = self.ast
+      if self.optimize:
+        # Se pliega una copia: los FunDefinition de self.chunks se reutilizan
+        # en el próximo parse()/check() y tienen que seguir siendo el fuente
+        ast = copy.deepcopy(self.ast)
+        fold(ast)
+      return self.interp.interpret(ast)
+
+  def position(self, node):
+    '''
+    (línea, inicio, fin) de node en el fuente completo, o None
+    '''
+    key = id(node)
+    chunks = [self.roots[key]] if key in self.roots else self.chunks
+    for chunk in chunks:
+      if key in chunk.indices:
+        start, end = chunk.indices[key]
+        if start is None:
+          return None
+        return chunk.lineno + chunk.lines[key] - 1, chunk.start + start, chunk.start + end
+    if self.chunks:
+      return None
+    try:
+      start, end = self.parser.index_position(node)
+    except KeyError:
+      return None
+    if start is None:
+      return None
+    return self.parser.line_position(node), start, end
 
   def find_source(self, node):
-    indices = self.parser.index_position(node)
-    if indices:
-      return self.source[indices[0]:indices[1]]
+    pos = self.position(node)
+    if pos:
+      return self.source[pos[1]:pos[2]]
     else:
       return f'{type(node).__name__} (fuente no disponible)'
 
   def error(self, message, position):
-    if isinstance(position, Node):
-      lineno = self.parser.line_position(position)
-      (start, end) = (part_start, part_end) = self.parser.index_position(position)
+    pos = self.position(position) if isinstance(position, Node) else None
+    if pos:
+      lineno, start, end = pos
+      (part_start, part_end) = (start, end)
       while start >= 0 and self.source[start] != '\n':
         start -=1
 
@@ -56,4 +385,3 @@ class Context:
       print(f'{position}: {message}')
 
     self.have_errors = True
-
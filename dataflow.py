@@ -0,0 +1,431 @@
+# dataflow.py
+'''
+Grafo de flujo de control y análisis de flujo de datos
+======================================================
+Se construye sobre el IR de intcode.py:
+
+  CFG(func)         bloques básicos de un IRFunction con sus sucesores y
+                    predecesores, el orden posorden inverso (rpo) y los
+                    bloques inalcanzables.
+
+  Analysis          resolvedor genérico por lista de trabajo.  Cada análisis
+                    define su dirección, el operador de encuentro (unión o
+                    intersección) y los conjuntos gen/kill de cada bloque.
+
+Los conjuntos son bitsets: enteros de Python en los que el bit i representa
+el elemento i de un Universe.  La unión, intersección y diferencia son una
+sola operación sobre enteros.  La lista de trabajo procesa los bloques en
+posorden inverso (o su inverso si el análisis es hacia atrás) y solo vuelve
+a visitar un bloque cuando cambia la salida de alguno de sus vecinos: cada
+bloque se visita unas pocas veces (según la profundidad de los lazos) y en
+la práctica el costo crece linealmente con el número de bloques.
+
+Análisis incluidos:
+
+  Liveness              (hacia atrás, unión)     variables y registros vivos
+  ReachingDefinitions   (hacia adelante, unión)  definiciones que alcanzan
+  AvailableExpressions  (hacia adelante, inters.) expresiones ya calculadas
+  Dominators            (hacia adelante, inters.) dominadores de cada bloque
+
+Efectos de las llamadas: una función anidada lee y escribe las variables de
+las funciones que la contienen, así que un CALL a una función anidada
+('padre.hija') cuenta como uso y posible definición de todas las variables
+(no registros) de la función.  Las variables no locales siguen vivas al
+salir de la función.
+'''
+from heapq import heappop, heappush
+
+from intcode import Register
+
+# Opcodes cuyo resultado depende solo de sus operandos
+PURE_OPS = {
+    'ADDI', 'ADDF', 'SUBI', 'SUBF', 'MULI', 'MULF', 'DIVI', 'DIVF',
+    'NEGI', 'NEGF', 'LT', 'LTE', 'GT', 'GTE', 'EQ', 'NEQ', 'AND', 'OR', 'NOT',
+    'ITOF', 'FTOI',
+}
+
+
+class Universe:
+    '''
+    Numeración de los elementos de un conjunto para representarlo como bitset
+    '''
+    def __init__(self, items=()):
+        self.items = []
+        self.index = {}
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, item):
+        if item not in self.index:
+            self.index[item] = len(self.items)
+            self.items.append(item)
+        return self.index[item]
+
+    def bit(self, item):
+        return 1 << self.index[item]
+
+    def mask(self, items):
+        bits = 0
+        for item in items:
+            bits |= 1 << self.index[item]
+        return bits
+
+    @property
+    def full(self):
+        return (1 << len(self.items)) - 1
+
+    def decode(self, bits):
+        '''Elementos de bits, en orden de numeración'''
+        items = []
+        while bits:
+            low = bits & -bits
+            items.append(self.items[low.bit_length() - 1])
+            bits ^= low
+        return items
+
+
+class CFG:
+    def __init__(self, func):
+        self.func = func
+        self.blocks = func.basic_blocks()
+        self.succs = [b.succs for b in self.blocks]
+        self.preds = [[] for _ in self.blocks]
+        for b in self.blocks:
+            for s in b.succs:
+                self.preds[s].append(b.index)
+
+        # Posorden inverso desde la entrada, sin recursión.  Los sucesores se
+        # recorren del último al primero: así el cuerpo de un while (destino
+        # verdadero del CBRANCH) queda antes de su salida y no después de
+        # todo el resto de la función.
+        order = []
+        seen = [False] * len(self.blocks)
+        if self.blocks:
+            seen[0] = True
+            stack = [(0, reversed(self.succs[0]))]
+            while stack:
+                node, children = stack[-1]
+                for child in children:
+                    if not seen[child]:
+                        seen[child] = True
+                        stack.append((child, reversed(self.succs[child])))
+                        break
+                else:
+                    stack.pop()
+                    order.append(node)
+        order.reverse()
+        self.rpo = order
+        self.unreachable = [b.index for b in self.blocks if not seen[b.index]]
+
+        # Variables (no registros) de la función y las no locales
+        local_names = {v.name for v in func.params} | {v.name for v in func.locals}
+        names = {}
+        for b in self.blocks:
+            for instr in b.instrs:
+                for op in instr.defs() + instr.uses():
+                    if isinstance(op, str):
+                        names[op] = None
+        self.variables = list(names)
+        self.nonlocal_vars = [n for n in names if n not in local_names]
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def clobbers(self, instr):
+        '''Variables que instr puede leer o escribir además de sus operandos'''
+        if instr.op == 'CALL' and '.' in instr.args[0]:
+            return self.variables
+        return ()
+
+    def edges(self):
+        return sum(len(s) for s in self.succs)
+
+
+class Analysis:
+    '''
+    Resolvedor por lista de trabajo.  Las subclases llenan universe, gen,
+    kill y boundary (valor en la entrada, o en la salida si el análisis es
+    hacia atrás) y fijan forward y meet ('union' o 'intersection').
+
+    Con la transferencia out = gen | (in & ~kill), solve() deja en ins/outs
+    los bitsets de la entrada y salida de cada bloque (en el sentido del
+    programa, no del análisis).
+    '''
+    forward = True
+    meet = 'union'
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.universe = Universe()
+        self.gen = [0] * len(cfg)
+        self.kill = [0] * len(cfg)
+        self.boundary = 0
+        self.ins = []
+        self.outs = []
+        self.iterations = 0         # Bloques procesados por solve()
+
+    def solve(self):
+        cfg = self.cfg
+        n = len(cfg)
+        gen, kill = self.gen, self.kill
+        if self.forward:
+            order = cfg.rpo + cfg.unreachable
+            sources, targets = cfg.preds, cfg.succs
+            start = {0}
+        else:
+            order = list(reversed(cfg.rpo)) + cfg.unreachable
+            sources, targets = cfg.succs, cfg.preds
+            start = {b for b in range(n) if not cfg.succs[b]}
+
+        top = self.universe.full if self.meet == 'intersection' else 0
+        before = [top] * n          # Valor antes de la transferencia
+        after = [top] * n           # Valor después de la transferencia
+        intersect = self.meet == 'intersection'
+
+        # Lista de trabajo ordenada por posición en order: con una cola FIFO
+        # cada arco de retorno volvería a propagar todo lo que sigue al lazo
+        position = [0] * n
+        for k, b in enumerate(order):
+            position[b] = k
+        worklist = list(range(n))
+        queued = [True] * n
+        while worklist:
+            b = order[heappop(worklist)]
+            queued[b] = False
+            self.iterations += 1
+
+            if intersect:
+                value = top
+                for s in sources[b]:
+                    value &= after[s]
+                if b in start:
+                    value &= self.boundary
+                elif not sources[b]:
+                    value = 0       # Inalcanzable: nada está disponible
+            else:
+                value = self.boundary if b in start else 0
+                for s in sources[b]:
+                    value |= after[s]
+            before[b] = value
+
+            out = gen[b] | (value & ~kill[b])
+            if out != after[b]:
+                after[b] = out
+                for t in targets[b]:
+                    if not queued[t]:
+                        queued[t] = True
+                        heappush(worklist, position[t])
+
+        if self.forward:
+            self.ins, self.outs = before, after
+        else:
+            self.ins, self.outs = after, before
+        return self
+
+    def decode(self, bits):
+        return self.universe.decode(bits)
+
+
+class Liveness(Analysis):
+    '''
+    Variables y registros vivos.  ins[b]/outs[b] son los vivos a la entrada y
+    salida del bloque b.
+    '''
+    forward = False
+    meet = 'union'
+
+    def __init__(self, cfg):
+        super().__init__(cfg)
+        universe = self.universe
+        for name in cfg.variables:
+            universe.add(name)
+        for b in cfg.blocks:
+            for instr in b.instrs:
+                for op in instr.defs() + instr.uses():
+                    universe.add(op)
+
+        for b in cfg.blocks:
+            self.gen[b.index], self.kill[b.index] = self.block_sets(b)
+        self.boundary = universe.mask(cfg.nonlocal_vars)
+
+    def instr_sets(self, instr):
+        '''(usos, definiciones) de instr como bitsets'''
+        mask = self.universe.mask
+        uses = mask(instr.uses()) | mask(self.cfg.clobbers(instr))
+        return uses, mask(instr.defs())
+
+    def block_sets(self, block):
+        use = defs = 0
+        for instr in reversed(block.instrs):
+            u, d = self.instr_sets(instr)
+            use = (use & ~d) | u
+            defs |= d
+        return use, defs
+
+    def live_after(self, block):
+        '''
+        (instrucción, vivos después de ella) para las instrucciones de block,
+        de la última a la primera
+        '''
+        live = self.outs[block.index]
+        for instr in reversed(block.instrs):
+            yield instr, live
+            uses, defs = self.instr_sets(instr)
+            live = (live & ~defs) | uses
+
+
+class ReachingDefinitions(Analysis):
+    '''
+    Definiciones que alcanzan cada bloque.  Cada elemento del universo es
+    (bloque, posición) de una instrucción que escribe una variable o
+    registro; las definiciones posibles de un CALL a una función anidada se
+    agregan sin matar a las anteriores.
+    '''
+    forward = True
+    meet = 'union'
+
+    def __init__(self, cfg):
+        super().__init__(cfg)
+        universe = self.universe
+        self.defines = {}           # (bloque, posición) -> nombres que define
+        by_name = {}
+        for b in cfg.blocks:
+            for n, instr in enumerate(b.instrs):
+                names = instr.defs() + tuple(cfg.clobbers(instr))
+                if names:
+                    key = (b.index, n)
+                    universe.add(key)
+                    self.defines[key] = names
+                    for name in names:
+                        by_name.setdefault(name, []).append(key)
+        masks = {name: universe.mask(keys) for name, keys in by_name.items()}
+
+        for b in cfg.blocks:
+            gen = kill = 0
+            for n, instr in enumerate(b.instrs):
+                key = (b.index, n)
+                if key not in self.defines:
+                    continue
+                bit = universe.bit(key)
+                for name in instr.defs():
+                    gen &= ~masks[name]
+                    kill |= masks[name]
+                gen |= bit
+                kill &= ~bit
+            self.gen[b.index] = gen
+            self.kill[b.index] = kill
+
+    def definitions(self, bits, name=None):
+        '''Instrucciones (bloque, posición) de bits, opcionalmente de name'''
+        keys = self.decode(bits)
+        if name is not None:
+            keys = [k for k in keys if name in self.defines[k]]
+        return keys
+
+
+class Dominators(Analysis):
+    '''
+    Bloques que dominan a cada bloque: outs[b] son los que están en todo
+    camino desde la entrada hasta b, incluido b.
+    '''
+    forward = True
+    meet = 'intersection'
+
+    def __init__(self, cfg):
+        super().__init__(cfg)
+        for b in cfg.blocks:
+            self.universe.add(b.index)
+            self.gen[b.index] = 1 << b.index
+
+    def dominates(self, a, b):
+        return bool(self.outs[b] >> a & 1)
+
+
+def expression(instr):
+    '''Clave de la expresión que calcula instr, o None si no es pura'''
+    if instr.op not in PURE_OPS:
+        return None
+    return (instr.op,) + instr.args[:-1]
+
+
+class AvailableExpressions(Analysis):
+    '''
+    Expresiones (op, operandos...) calculadas en todos los caminos hasta el
+    bloque y cuyos operandos no cambiaron desde entonces.
+    '''
+    forward = True
+    meet = 'intersection'
+
+    def __init__(self, cfg):
+        super().__init__(cfg)
+        universe = self.universe
+        by_operand = {}
+        for b in cfg.blocks:
+            for instr in b.instrs:
+                expr = expression(instr)
+                if expr is not None and expr not in universe.index:
+                    universe.add(expr)
+                    for op in expr[1:]:
+                        if isinstance(op, (str, Register)):
+                            by_operand.setdefault(op, []).append(expr)
+        self.masks = {op: universe.mask(exprs) for op, exprs in by_operand.items()}
+
+        for b in cfg.blocks:
+            gen = kill = 0
+            for instr in b.instrs:
+                expr = expression(instr)
+                if expr is not None:
+                    gen |= universe.bit(expr)
+                killed = self.killed(instr)
+                gen &= ~killed
+                kill |= killed
+            self.gen[b.index] = gen
+            self.kill[b.index] = kill & ~gen
+
+    def killed(self, instr):
+        '''Expresiones que deja de estar disponibles después de instr'''
+        bits = 0
+        for name in instr.defs() + tuple(self.cfg.clobbers(instr)):
+            bits |= self.masks.get(name, 0)
+        return bits
+
+
+def main(argv):
+    if len(argv) != 2:
+        print(f"Usage: python {argv[0]} filename")
+        exit(1)
+
+    from plex import Lexer
+    from pparser import Parser
+    from intcode import IntermediateCodeGenerator
+
+    ast = Parser().parse(Lexer().tokenize_file(argv[1]))
+    gen = IntermediateCodeGenerator()
+    gen.generate_code(ast)
+
+    def names(items):
+        return ' '.join(str(item) for item in items) or '-'
+
+    for func in gen.functions.values():
+        cfg = CFG(func)
+        live = Liveness(cfg).solve()
+        reach = ReachingDefinitions(cfg).solve()
+        avail = AvailableExpressions(cfg).solve()
+        print(f'function {func.name}: {len(cfg)} blocks, {cfg.edges()} edges, '
+              f'{len(cfg.unreachable)} unreachable')
+        for b in cfg.blocks:
+            label = b.label or f'#{b.index}'
+            print(f'  {label}  preds={names(cfg.blocks[p].label or f"#{p}" for p in cfg.preds[b.index])}')
+            print(f'    live in:  {names(live.decode(live.ins[b.index]))}')
+            print(f'    live out: {names(live.decode(live.outs[b.index]))}')
+            print(f'    reaching: {len(reach.decode(reach.ins[b.index]))} definitions')
+            print(f'    avail:    {len(avail.decode(avail.ins[b.index]))} expressions')
+        print()
+
+
+if __name__ == '__main__':
+    import sys
+    main(sys.argv)
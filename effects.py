@@ -0,0 +1,249 @@
+# effects.py
+'''
+Análisis de efectos y memoización
+=================================
+Recorre los cuerpos de cada FunDefinition y resume sus efectos:
+
+  io          tiene write, read o print
+  mutates     asigna (o lee con read) un elemento de un arreglo parámetro,
+              que es del que llama
+  nonlocal    lee o escribe variables de una función que la contiene
+  calls       funciones que llama (nombres calificados, 'padre.hija')
+
+Una función es pura si no tiene io, no modifica arreglos parámetro, no
+escribe variables no locales y solo llama a funciones puras (el grafo de
+llamadas puede tener ciclos: se parte de suponer puras a todas y se quitan
+hasta que no cambia).  Para memoizarla además su resultado tiene que
+depender solo de los argumentos: ningún parámetro es un arreglo, no lee
+variables no locales y todas las que llama son memoizables.
+
+En modo memoización (pl0.py --memo) los motores de ejecución guardan el
+resultado de cada función memoizable en un Memo: un caché LRU acotado cuya
+clave es la tupla de argumentos.  Al terminar el programa se informan los
+aciertos y fallos por función.
+'''
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import sys
+
+from modelo import *
+from intcode import declarations, array_size
+
+MEMO_SIZE = 1024            # Entradas por función por omisión
+
+MISSING = object()
+
+
+@dataclass
+class Effects:
+    name: str                       # Nombre calificado
+    io: bool = False
+    mutates: bool = False
+    nonlocal_reads: bool = False
+    nonlocal_writes: bool = False
+    array_params: bool = False
+    calls: set = field(default_factory=set)
+    pure: bool = False
+    memoizable: bool = False
+
+
+class EffectAnalyzer(Visitor):
+    '''
+    Arma un Effects por función.  Los nombres de función se buscan como en
+    resolve.py: primero las anidadas de la función actual, luego las de las
+    que la contienen y al final las de nivel superior.
+    '''
+    def __init__(self):
+        self.effects = {}           # nombre calificado -> Effects
+        self.scopes = []            # (Effects, variables propias, arreglos parámetro, funciones)
+        self.globals = {}
+
+    def analyze(self, program):
+        self.visit(program)
+        solve(self.effects)
+        return self.effects
+
+    def generic_visit(self, node):
+        for name in node._fields:
+            value = getattr(node, name)
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, Node):
+                        self.visit(item)
+            elif isinstance(value, Node):
+                self.visit(value)
+
+    def declare(self, decls, prefix):
+        return {decl.name: f'{prefix}{decl.name}' for decl in decls if isinstance(decl, FunDefinition)}
+
+    def visit_Program(self, node):
+        self.globals = self.declare(node.funclist, '')
+        for func in node.funclist:
+            self.visit(func)
+
+    def visit_FunDefinition(self, node):
+        parent = self.scopes[-1][0].name + '.' if self.scopes else ''
+        effects = Effects(parent + node.name)
+        self.effects[effects.name] = effects
+
+        params = declarations(node.parameters)
+        decls = declarations(node.local_variables)
+        own = {p.name for p in params}
+        own.update(v.name for v in decls if not isinstance(v, FunDefinition))
+        arrays = {p.name for p in params if array_size(p.datatype) is not None}
+        effects.array_params = bool(arrays)
+
+        self.scopes.append((effects, own, arrays, self.declare(decls, effects.name + '.')))
+        for decl in decls:
+            if isinstance(decl, FunDefinition):
+                self.visit(decl)
+        for stmt in node.statements:
+            if stmt is not None:
+                self.visit(stmt)
+        self.scopes.pop()
+
+    def use(self, name, write=False, element=False):
+        effects, own, arrays, _ = self.scopes[-1]
+        if name not in own:
+            if write:
+                effects.nonlocal_writes = True
+            else:
+                effects.nonlocal_reads = True
+        elif write and element and name in arrays:
+            effects.mutates = True
+
+    def target(self, location):
+        if isinstance(location, ArrayLocation):
+            self.use(location.name, write=True, element=True)
+            self.visit(location.index)
+        else:
+            self.use(location.identifier, write=True)
+
+    def visit_AssignmentStatement(self, node):
+        self.target(node.location)
+        self.visit(node.expression)
+
+    def visit_ReadStatement(self, node):
+        self.scopes[-1][0].io = True
+        self.target(node.location)
+
+    def visit_WriteStatement(self, node):
+        self.scopes[-1][0].io = True
+        self.generic_visit(node)
+
+    def visit_PrintStatement(self, node):
+        self.scopes[-1][0].io = True
+
+    def visit_Identifier(self, node):
+        self.use(node.name)
+
+    def visit_Location(self, node):
+        self.use(node.identifier)
+
+    def visit_ArrayLocation(self, node):
+        self.use(node.name)
+        self.visit(node.index)
+
+    def visit_FunctionCall(self, node):
+        for _, _, _, functions in reversed(self.scopes):
+            if node.identifier in functions:
+                callee = functions[node.identifier]
+                break
+        else:
+            callee = self.globals.get(node.identifier, node.identifier)
+        self.scopes[-1][0].calls.add(callee)
+        self.generic_visit(node)
+
+
+def solve(effects):
+    '''Calcula pure y memoizable de cada Effects (punto fijo sobre las llamadas)'''
+    for e in effects.values():
+        e.pure = not (e.io or e.mutates or e.nonlocal_writes)
+        e.memoizable = e.pure and not (e.array_params or e.nonlocal_reads)
+    changed = True
+    while changed:
+        changed = False
+        for e in effects.values():
+            callees = [effects.get(name) for name in e.calls]
+            if e.pure and not all(c is not None and c.pure for c in callees):
+                e.pure = e.memoizable = False
+                changed = True
+            elif e.memoizable and not all(c.memoizable for c in callees):
+                e.memoizable = False
+                changed = True
+
+
+def analyze(program):
+    '''nombre calificado -> Effects de cada función de program'''
+    return EffectAnalyzer().analyze(program)
+
+
+def memoizable(program):
+    '''Nombres de las funciones de program que se pueden memoizar'''
+    return [name for name, e in analyze(program).items() if e.memoizable and name != 'main']
+
+
+class Memo:
+    '''Caché LRU de los resultados de una función, por tupla de argumentos'''
+    def __init__(self, name, size=MEMO_SIZE):
+        self.name = name
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(args):
+        # 3 y 3.0 son claves iguales en un dict pero no el mismo argumento
+        return tuple(args) + tuple(map(type, args))
+
+    def get(self, key):
+        value = self.entries.get(key, MISSING)
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
+def report(memos, file=None):
+    '''Escribe los aciertos y fallos de cada Memo (en stderr por omisión)'''
+    memos = list(memos)
+    if not memos:
+        return
+    file = file or sys.stderr
+    file.write(f'{"memoized function":<24} {"hits":>9} {"misses":>9} {"hit rate":>9} {"entries":>8}\n')
+    for memo in memos:
+        calls = memo.hits + memo.misses
+        if not calls:
+            continue
+        rate = memo.hits / calls
+        file.write(f'{memo.name:<24} {memo.hits:>9} {memo.misses:>9} {rate:>9.1%} {len(memo.entries):>8}\n')
+
+
+def main(argv):
+    if len(argv) != 2:
+        print(f"Usage: python {argv[0]} filename")
+        exit(1)
+
+    from plex import Lexer
+    from pparser import Parser
+
+    ast = Parser().parse(Lexer().tokenize_file(argv[1]))
+    print(f'{"function":<24} {"pure":>5} {"memo":>5}  effects')
+    for name, e in analyze(ast).items():
+        notes = [flag for flag in ('io', 'mutates', 'nonlocal_reads', 'nonlocal_writes', 'array_params')
+                 if getattr(e, flag)]
+        if e.calls:
+            notes.append('calls ' + ', '.join(sorted(e.calls)))
+        print(f'{name:<24} {"yes" if e.pure else "no":>5} {"yes" if e.memoizable else "no":>5}  {"; ".join(notes)}')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
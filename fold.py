@@ -0,0 +1,285 @@
+# fold.py
+'''
+Plegado de constantes y simplificación algebraica
+=================================================
+Pase sobre el AST que va entre el Checker y la generación de código.  Cada
+visit_* devuelve el nodo que reemplaza al visitado (el mismo si no cambia);
+los hijos se reemplazan en su lugar.
+
+  * Binop, UnaryOperation, RelationalOperation, LogicalOperation,
+    NotOperation e IntConversion/FloatConversion cuyos operandos son
+    IntegerNumber/FloatNumber se evalúan al compilar.  El tipo del resultado
+    es el de typesys._binary_ops; las combinaciones que no están en la
+    tabla (int + float, ...) no se tocan y la división por cero constante
+    se deja para la ejecución.
+  * Identidades: x+0, 0+x, x-0, x*1, 1*x, x/1 -> x;  x*0, 0*x -> 0 (enteros,
+    solo si x no tiene efectos: llamadas, divisiones, índices);  -(-x) -> x.
+  * Las condiciones no tienen un literal booleano propio: se pliegan a
+    IntegerNumber(1) / IntegerNumber(0), como los deja el código intermedio.
+    Un if/while con condición constante se reduce a la rama que corresponde
+    (o a skip).
+
+Los contadores folded y simplified quedan en el ConstantFolder.
+'''
+from modelo import *
+import typesys
+
+
+def _idiv(x, y):
+    q = x // y
+    if q < 0 and q * y != x:
+        q += 1          # PL0 trunca hacia cero
+    return q
+
+
+_evaluate = {
+    '+':   lambda x, y: x + y,
+    '-':   lambda x, y: x - y,
+    '*':   lambda x, y: x * y,
+    '/':   lambda x, y: _idiv(x, y) if isinstance(x, int) else x / y,
+    '<':   lambda x, y: x < y,
+    '<=':  lambda x, y: x <= y,
+    '>':   lambda x, y: x > y,
+    '>=':  lambda x, y: x >= y,
+    '==':  lambda x, y: x == y,
+    '!=':  lambda x, y: x != y,
+    'and': lambda x, y: x and y,
+    'or':  lambda x, y: x or y,
+}
+
+# Operadores del AST con otro nombre en typesys
+_aliases = { '<>': '!=' }
+
+
+def constant(node):
+    '''(valor, tipo) si node es un literal, si no None'''
+    if isinstance(node, IntegerNumber):
+        return node.value, 'int'
+    if isinstance(node, FloatNumber):
+        return node.value, 'float'
+    return None
+
+
+def literal(value, type):
+    if type == 'float':
+        return FloatNumber(float(value))
+    return IntegerNumber(int(value))
+
+
+def count_nodes(node):
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, Node):
+            count += 1
+            stack.extend(getattr(node, name) for name in node._fields)
+    return count
+
+
+def is_pure(node):
+    '''
+    True si evaluar node no tiene efectos: no llama funciones ni puede fallar
+    en ejecución (división, índice de arreglo)
+    '''
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (FunctionCall, ArrayLocation)):
+            return False
+        if isinstance(node, Binop) and node.op == '/':
+            return False
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, Node):
+            stack.extend(getattr(node, name) for name in node._fields)
+    return True
+
+
+class ConstantFolder(Visitor):
+    def __init__(self):
+        self.folded = 0             # Operaciones evaluadas al compilar
+        self.simplified = 0         # Identidades y sentencias reducidas
+
+    def fold(self, node):
+        return self.visit(node)
+
+    def generic_visit(self, node):
+        for name in node._fields:
+            value = getattr(node, name)
+            if isinstance(value, list):
+                for n, item in enumerate(value):
+                    if isinstance(item, Node):
+                        value[n] = self.visit(item)
+            elif isinstance(value, Node):
+                setattr(node, name, self.visit(value))
+        return node
+
+    # -----------------------------------------------------------------
+    # Expresiones
+    # -----------------------------------------------------------------
+    def binary(self, op, left, right):
+        '''Resultado plegado de left op right, o None'''
+        a, b = constant(left), constant(right)
+        if a is None or b is None:
+            return None
+        result_type = typesys.check_binary_op(_aliases.get(op, op), a[1], b[1])
+        if result_type is None or op not in _evaluate:
+            return None
+        if op == '/' and b[0] == 0:
+            return None
+        self.folded += 1
+        return literal(_evaluate[op](a[0], b[0]), 'int' if result_type == 'bool' else result_type)
+
+    def visit_Binop(self, node):
+        self.generic_visit(node)
+        result = self.binary(node.op, node.left, node.right)
+        if result is not None:
+            return result
+
+        left, right = constant(node.left), constant(node.right)
+        op = node.op
+        if right is not None:
+            if (op in ('+', '-') and right[0] == 0) or (op in ('*', '/') and right[0] == 1):
+                self.simplified += 1
+                return node.left
+            if op == '*' and right == (0, 'int') and is_pure(node.left):
+                self.simplified += 1
+                return node.right
+        if left is not None:
+            if (op == '+' and left[0] == 0) or (op == '*' and left[0] == 1):
+                self.simplified += 1
+                return node.right
+            if op == '*' and left == (0, 'int') and is_pure(node.right):
+                self.simplified += 1
+                return node.left
+        return node
+
+    def visit_UnaryOperation(self, node):
+        self.generic_visit(node)
+        operand = node.operand
+        if node.operator == '+':
+            self.simplified += 1
+            return operand
+        if node.operator == '-':
+            value = constant(operand)
+            if value is not None and typesys.check_unary_op('-', value[1]):
+                self.folded += 1
+                return literal(-value[0], value[1])
+            if isinstance(operand, UnaryOperation) and operand.operator == '-':
+                self.simplified += 1
+                return operand.operand
+        return node
+
+    def visit_RelationalOperation(self, node):
+        self.generic_visit(node)
+        result = self.binary(node.operator, node.left_operand, node.right_operand)
+        return node if result is None else result
+
+    def visit_LogicalOperation(self, node):
+        self.generic_visit(node)
+        left, right = constant(node.left_operand), constant(node.right_operand)
+        # Un lado neutro (and 1, or 0) se descarta; uno absorbente (and 0,
+        # or 1) decide el resultado solo si el otro lado no tiene efectos
+        if left is not None:
+            if node.operator == 'and' and left[0] or node.operator == 'or' and not left[0]:
+                self.simplified += 1
+                return node.right_operand
+            if is_pure(node.right_operand):
+                self.folded += 1
+                return IntegerNumber(1 if left[0] else 0)
+        if right is not None:
+            if node.operator == 'and' and right[0] or node.operator == 'or' and not right[0]:
+                self.simplified += 1
+                return node.left_operand
+            if is_pure(node.left_operand):
+                self.folded += 1
+                return IntegerNumber(1 if right[0] else 0)
+        return node
+
+    def visit_NotOperation(self, node):
+        self.generic_visit(node)
+        value = constant(node.operand)
+        if value is not None:
+            self.folded += 1
+            return IntegerNumber(0 if value[0] else 1)
+        if isinstance(node.operand, NotOperation):
+            self.simplified += 1
+            return node.operand.operand
+        return node
+
+    def visit_IntConversion(self, node):
+        self.generic_visit(node)
+        value = constant(node.expression)
+        if value is not None:
+            self.folded += 1
+            return IntegerNumber(int(value[0]))
+        return node
+
+    def visit_FloatConversion(self, node):
+        self.generic_visit(node)
+        value = constant(node.expression)
+        if value is not None:
+            self.folded += 1
+            return FloatNumber(float(value[0]))
+        return node
+
+    # -----------------------------------------------------------------
+    # Sentencias con condición constante
+    # -----------------------------------------------------------------
+    def visit_IfStatement(self, node):
+        self.generic_visit(node)
+        value = constant(node.condition)
+        if value is None:
+            return node
+        self.simplified += 1
+        return node.then_body if value[0] else SkipStatement()
+
+    def visit_IfElseStatement(self, node):
+        self.generic_visit(node)
+        value = constant(node.condition)
+        if value is None:
+            return node
+        self.simplified += 1
+        branch = node.then_body if value[0] else node.else_body
+        return branch if branch is not None else SkipStatement()
+
+    def visit_While(self, node):
+        self.generic_visit(node)
+        value = constant(node.relation)
+        if value is not None and not value[0]:
+            self.simplified += 1
+            return SkipStatement()
+        return node
+
+
+def fold(program):
+    '''
+    Pliega program en su lugar.  Devuelve el ConstantFolder con los contadores
+    '''
+    folder = ConstantFolder()
+    folder.fold(program)
+    return folder
+
+
+def main(argv):
+    if len(argv) != 2:
+        print(f"Usage: python {argv[0]} filename")
+        exit(1)
+
+    from plex import Lexer
+    from pparser import Parser
+
+    ast = Parser().parse(Lexer().tokenize_file(argv[1]))
+    before = count_nodes(ast)
+    folder = fold(ast)
+    print(ast)
+    print(f'{folder.folded} folded, {folder.simplified} simplified, '
+          f'{before - count_nodes(ast)} nodes removed')
+
+
+if __name__ == '__main__':
+    import sys
+    main(sys.argv)
@@ -0,0 +1,267 @@
+# inline.py
+'''
+Expansión en línea de funciones pequeñas
+========================================
+Pase sobre el IR de intcode.py.  Un CALL a una función pequeña se
+reemplaza por una copia de su código, sin crear un marco:
+
+  CALL    module, (11, 2), R6          MOVI    11, $inl0.x
+                                       MOVI    2, $inl0.y
+                               ==>     DIVI    $inl0.x, $inl0.y, R40
+                                       ...
+                                       MOVI    R42, $inl0.ret
+                                       GOTO    $inl0.end
+                                     $inl0.end:
+                                       MOVI    $inl0.ret, R6
+
+Los parámetros y las variables locales de la copia pasan a ser variables
+locales '$inl{n}.{nombre}' de quien llama (las locales se ponen en cero,
+como en cada llamada), los registros y las etiquetas se renombran y cada
+RETURN se convierte en una copia a '$inl{n}.ret' y un salto al final.  Así
+cada registro sigue teniendo una sola definición.
+
+Una función se expande si:
+
+  * tiene a lo sumo INLINE_SIZE instrucciones (sin contar los LABEL),
+  * no es recursiva: no puede llegar a sí misma en el grafo de llamadas,
+    así fib no se expande dentro de fib,
+  * no depende de su marco: solo usa sus propias variables (una función
+    anidada que lee las de su padre no se expande), solo llama a funciones
+    de nivel superior y no tiene funciones anidadas,
+  * no usa arreglos.
+
+Las funciones se procesan de las llamadas hacia las que llaman, así que una
+función pequeña que llama a otra pequeña se expande ya expandida.
+cleanup.py elimina después las copias de parámetros que no se usan.
+'''
+from intcode import Instruction, IRVariable, Register
+
+INLINE_SIZE = 12            # Instrucciones como máximo de una función expandible
+
+
+def size(func):
+    return sum(1 for instr in func.code if instr.op != 'LABEL')
+
+
+def call_graph(functions):
+    '''nombre -> conjunto de funciones que llama'''
+    return {name: {instr.args[0] for instr in func.code if instr.op == 'CALL'}
+            for name, func in functions.items()}
+
+
+def recursive(graph):
+    '''Funciones que pueden llegar a sí mismas en el grafo de llamadas'''
+    result = set()
+    for name in graph:
+        stack = list(graph[name])
+        seen = set()
+        while stack:
+            callee = stack.pop()
+            if callee == name:
+                result.add(name)
+                break
+            if callee not in seen:
+                seen.add(callee)
+                stack.extend(graph.get(callee, ()))
+    return result
+
+
+def bottom_up(graph):
+    '''Funciones en postorden: las llamadas antes que las que llaman'''
+    order = []
+    seen = set()
+    for root in graph:
+        if root in seen:
+            continue
+        seen.add(root)
+        stack = [(root, iter(sorted(graph[root])))]
+        while stack:
+            name, callees = stack[-1]
+            for callee in callees:
+                if callee not in seen and callee in graph:
+                    seen.add(callee)
+                    stack.append((callee, iter(sorted(graph[callee]))))
+                    break
+            else:
+                stack.pop()
+                order.append(name)
+    return order
+
+
+def self_contained(func, functions):
+    '''
+    True si func solo usa sus propias variables y llama solo a funciones de
+    nivel superior, de modo que no depende del marco en el que se ejecuta
+    '''
+    own = {var.name for var in func.params + func.locals}
+    for instr in func.code:
+        for op in instr.uses() + instr.defs():
+            if isinstance(op, str) and op not in own:
+                return False
+        if instr.op == 'CALL' and functions[instr.args[0]].parent is not None:
+            return False
+    return not any(f.parent == func.name for f in functions.values())
+
+
+def inlinable(func, functions, cycles):
+    return (func.name not in cycles
+            and size(func) <= INLINE_SIZE
+            and all(var.size is None for var in func.params + func.locals)
+            and self_contained(func, functions))
+
+
+class Inliner:
+    '''
+    Expande las llamadas de las funciones de un programa.  Numera los
+    registros después del mayor que ya existe y las copias con n.
+    '''
+    def __init__(self, functions):
+        self.functions = functions
+        self.next_register = 1 + max((op.num for func in functions.values()
+                                      for instr in func.code for op in operands(instr.args)
+                                      if isinstance(op, Register)), default=-1)
+        self.copies = 0
+
+    def new_register(self, type):
+        register = Register(self.next_register, type)
+        self.next_register += 1
+        return register
+
+    def expand(self, caller, call, callee):
+        '''Instrucciones que reemplazan a call (CALL a callee) en caller'''
+        n = self.copies
+        self.copies += 1
+        prefix = f'$inl{n}'
+        names = {}
+        code = []
+        for var, arg in zip(callee.params, call.args[1]):
+            names[var.name] = f'{prefix}.{var.name}'
+            caller.locals.append(IRVariable(names[var.name], var.type))
+            code.append(Instruction(move(var.type), (arg, names[var.name])))
+        for var in callee.locals:
+            names[var.name] = f'{prefix}.{var.name}'
+            caller.locals.append(IRVariable(names[var.name], var.type))
+            code.append(Instruction(move(var.type), (zero(var.type), names[var.name])))
+        ret = f'{prefix}.ret'
+        caller.locals.append(IRVariable(ret, callee.rettype))
+
+        labels = {}
+        registers = {}
+        end = f'{prefix}.end'
+
+        def label(name):
+            if name not in labels:
+                labels[name] = f'{name}.inl{n}'
+            return labels[name]
+
+        def value(op):
+            if isinstance(op, Register):
+                if op not in registers:
+                    registers[op] = self.new_register(op.type)
+                return registers[op]
+            if isinstance(op, str):
+                return names.get(op, op)
+            return op
+
+        for instr in callee.code:
+            op, args = instr.op, instr.args
+            if op in ('LABEL', 'GOTO'):
+                code.append(Instruction(op, (label(args[0]),)))
+            elif op == 'CBRANCH':
+                code.append(Instruction(op, (value(args[0]), label(args[1]), label(args[2]))))
+            elif op == 'PRINT':
+                code.append(instr)
+            elif op == 'CALL':
+                code.append(Instruction(op, (args[0], tuple(value(a) for a in args[1]), value(args[2]))))
+            elif op == 'RETURN':
+                code.append(Instruction(move(callee.rettype), (value(args[0]), ret)))
+                code.append(Instruction('GOTO', (end,)))
+            else:
+                code.append(Instruction(op, tuple(value(a) for a in args)))
+
+        # Retorno implícito al final de la función
+        code.append(Instruction(move(callee.rettype), (zero(callee.rettype), ret)))
+        code.append(Instruction('LABEL', (end,)))
+        code.append(Instruction(move(call.args[2].type), (ret, call.args[2])))
+        return code
+
+    def run(self):
+        '''
+        Expande las llamadas de todas las funciones.  Devuelve, por función,
+        las llamadas expandidas.
+        '''
+        graph = call_graph(self.functions)
+        cycles = recursive(graph)
+        candidates = {}             # nombre -> expandible, al verla por primera vez
+        expanded = {}
+        for name in bottom_up(graph):
+            caller = self.functions[name]
+            code = []
+            count = 0
+            for instr in caller.code:
+                callee = self.functions.get(instr.args[0]) if instr.op == 'CALL' else None
+                if callee is not None:
+                    if callee.name not in candidates:
+                        candidates[callee.name] = inlinable(callee, self.functions, cycles)
+                    if candidates[callee.name]:
+                        code.extend(self.expand(caller, instr, callee))
+                        count += 1
+                        continue
+                code.append(instr)
+            caller.code = code
+            expanded[name] = count
+        return expanded
+
+
+def operands(args):
+    for arg in args:
+        if isinstance(arg, tuple):
+            yield from arg
+        else:
+            yield arg
+
+
+def move(type):
+    return 'MOVF' if type == 'float' else 'MOVI'
+
+
+def zero(type):
+    return 0.0 if type == 'float' else 0
+
+
+def inline_program(functions):
+    '''Expande las funciones pequeñas en todo el programa (dict nombre -> IRFunction)'''
+    return Inliner(functions).run()
+
+
+def main(argv):
+    if len(argv) not in (2, 3) or (len(argv) == 3 and argv[2] != '--dump'):
+        print(f"Usage: python {argv[0]} filename [--dump]")
+        exit(1)
+
+    from plex import Lexer
+    from pparser import Parser
+    from intcode import IntermediateCodeGenerator, dump
+    from cleanup import cleanup_program
+
+    ast = Parser().parse(Lexer().tokenize_file(argv[1]))
+    gen = IntermediateCodeGenerator()
+    gen.generate_code(ast)
+    cleanup_program(gen.functions)
+    before = call_graph(gen.functions)
+    sites = {name: sum(1 for i in f.code if i.op == 'CALL') for name, f in gen.functions.items()}
+    expanded = inline_program(gen.functions)
+    cleanup_program(gen.functions)
+
+    if len(argv) == 3:
+        print(dump(gen.functions))
+    cycles = recursive(before)
+    print(f'{"function":<24} {"size":>5} {"calls":>6} {"inlined":>8}  note')
+    for name, func in gen.functions.items():
+        note = 'recursive' if name in cycles else ''
+        print(f'{name:<24} {size(func):>5} {sites[name]:>6} {expanded[name]:>8}  {note}')
+
+
+if __name__ == '__main__':
+    import sys
+    main(sys.argv)
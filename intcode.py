@@ -1,176 +1,771 @@
-#checker.py
+#intcode.py
+'''
+Generación de código intermedio
+===============================
+Convierte el AST de modelo.py en instrucciones de tres direcciones
+(Instruction: opcode y operandos, el destino al final).  Los operandos son:
+
+  * constantes de Python (int o float)
+  * nombres de variables declaradas (str)
+  * registros virtuales Register(num, type), numerados con register_counter
+    en todo el programa y con su tipo ('int' o 'float')
+
+Las etiquetas 'L{n}' salen de label_counter y son únicas en el programa,
+también entre whiles anidados.
+
+Cada función del programa queda en self.functions como un IRFunction con sus
+parámetros, variables locales y su lista de instrucciones.  Las funciones
+anidadas (p.ej. merge dentro de mrgsort) se nombran 'padre.hija'.
+IRFunction.basic_blocks() la divide en bloques básicos con sus sucesores;
+dump() la muestra como texto y serialize()/deserialize() la guardan en un
+formato binario compacto.
+
+Instrucciones:
+
+  MOVI/MOVF   src, dst             dst := src
+  ADDI/SUBI/MULI/DIVI a, b, dst    (y ADDF/SUBF/MULF/DIVF)
+  NEGI/NEGF   a, dst
+  LT/LTE/GT/GTE/EQ/NEQ a, b, dst   dst := 1 si la relación se cumple, si no 0
+  AND/OR      a, b, dst
+  NOT         a, dst
+  ITOF/FTOI   a, dst
+  ALOADI/ALOADF  arr, idx, dst     dst := arr[idx]
+  ASTOREI/ASTOREF src, arr, idx    arr[idx] := src
+  LABEL       name
+  GOTO        label
+  CBRANCH     test, label_true, label_false
+  CALL        func, (args...), dst     (dst siempre es un registro)
+  RETURN      value
+  READI/READF dst
+  WRITE       value
+  PRINT       string
+'''
 from modelo import *
 from plex import Lexer
 from pparser import Parser
 from dataclasses import dataclass, field
-from typing import Any
+from typing import Any, Dict, List, Optional
+from typesys import declarations, return_types
+import struct
 import sys
 
-class IntermediateCodeGenerator:
+
+# Opcodes del IR.  El orden es el de su número en el formato binario: solo
+# se agregan al final.
+OPCODES = [
+    'MOVI', 'MOVF', 'ADDI', 'ADDF', 'SUBI', 'SUBF', 'MULI', 'MULF', 'DIVI', 'DIVF',
+    'NEGI', 'NEGF', 'LT', 'LTE', 'GT', 'GTE', 'EQ', 'NEQ', 'AND', 'OR', 'NOT',
+    'ITOF', 'FTOI', 'ALOADI', 'ALOADF', 'ASTOREI', 'ASTOREF',
+    'LABEL', 'GOTO', 'CBRANCH', 'CALL', 'RETURN', 'READI', 'READF', 'WRITE', 'PRINT',
+]
+
+# Instrucciones que terminan un bloque básico
+TERMINATORS = {'GOTO', 'CBRANCH', 'RETURN'}
+
+
+@dataclass(frozen=True, slots=True)
+class Register:
+    num: int
+    type: str                       # 'int' o 'float'
+
+    def __str__(self):
+        return f'R{self.num}'
+
+
+@dataclass(slots=True)
+class Instruction:
+    op: str
+    args: tuple
+
+    def targets(self):
+        '''Etiquetas a las que puede saltar'''
+        if self.op == 'GOTO':
+            return self.args
+        if self.op == 'CBRANCH':
+            return self.args[1:]
+        return ()
+
+    def defs(self):
+        '''Operandos que escribe (variable o registro)'''
+        op = self.op
+        if op in ('LABEL', 'GOTO', 'CBRANCH', 'RETURN', 'WRITE', 'PRINT') or op.startswith('ASTORE'):
+            return ()
+        if op in ('READI', 'READF'):
+            return self.args
+        return self.args[-1:]
+
+    def uses(self):
+        '''Variables y registros que lee (las constantes no se incluyen)'''
+        op = self.op
+        if op in ('LABEL', 'GOTO', 'PRINT', 'READI', 'READF'):
+            return ()
+        if op == 'CBRANCH':
+            args = self.args[:1]
+        elif op == 'CALL':
+            args = self.args[1]
+        elif op in ('RETURN', 'WRITE') or op.startswith('ASTORE'):
+            args = self.args
+        else:
+            args = self.args[:-1]
+        return tuple(a for a in args if isinstance(a, (str, Register)))
+
+    def __str__(self):
+        if self.op == 'LABEL':
+            return f'{self.args[0]}:'
+        if self.op == 'PRINT':
+            return f'    {"PRINT":<8s}"{self.args[0]}"'
+        args = ', '.join(format_operand(a) for a in self.args)
+        return f'    {self.op:<8s}{args}'
+
+
+def format_operand(operand):
+    if isinstance(operand, tuple):
+        return '(' + ', '.join(format_operand(a) for a in operand) + ')'
+    return str(operand)
+
+
+@dataclass
+class BasicBlock:
+    index: int                      # Posición en la lista de bloques
+    label: Optional[str]            # None en la entrada sin etiqueta y tras un salto
+    instrs: List[Instruction]       # Sin la instrucción LABEL inicial
+    succs: List[int] = field(default_factory=list)
+
+
+@dataclass
+class IRVariable:
+    name: str
+    type: str                       # 'int' o 'float'
+    size: Optional[int] = None      # Tamaño si es un arreglo
+
+
+@dataclass
+class IRFunction:
+    name: str                       # Nombre calificado (padre.hija)
+    parent: Optional[str]
+    params: List[IRVariable]
+    locals: List[IRVariable]
+    code: List[Instruction] = field(default_factory=list)
+    rettype: str = 'int'            # Según sus return (typesys.return_types); 'int' si no devuelve valor
+
+    def lookup(self, name):
+        for var in self.params:
+            if var.name == name:
+                return var
+        for var in self.locals:
+            if var.name == name:
+                return var
+        return None
+
+    def basic_blocks(self):
+        '''
+        Divide code en bloques básicos.  Un bloque empieza en un LABEL o
+        después de un GOTO/CBRANCH/RETURN; succs son los índices de los
+        bloques a los que salta o en los que cae al terminar.
+        '''
+        blocks = []
+        block = None
+        for instr in self.code:
+            if instr.op == 'LABEL':
+                block = BasicBlock(len(blocks), instr.args[0], [])
+                blocks.append(block)
+                continue
+            if block is None:
+                block = BasicBlock(len(blocks), None, [])
+                blocks.append(block)
+            block.instrs.append(instr)
+            if instr.op in TERMINATORS:
+                block = None
+
+        index = {b.label: b.index for b in blocks if b.label is not None}
+        for b in blocks:
+            last = b.instrs[-1] if b.instrs else None
+            if last is not None and last.op in TERMINATORS:
+                b.succs = [index[label] for label in last.targets()]
+            elif b.index + 1 < len(blocks):
+                b.succs = [b.index + 1]
+        return blocks
+
+    def set_blocks(self, blocks):
+        '''Reemplaza code por el de blocks (en ese orden)'''
+        code = []
+        for b in blocks:
+            if b.label is not None:
+                code.append(Instruction('LABEL', (b.label,)))
+            code.extend(b.instrs)
+        self.code = code
+
+
+def array_size(typename):
+    size = typename.array_size
+    if size is None:
+        return None
+    if isinstance(size, (IntegerNumber, FloatNumber)):
+        return int(size.value)
+    if isinstance(size, (int, float)):
+        return int(size)
+    raise Exception(f"El tamaño del arreglo debe ser una constante: {size}")
+
+
+class IntermediateCodeGenerator(Visitor):
+    _binops = {
+        '+': 'ADD',
+        '-': 'SUB',
+        '*': 'MUL',
+        '/': 'DIV',
+    }
+
+    _relops = {
+        '<': 'LT',
+        '>': 'GT',
+        '<=': 'LTE',
+        '>=': 'GTE',
+        '==': 'EQ',
+        '!=': 'NEQ',
+        '<>': 'NEQ',
+    }
+
     def __init__(self):
         self.intermediate_code = []
-        self.register_counter = 0 
+        self.register_counter = 0
+        self.label_counter = 0
+        self.functions = {}
+        self.function = None        # IRFunction en generación
+        self.scopes = []            # Pila de {nombre: IRFunction} visibles
+        self.loops = []             # Etiquetas de salida de los while activos
+        self.rettypes = {}          # id(FunDefinition) -> tipo de retorno (typesys.return_types)
 
     def generate_code(self, node):
         self.intermediate_code = []  # Reiniciamos el código intermedio
+        self.functions = {}
         self.visit(node)
         return self.intermediate_code
 
-    def visit(self, node):
-        method_name = 'visit_' + node.__class__.__name__
-        visitor = getattr(self, method_name, self.generic_visit)
-        return visitor(node)
-
     def generic_visit(self, node):
         raise Exception(f"No visit_{node.__class__.__name__} method")
 
+    # -----------------------------------------------------------------
+    # Utilidades
+    # -----------------------------------------------------------------
+    def emit(self, op, *args):
+        self.function.code.append(Instruction(op, args))
+
+    def new_register(self, type):
+        register = Register(self.register_counter, type)
+        self.register_counter += 1
+        return register
+
+    def new_label(self):
+        label = f'L{self.label_counter}'
+        self.label_counter += 1
+        return label
+
+    def lookup_var(self, name):
+        func = self.function
+        while func is not None:
+            var = func.lookup(name)
+            if var is not None:
+                return var
+            func = self.functions.get(func.parent)
+        raise Exception(f"Variable no definida: {name}")
+
+    def lookup_function(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        raise Exception(f"Función no definida: {name}")
+
+    def operand_type(self, operand):
+        if isinstance(operand, float):
+            return 'float'
+        if isinstance(operand, int):
+            return 'int'
+        if isinstance(operand, Register):
+            return operand.type
+        return self.lookup_var(operand).type
+
+    def suffix(self, type):
+        return 'F' if type == 'float' else 'I'
+
+    def declare_functions(self, decls, parent):
+        scope = {}
+        for decl in decls:
+            if isinstance(decl, FunDefinition):
+                name = f'{parent.name}.{decl.name}' if parent else decl.name
+                params = [self.variable(p) for p in declarations(decl.parameters)]
+                local_vars = [self.variable(v) for v in declarations(decl.local_variables)
+                              if not isinstance(v, FunDefinition)]
+                scope[decl.name] = IRFunction(name, parent.name if parent else None, params, local_vars,
+                                              rettype=self.rettypes.get(id(decl)) or 'int')
+        return scope
+
+    def variable(self, decl):
+        base = decl.datatype.base_type.lower()
+        return IRVariable(decl.name, 'float' if base == 'float' else 'int', array_size(decl.datatype))
+
+    # -----------------------------------------------------------------
+    # Programa y funciones
+    # -----------------------------------------------------------------
     def visit_Program(self, node):
         self.intermediate_code.append(":::::::::: __pl0_init([]) -> I ::::::::::")
         self.intermediate_code.append("========================================")
 
+        self.rettypes = return_types(node)
+        self.scopes.append(self.declare_functions(node.funclist, None))
         for func_def in node.funclist:
             self.visit(func_def)
+        self.scopes.pop()
 
     def visit_FunDefinition(self, node):
-        self.intermediate_code.append(
-            f":::::::::: {node.name}({[param.name for param in node.parameters] if node.parameters else []}) -> I ::::::::::"
-        )
+        func = self.scopes[-1][node.name]
+        self.functions[func.name] = func
+        outer, self.function = self.function, func
+
+        decls = declarations(node.local_variables)
+        self.scopes.append(self.declare_functions(decls, func))
+
+        # Las funciones anidadas se generan aparte, cada una en su IRFunction
+        for decl in decls:
+            if isinstance(decl, FunDefinition):
+                self.visit(decl)
+
         for statement in node.statements:
-            result = self.visit(statement)
-            if result:
-                self.intermediate_code.extend(result)  
+            if statement is not None:
+                self.visit(statement)
 
+        self.scopes.pop()
+        self.function = outer
+
+        self.intermediate_code.append(
+            f":::::::::: {func.name}({[param.name for param in func.params]}) -> {self.suffix(func.rettype)} ::::::::::"
+        )
+        self.intermediate_code.extend(func.code)
         self.intermediate_code.append("========================================")
 
+    def visit_Parameter(self, node):
+        pass
+
     def visit_VarDef(self, node):
         pass
 
+    # -----------------------------------------------------------------
+    # Sentencias
+    # -----------------------------------------------------------------
     def visit_AssignmentStatement(self, node):
-        self.intermediate_code.append(('MOVI', self.visit(node.expression), f'R{node.location}'))
-
-    def visit_Binop(self, node):
-        op_code = {
-            '+': 'ADDI',
-            '-': 'SUBI',
-            '*': 'MULI',
-            '/': 'DIVI',
-        }[node.op]
-        left_operand = self.visit(node.left)
-        right_operand = self.visit(node.right)
-        result_register = f'R{self.register_counter}'
-        self.register_counter += 1
-        self.intermediate_code.append((op_code, left_operand, right_operand, result_register))
-        return result_register
-    
-    def visit_Identifier(self, node):
-        return f'{node.name}'
-    
-    def visit_FunctionCall(self, node):
-        args_code = ', '.join([self.visit(arg) for arg in node.arguments])
-        return f'CALL {node.identifier}({args_code})'
-
-
-    def visit_IntegerNumber(self, node):
-        return str(node.value)
-    
-    def visit_FloatNumber(self, node):
-        return str(node.value)
+        value = self.visit(node.expression)
+        location = node.location
+        if isinstance(location, ArrayLocation):
+            var = self.lookup_var(location.name)
+            index = self.visit(location.index)
+            self.emit('ASTORE' + self.suffix(var.type), value, location.name, index)
+        else:
+            var = self.lookup_var(location.identifier)
+            self.emit('MOV' + self.suffix(var.type), value, location.identifier)
+
+    def visit_BeginEndBlock(self, node):
+        for statement in node.stmtlist:
+            if statement is not None:
+                self.visit(statement)
+
+    def visit_SkipStatement(self, node):
+        pass
 
     def visit_ReturnStatement(self, node):
-        expression_code = self.visit(node.expression)
-        return [('RETURN', expression_code)]
+        self.emit('RETURN', self.visit(node.expression))
 
     def visit_IfStatement(self, node):
-        condition_code = self.visit(node.condition)
-        then_body_code = self.visit(node.then_body)
-        return [('IF', condition_code, 'GOTO', then_body_code)]
+        then_label = self.new_label()
+        end_label = self.new_label()
+        test = self.visit(node.condition)
+        self.emit('CBRANCH', test, then_label, end_label)
+        self.emit('LABEL', then_label)
+        self.visit(node.then_body)
+        self.emit('LABEL', end_label)
 
     def visit_IfElseStatement(self, node):
-        condition_code = self.visit(node.condition)
-        then_body_code = self.visit(node.then_body)
-        else_body_code = self.visit(node.else_body)
-        return [('IF', condition_code, 'GOTO', then_body_code),
-                ('GOTO', else_body_code)]
+        then_label = self.new_label()
+        else_label = self.new_label()
+        end_label = self.new_label()
+        test = self.visit(node.condition)
+        self.emit('CBRANCH', test, then_label, else_label)
+        self.emit('LABEL', then_label)
+        self.visit(node.then_body)
+        self.emit('GOTO', end_label)
+        self.emit('LABEL', else_label)
+        if node.else_body is not None:
+            self.visit(node.else_body)
+        self.emit('LABEL', end_label)
+
+    def visit_While(self, node):
+        start_label = self.new_label()
+        body_label = self.new_label()
+        exit_label = self.new_label()
+
+        self.emit('LABEL', start_label)
+        test = self.visit(node.relation)
+        self.emit('CBRANCH', test, body_label, exit_label)
+        self.emit('LABEL', body_label)
+        self.loops.append(exit_label)
+        self.visit(node.stmt)
+        self.loops.pop()
+        self.emit('GOTO', start_label)
+        self.emit('LABEL', exit_label)
 
     def visit_Break(self, node):
-        return [('GOTO', 'exit_loop_label')] 
+        if not self.loops:
+            raise Exception("'break' fuera de un while")
+        self.emit('GOTO', self.loops[-1])
+
+    def visit_ReadStatement(self, node):
+        location = node.location
+        if isinstance(location, ArrayLocation):
+            var = self.lookup_var(location.name)
+            suffix = self.suffix(var.type)
+            value = self.new_register(var.type)
+            self.emit('READ' + suffix, value)
+            index = self.visit(location.index)
+            self.emit('ASTORE' + suffix, value, location.name, index)
+        else:
+            var = self.lookup_var(location.identifier)
+            self.emit('READ' + self.suffix(var.type), location.identifier)
+
+    def visit_PrintStatement(self, node):
+        self.emit('PRINT', self.visit(node.string_expr))
+
+    def visit_WriteStatement(self, node):
+        self.emit('WRITE', self.visit(node.expression))
+
+    # -----------------------------------------------------------------
+    # Expresiones
+    # -----------------------------------------------------------------
+    def visit_Binop(self, node):
+        left_operand = self.visit(node.left)
+        right_operand = self.visit(node.right)
+        type = 'float' if 'float' in (self.operand_type(left_operand), self.operand_type(right_operand)) else 'int'
+        result_register = self.new_register(type)
+        self.emit(self._binops[node.op] + self.suffix(type), left_operand, right_operand, result_register)
+        return result_register
+
+    def visit_UnaryOperation(self, node):
+        operand = self.visit(node.operand)
+        if node.operator == '+':
+            return operand
+        type = self.operand_type(operand)
+        result_register = self.new_register(type)
+        self.emit('NEG' + self.suffix(type), operand, result_register)
+        return result_register
 
-    def visit_While(self, node):
-        start_label = f'while_start_label'
-        exit_label = f'while_exit_label'
-        
-        condition_code = self.visit(node.relation)
-        stmt_code = self.visit(node.stmt)
-
-        return [(start_label + ':'),
-                ('IF', condition_code, 'GOTO', stmt_code),
-                ('GOTO', exit_label),
-                (stmt_code + ':'),
-                ('GOTO', start_label),
-                (exit_label + ':')]
-    
     def visit_RelationalOperation(self, node):
         left_operand = self.visit(node.left_operand)
         right_operand = self.visit(node.right_operand)
-        op_code = {
-            '<': 'LT',
-            '>': 'GT',
-            '<=': 'LTE',
-            '>=': 'GTE',
-            '==': 'EQ',
-            '!=': 'NEQ',
-        }[node.operator]
-
-        result_register = f'R{node.result}'
-        self.intermediate_code.append((op_code, left_operand, right_operand, result_register))
+        result_register = self.new_register('int')
+        self.emit(self._relops[node.operator], left_operand, right_operand, result_register)
+        return result_register
 
+    def visit_LogicalOperation(self, node):
+        left_operand = self.visit(node.left_operand)
+        right_operand = self.visit(node.right_operand)
+        result_register = self.new_register('int')
+        self.emit(node.operator.upper(), left_operand, right_operand, result_register)
         return result_register
-    
-    def visit_str(self, node):
-        return node
 
+    def visit_NotOperation(self, node):
+        operand = self.visit(node.operand)
+        result_register = self.new_register('int')
+        self.emit('NOT', operand, result_register)
+        return result_register
 
-    def visit_ReadStatement(self, node):
-        return [('READ', f'R{node.location}')]
+    def visit_IntConversion(self, node):
+        operand = self.visit(node.expression)
+        if self.operand_type(operand) == 'int':
+            return operand
+        result_register = self.new_register('int')
+        self.emit('FTOI', operand, result_register)
+        return result_register
 
-    def visit_PrintStatement(self, node):
-        expr_code = self.visit(node.string_expr)
-        return [('PRINT', expr_code)]
+    def visit_FloatConversion(self, node):
+        operand = self.visit(node.expression)
+        if self.operand_type(operand) == 'float':
+            return operand
+        result_register = self.new_register('float')
+        self.emit('ITOF', operand, result_register)
+        return result_register
 
-    def visit_WriteStatement(self, node):
-        expr_code = self.visit(node.expression)
-        return [('WRITE', expr_code)]
+    def visit_Identifier(self, node):
+        self.lookup_var(node.name)
+        return node.name
+
+    def visit_Location(self, node):
+        self.lookup_var(node.identifier)
+        return node.identifier
 
-    def visit_ArrayType(self, node):
-        dim_code = self.visit(node.dim)
-        return [('ARRAY', dim_code)]
-    
     def visit_ArrayLocation(self, node):
+        var = self.lookup_var(node.name)
         index_code = self.visit(node.index)
-        return f'ARRAY_LOAD {node.name}, {index_code}'
+        result_register = self.new_register(var.type)
+        self.emit('ALOAD' + self.suffix(var.type), node.name, index_code, result_register)
+        return result_register
+
+    def visit_FunctionCall(self, node):
+        func = self.lookup_function(node.identifier)
+        arguments = node.arguments
+        if isinstance(arguments, ExprList):
+            arguments = arguments.expressions
+        arguments = arguments or []         # inner() llega como ExprList(None)
+        args = tuple(self.visit(arg) for arg in arguments)
+        if len(args) != len(func.params):
+            raise Exception(f"La función {node.identifier} espera {len(func.params)} argumentos, "
+                            f"pero se proporcionaron {len(args)}")
+        result_register = self.new_register(func.rettype)
+        self.emit('CALL', func.name, args, result_register)
+        return result_register
+
+    def visit_IntegerNumber(self, node):
+        return node.value
+
+    def visit_FloatNumber(self, node):
+        return node.value
+
+    def visit_str(self, node):
+        return node
+
+
+# ---------------------------------------------------------------------
+#  Volcado de texto
+# ---------------------------------------------------------------------
+
+def format_variable(var):
+    size = f'[{var.size}]' if var.size is not None else ''
+    return f'{var.name}: {var.type}{size}'
+
+
+def dump(functions):
+    '''
+    Texto de las funciones (dict nombre -> IRFunction) por bloques básicos.
+    Cada bloque lleva su etiqueta (o #n si no tiene) y sus sucesores.
+    '''
+    lines = []
+    for func in functions.values():
+        params = ', '.join(format_variable(v) for v in func.params)
+        lines.append(f'function {func.name}({params}) -> {func.rettype}')
+        if func.locals:
+            lines.append('  locals ' + ', '.join(format_variable(v) for v in func.locals))
+        blocks = func.basic_blocks()
+        for b in blocks:
+            name = b.label if b.label is not None else f'#{b.index}'
+            succs = ', '.join(blocks[s].label or f'#{s}' for s in b.succs) or '-'
+            lines.append(f'{name}:'.ljust(32) + f'; -> {succs}')
+            lines.extend(str(instr) for instr in b.instrs)
+        lines.append('')
+    return '\n'.join(lines)
+
+
+# ---------------------------------------------------------------------
+#  Formato binario
+# ---------------------------------------------------------------------
+#
+#  MAGIC
+#  tabla de cadenas     n, luego (largo, utf-8) por cadena
+#  funciones            n, luego por función:
+#      nombre, padre+1 (0 = sin padre), tipo de retorno
+#      parámetros y locales: n, luego (nombre, tipo, tamaño+1) por variable
+#      instrucciones: n, luego (opcode, nargs, operandos...) por instrucción
+#
+#  Los enteros sin signo son varints (LEB128); los nombres son índices en la
+#  tabla de cadenas.  Cada operando lleva una etiqueta de un byte:
+
+MAGIC = b'PL0IR\x01'
+
+(_INT, _FLOAT, _IREG, _FREG, _STR, _TUPLE) = range(6)
+
+_types = ['int', 'float']
+
+
+class _Writer:
+    def __init__(self):
+        self.out = bytearray()
+        self.strings = {}
+
+    def uint(self, n):
+        while n >= 0x80:
+            self.out.append((n & 0x7f) | 0x80)
+            n >>= 7
+        self.out.append(n)
+
+    def string(self, s):
+        if s not in self.strings:
+            self.strings[s] = len(self.strings)
+        self.uint(self.strings[s])
+
+    def variables(self, variables):
+        self.uint(len(variables))
+        for var in variables:
+            self.string(var.name)
+            self.out.append(_types.index(var.type))
+            self.uint(0 if var.size is None else var.size + 1)
+
+    def operand(self, value):
+        if isinstance(value, Register):
+            self.out.append(_FREG if value.type == 'float' else _IREG)
+            self.uint(value.num)
+        elif isinstance(value, str):
+            self.out.append(_STR)
+            self.string(value)
+        elif isinstance(value, tuple):
+            self.out.append(_TUPLE)
+            self.uint(len(value))
+            for item in value:
+                self.operand(item)
+        elif isinstance(value, float):
+            self.out.append(_FLOAT)
+            self.out += struct.pack('<d', value)
+        elif isinstance(value, int):
+            self.out.append(_INT)
+            value = int(value)
+            self.uint(value << 1 if value >= 0 else (~value << 1) | 1)
+        else:
+            raise ValueError(f'Operando no serializable: {value!r}')
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+        self.strings = []
+
+    def byte(self):
+        b = self.data[self.pos]
+        self.pos += 1
+        return b
+
+    def uint(self):
+        n = shift = 0
+        while True:
+            b = self.byte()
+            n |= (b & 0x7f) << shift
+            if b < 0x80:
+                return n
+            shift += 7
+
+    def string(self):
+        return self.strings[self.uint()]
+
+    def variables(self):
+        variables = []
+        for _ in range(self.uint()):
+            name = self.string()
+            type = _types[self.byte()]
+            size = self.uint()
+            variables.append(IRVariable(name, type, size - 1 if size else None))
+        return variables
+
+    def operand(self):
+        tag = self.byte()
+        if tag == _IREG:
+            return Register(self.uint(), 'int')
+        if tag == _FREG:
+            return Register(self.uint(), 'float')
+        if tag == _STR:
+            return self.string()
+        if tag == _TUPLE:
+            return tuple(self.operand() for _ in range(self.uint()))
+        if tag == _FLOAT:
+            value, = struct.unpack_from('<d', self.data, self.pos)
+            self.pos += 8
+            return value
+        if tag == _INT:
+            n = self.uint()
+            return n >> 1 if not n & 1 else ~(n >> 1)
+        raise ValueError(f'Etiqueta de operando desconocida: {tag}')
+
+
+def serialize(functions):
+    '''
+    Codifica las funciones (dict nombre -> IRFunction) en bytes
+    '''
+    body = _Writer()
+    body.uint(len(functions))
+    for func in functions.values():
+        body.string(func.name)
+        if func.parent is None:
+            body.uint(0)
+        else:
+            body.uint(1)
+            body.string(func.parent)
+        body.string(func.rettype)
+        body.variables(func.params)
+        body.variables(func.locals)
+        body.uint(len(func.code))
+        for instr in func.code:
+            body.out.append(OPCODES.index(instr.op))
+            body.uint(len(instr.args))
+            for arg in instr.args:
+                body.operand(arg)
+
+    # La tabla de cadenas va primero pero se conoce al final
+    head = _Writer()
+    head.out += MAGIC
+    head.uint(len(body.strings))
+    for s in body.strings:
+        data = s.encode('utf-8')
+        head.uint(len(data))
+        head.out += data
+    return bytes(head.out + body.out)
+
+
+def deserialize(data):
+    '''
+    Inversa de serialize(): devuelve el dict nombre -> IRFunction
+    '''
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError('No es un archivo de IR de PL0')
+    reader = _Reader(memoryview(data))
+    reader.pos = len(MAGIC)
+    for _ in range(reader.uint()):
+        size = reader.uint()
+        reader.strings.append(bytes(reader.data[reader.pos:reader.pos + size]).decode('utf-8'))
+        reader.pos += size
+
+    functions = {}
+    for _ in range(reader.uint()):
+        name = reader.string()
+        parent = reader.string() if reader.uint() else None
+        rettype = reader.string()
+        params = reader.variables()
+        local_vars = reader.variables()
+        code = []
+        for _ in range(reader.uint()):
+            op = OPCODES[reader.byte()]
+            code.append(Instruction(op, tuple(reader.operand() for _ in range(reader.uint()))))
+        functions[name] = IRFunction(name, parent, params, local_vars, code, rettype)
+    return functions
 
 
 def main(argv):
-    if len(argv) != 2:
-        print(f"Usage: python {argv[0]} filename")
+    if len(argv) not in (2, 4) or (len(argv) == 4 and argv[2] != '-o'):
+        print(f"Usage: python {argv[0]} filename [-o output.ir]")
         exit(1)
-    
+
     filename = argv[1]
     with open(filename, 'r') as file:
         text = file.read()
 
     lexer_sly = Lexer()
     parser_sly = Parser()
-    
+
     result = parser_sly.parse(lexer_sly.tokenize(text))
 
     code_generator = IntermediateCodeGenerator()
+    code_generator.generate_code(result)
 
-    intermediate_code = code_generator.generate_code(result)
+    if len(argv) == 4:
+        data = serialize(code_generator.functions)
+        with open(argv[3], 'wb') as file:
+            file.write(data)
+        print(f'{len(data)} bytes written to {argv[3]}')
+        return
 
-    print("Intermediate Code:")
-    for instruction in intermediate_code:
-        print(instruction)
+    print(dump(code_generator.functions))
 
 if __name__ == '__main__':
-    main(sys.argv)
\ No newline at end of file
+    main(sys.argv)
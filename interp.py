@@ -0,0 +1,497 @@
+# interp.py
+'''
+Intérprete de PL0 por compilación a clausuras
+=============================================
+Segundo modo de ejecución, junto a la VM de bytecode (vm.py).  Cada nodo del
+AST de modelo.py se compila una sola vez en una clausura de Python; ejecutar
+el programa es llamar a esas clausuras.  No hay despacho por nombre de método
+(visit_*) ni búsquedas en tablas de símbolos durante la ejecución.
+
+Cada llamada a función crea un marco (una lista):
+
+  slot 0        enlace estático (marco de la función que la contiene)
+  slot 1        valor de retorno
+  slots 2..     parámetros y luego variables locales
+
+Los marcos y los nombres los resuelve resolve.py antes de compilar, a
+(saltos, slot): saltos = 0 para las locales y > 0 para las de funciones
+contenedoras, que se alcanzan siguiendo el enlace estático.
+'''
+import sys
+
+from modelo import *
+from resolve import resolve, ResolveError, LINK, RETVAL, FIRST
+from vm import unescape
+from effects import Memo, MISSING, memoizable, report
+from arrays import prototype
+import vectorize
+
+# Señales que devuelven las sentencias para cortar un bloque
+BREAK = object()
+RETURN = object()
+
+
+class InterpreterError(Exception):
+    pass
+
+
+def _idiv(x, y):
+    q = x // y
+    if q < 0 and q * y != x:
+        q += 1          # PL0 trunca hacia cero
+    return q
+
+
+class FunctionInfo:
+    '''
+    Lo que necesita una llamada en ejecución, armado desde el FrameLayout
+    de resolve.py: plantilla del marco, arreglos a crear y el cuerpo.
+    '''
+    def __init__(self, layout):
+        self.layout = layout
+        self.name = layout.name
+        self.level = layout.depth
+        self.nparams = layout.nparams
+        self.template = [None, 0]
+        self.arrays = []            # (slot, prototipo en cero) como en vm.py
+        self.body = None
+        for var in layout.variables:
+            init = 0.0 if var.type == 'float' else 0
+            if var.size is None:
+                self.template.append(init)
+            else:
+                # Los arreglos pasados como parámetro llegan por referencia
+                self.template.append(None)
+                if not var.param:
+                    self.arrays.append((var.slot, prototype(var.type, var.size)))
+
+
+class Compiler:
+    '''
+    Traduce el AST a clausuras.  compile_* devuelve (clausura, tipo) para las
+    expresiones y solo la clausura para las sentencias.  Los nombres ya
+    vienen resueltos a (depth, slot) e índices de función por resolve.py.
+    '''
+    def __init__(self, interpreter):
+        self.interp = interpreter
+        self.func = None
+        self.functions = []         # FunctionInfo por índice de resolve.py
+        self.globals = {}
+
+    def variable(self, node):
+        return node.depth, node.slot, self.func.layout.variable(node.depth, node.slot).type
+
+    # -----------------------------------------------------------------
+    # Programa y funciones
+    # -----------------------------------------------------------------
+    def compile_program(self, node):
+        try:
+            frames, globals = resolve(node)
+        except ResolveError as e:
+            raise InterpreterError(str(e)) from e
+        self.functions = [FunctionInfo(layout) for layout in frames]
+        self.globals = {name: self.functions[layout.index] for name, layout in globals.items()}
+        for info in self.functions:
+            self.compile_function(info)
+        return self.globals
+
+    def compile_function(self, info):
+        outer, self.func = self.func, info
+        node = info.layout.node
+        info.body = self.compile_block([s for s in node.statements if s is not None])
+        self.func = outer
+
+    # -----------------------------------------------------------------
+    # Sentencias
+    # -----------------------------------------------------------------
+    def compile_stmt(self, node):
+        method = getattr(self, 'stmt_' + type(node).__name__, None)
+        if method is None:
+            raise InterpreterError(f'Sentencia no soportada: {type(node).__name__}')
+        return method(node)
+
+    def compile_block(self, stmts):
+        stmts = tuple(self.compile_stmt(s) for s in stmts if s is not None)
+        if len(stmts) == 1:
+            return stmts[0]
+
+        def block(frame):
+            for stmt in stmts:
+                signal = stmt(frame)
+                if signal is not None:
+                    return signal
+        return block
+
+    def stmt_BeginEndBlock(self, node):
+        return self.compile_block(node.stmtlist)
+
+    def stmt_SkipStatement(self, node):
+        return lambda frame: None
+
+    def stmt_AssignmentStatement(self, node):
+        value, _ = self.compile_expr(node.expression)
+        location = node.location
+        if isinstance(location, ArrayLocation):
+            array = self.load(location)[0]
+            index = self.compile_index(location.index)
+
+            def store_item(frame):
+                array(frame)[index(frame)] = value(frame)
+            return store_item
+
+        hops, slot, _ = self.variable(location)
+        if hops == 0:
+            def store(frame):
+                frame[slot] = value(frame)
+        else:
+            def store(frame):
+                outer = frame
+                for _ in range(hops):
+                    outer = outer[LINK]
+                outer[slot] = value(frame)
+        return store
+
+    def stmt_IfStatement(self, node):
+        test, _ = self.compile_expr(node.condition)
+        then = self.compile_stmt(node.then_body)
+
+        def if_(frame):
+            if test(frame):
+                return then(frame)
+        return if_
+
+    def stmt_IfElseStatement(self, node):
+        test, _ = self.compile_expr(node.condition)
+        then = self.compile_stmt(node.then_body)
+        if node.else_body is None:
+            otherwise = lambda frame: None
+        else:
+            otherwise = self.compile_stmt(node.else_body)
+
+        def if_else(frame):
+            if test(frame):
+                return then(frame)
+            return otherwise(frame)
+        return if_else
+
+    def stmt_While(self, node):
+        test, _ = self.compile_expr(node.relation)
+        body = self.compile_stmt(node.stmt)
+
+        def while_(frame):
+            while test(frame):
+                signal = body(frame)
+                if signal is not None:
+                    if signal is BREAK:
+                        break
+                    return signal
+
+        vector = vectorize.match(node, self) if self.interp.vectorize else None
+        if vector is None:
+            return while_
+        interp = self.interp
+
+        # Bucle sobre arreglos (vectorize.py): de a un elemento solo si la
+        # versión vectorial no se puede usar en esta ejecución
+        def vector_while(frame):
+            if not vector.run(frame, interp.stdout.write):
+                return while_(frame)
+        return vector_while
+
+    def stmt_Break(self, node):
+        return lambda frame: BREAK
+
+    def stmt_ReturnStatement(self, node):
+        value, _ = self.compile_expr(node.expression)
+
+        def return_(frame):
+            frame[RETVAL] = value(frame)
+            return RETURN
+        return return_
+
+    def stmt_FunctionCall(self, node):
+        call, _ = self.compile_expr(node)
+
+        def call_stmt(frame):
+            call(frame)
+        return call_stmt
+
+    def stmt_PrintStatement(self, node):
+        text = unescape(node.string_expr)
+        interp = self.interp
+
+        def print_(frame):
+            interp.stdout.write(text)
+        return print_
+
+    def stmt_WriteStatement(self, node):
+        value, _ = self.compile_expr(node.expression)
+        interp = self.interp
+
+        def write(frame):
+            result = value(frame)
+            interp.stdout.write(str(int(result) if type(result) is bool else result))
+        return write
+
+    def stmt_ReadStatement(self, node):
+        location = node.location
+        interp = self.interp
+        if isinstance(location, ArrayLocation):
+            array, type = self.load(location)
+            index = self.compile_index(location.index)
+            convert = float if type == 'float' else int
+
+            def read_item(frame):
+                array(frame)[index(frame)] = convert(interp.readline())
+            return read_item
+
+        hops, slot, type = self.variable(location)
+        convert = float if type == 'float' else int
+
+        def read(frame):
+            outer = frame
+            for _ in range(hops):
+                outer = outer[LINK]
+            outer[slot] = convert(interp.readline())
+        return read
+
+    # -----------------------------------------------------------------
+    # Expresiones
+    # -----------------------------------------------------------------
+    def compile_expr(self, node):
+        method = getattr(self, 'expr_' + type(node).__name__, None)
+        if method is None:
+            raise InterpreterError(f'Expresión no soportada: {type(node).__name__}')
+        return method(node)
+
+    def load(self, node):
+        hops, slot, type = self.variable(node)
+        if hops == 0:
+            return (lambda frame: frame[slot]), type
+        if hops == 1:
+            return (lambda frame: frame[LINK][slot]), type
+
+        def load_outer(frame):
+            for _ in range(hops):
+                frame = frame[LINK]
+            return frame[slot]
+        return load_outer, type
+
+    def expr_IntegerNumber(self, node):
+        value = node.value
+        return (lambda frame: value), 'int'
+
+    def expr_FloatNumber(self, node):
+        value = node.value
+        return (lambda frame: value), 'float'
+
+    def expr_Identifier(self, node):
+        return self.load(node)
+
+    def expr_Location(self, node):
+        return self.load(node)
+
+    def expr_ArrayLocation(self, node):
+        array, type = self.load(node)
+        index = self.compile_index(node.index)
+        return (lambda frame: array(frame)[index(frame)]), type
+
+    def compile_index(self, node):
+        '''
+        Índice de un acceso a arreglo.  El array rechaza los índices >= N pero
+        no los negativos; la verificación se omite para constantes >= 0.
+        '''
+        index, _ = self.compile_expr(node)
+        if isinstance(node, IntegerNumber) and node.value >= 0:
+            return index
+
+        def checked_index(frame):
+            value = index(frame)
+            if value < 0:
+                raise IndexError('array index out of range')
+            return value
+        return checked_index
+
+    def expr_Binop(self, node):
+        left, ltype = self.compile_expr(node.left)
+        right, rtype = self.compile_expr(node.right)
+        type = 'float' if 'float' in (ltype, rtype) else 'int'
+        op = node.op
+        if op == '+':
+            return (lambda frame: left(frame) + right(frame)), type
+        if op == '-':
+            return (lambda frame: left(frame) - right(frame)), type
+        if op == '*':
+            return (lambda frame: left(frame) * right(frame)), type
+        if op == '/':
+            if type == 'float':
+                return (lambda frame: left(frame) / right(frame)), type
+            return (lambda frame: _idiv(left(frame), right(frame))), type
+        raise InterpreterError(f'Operador no soportado: {op}')
+
+    def expr_UnaryOperation(self, node):
+        operand, type = self.compile_expr(node.operand)
+        if node.operator == '-':
+            return (lambda frame: -operand(frame)), type
+        return operand, type
+
+    def expr_RelationalOperation(self, node):
+        left, _ = self.compile_expr(node.left_operand)
+        right, _ = self.compile_expr(node.right_operand)
+        op = node.operator
+        if op == '<':
+            return (lambda frame: left(frame) < right(frame)), 'bool'
+        if op == '<=':
+            return (lambda frame: left(frame) <= right(frame)), 'bool'
+        if op == '>':
+            return (lambda frame: left(frame) > right(frame)), 'bool'
+        if op == '>=':
+            return (lambda frame: left(frame) >= right(frame)), 'bool'
+        if op == '==':
+            return (lambda frame: left(frame) == right(frame)), 'bool'
+        if op in ('!=', '<>'):
+            return (lambda frame: left(frame) != right(frame)), 'bool'
+        raise InterpreterError(f'Operador no soportado: {op}')
+
+    def expr_LogicalOperation(self, node):
+        left, _ = self.compile_expr(node.left_operand)
+        right, _ = self.compile_expr(node.right_operand)
+        # Sin corte, como AND/OR de la VM: siempre se evalúan los dos operandos
+        if node.operator == 'and':
+            return (lambda frame: bool(left(frame)) & bool(right(frame))), 'bool'
+        return (lambda frame: bool(left(frame)) | bool(right(frame))), 'bool'
+
+    def expr_NotOperation(self, node):
+        operand, _ = self.compile_expr(node.operand)
+        return (lambda frame: not operand(frame)), 'bool'
+
+    def expr_IntConversion(self, node):
+        operand, _ = self.compile_expr(node.expression)
+        return (lambda frame: int(operand(frame))), 'int'
+
+    def expr_FloatConversion(self, node):
+        operand, _ = self.compile_expr(node.expression)
+        return (lambda frame: float(operand(frame))), 'float'
+
+    def expr_FunctionCall(self, node):
+        callee = self.functions[node.target]
+        arguments = node.arguments
+        if isinstance(arguments, ExprList):
+            arguments = arguments.expressions
+        arguments = arguments or []         # inner() llega como ExprList(None)
+        args = tuple(self.compile_expr(arg)[0] for arg in arguments)
+        if len(args) != callee.nparams:
+            raise InterpreterError(f'La función {node.identifier} espera {callee.nparams} argumentos, '
+                                   f'pero se proporcionaron {len(args)}')
+        hops = self.func.level - callee.level + 1
+        toplevel = callee.level == 0
+        first = FIRST
+
+        def call(frame):
+            new = callee.template.copy()
+            if not toplevel:
+                link = frame
+                for _ in range(hops):
+                    link = link[LINK]
+                new[LINK] = link
+            slot = first
+            for arg in args:
+                new[slot] = arg(frame)
+                slot += 1
+            for slot, proto in callee.arrays:
+                new[slot] = proto[:]
+            callee.body(new)
+            return new[RETVAL]
+
+        cache = self.interp.memo.get(callee.name)
+        if cache is None:
+            return call, callee.layout.rettype
+
+        # Modo memoización: los argumentos se evalúan primero para buscar
+        # en el caché
+        def memo_call(frame):
+            values = [arg(frame) for arg in args]
+            key = cache.key(values)
+            value = cache.get(key)
+            if value is MISSING:
+                new = callee.template.copy()
+                if not toplevel:
+                    link = frame
+                    for _ in range(hops):
+                        link = link[LINK]
+                    new[LINK] = link
+                new[first:first + len(values)] = values
+                for slot, proto in callee.arrays:
+                    new[slot] = proto[:]
+                callee.body(new)
+                value = new[RETVAL]
+                cache.put(key, value)
+            return value
+        return memo_call, callee.layout.rettype
+
+
+class Interpreter:
+    def __init__(self, context=None, stdin=None, stdout=None):
+        self.context = context
+        self.stdin = stdin or sys.stdin
+        self.stdout = stdout or sys.stdout
+        self.memo = {}              # nombre calificado -> effects.Memo
+        self.vectorize = getattr(context, 'optimize', True)    # Bucles sobre arreglos con NumPy
+
+    def readline(self):
+        line = self.stdin.readline()
+        if not line:
+            raise EOFError('fin de la entrada en read()')
+        return line
+
+    def compile(self, ast):
+        return Compiler(self).compile_program(ast)
+
+    def interpret(self, ast):
+        size = getattr(self.context, 'memo', 0)
+        self.memo = {name: Memo(name, size) for name in memoizable(ast)} if size else {}
+        functions = self.compile(ast)
+        if 'main' not in functions:
+            raise InterpreterError("No se encontró la función 'main'")
+        main = functions['main']
+        frame = main.template.copy()
+        for slot, proto in main.arrays:
+            frame[slot] = proto[:]
+        try:
+            main.body(frame)
+        except (IndexError, ZeroDivisionError, ValueError, EOFError, OverflowError) as e:
+            self.runtime_error(str(e), e)
+        except RecursionError as e:
+            # Cada llamada de PL0 ocupa varios marcos de Python; la VM usa su
+            # propia pila y no tiene este límite
+            self.runtime_error(f'recursión demasiado profunda (límite de Python: {sys.getrecursionlimit()} '
+                               'marcos); la VM (-E vm) no tiene este límite', e)
+        finally:
+            if self.memo:
+                report(self.memo.values())
+        return frame[RETVAL]
+
+    def runtime_error(self, message, exc):
+        if self.context:
+            self.context.error(message, 'runtime')
+        else:
+            raise InterpreterError(message) from exc
+
+
+def main(argv):
+    if len(argv) != 2:
+        print(f"Usage: python {argv[0]} filename")
+        exit(1)
+
+    from plex import Lexer
+    from pparser import Parser
+
+    with open(argv[1], encoding='utf-8') as file:
+        text = file.read()
+
+    ast = Parser().parse(Lexer().tokenize(text))
+    Interpreter().interpret(ast)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,368 @@
+# loops.py
+'''
+Optimización de lazos
+=====================
+Pase sobre el IR de intcode.py.  Los lazos son los lazos naturales del CFG:
+un arco t -> h en el que h domina a t (dataflow.Dominators).  Un While
+produce exactamente uno, con la cabecera en su etiqueta de inicio.  Se
+procesan de adentro hacia afuera y, para cada uno:
+
+  1. Preencabezado.  Se inserta un bloque '{cabecera}.pre' justo antes de
+     la cabecera por el que entran todos los caminos que vienen de fuera
+     del lazo.
+  2. Código invariante.  Una operación pura (Binop, comparaciones,
+     conversión a float...) cuyo resultado es un registro definido una sola
+     vez y cuyos operandos son constantes, variables que el lazo no
+     modifica u otros registros invariantes se mueve al preencabezado.  Las
+     divisiones y FTOI no se mueven: pueden fallar y el lazo podría no
+     ejecutarlas.
+  3. Reducción de fuerza.  Para una variable de inducción básica i (su
+     única definición en el lazo es i := i + k o i - k, con k constante),
+     cada MULI i, c, R con c invariante se reemplaza por una variable
+     '$iv{n}' que vale i*c: se inicializa en el preencabezado y se le suma
+     k*c después de cada incremento de i.  Los usos de R pasan a usar la
+     variable.
+
+Las variables que puede modificar una llamada a una función anidada
+(CFG.clobbers) cuentan como modificadas por el lazo.
+'''
+from dataclasses import dataclass, field
+from typing import List
+
+from intcode import BasicBlock, Instruction, IRVariable, Register
+from dataflow import CFG, Dominators, PURE_OPS
+
+# Operaciones que se pueden mover fuera de un lazo
+HOISTABLE = PURE_OPS - {'DIVI', 'DIVF', 'FTOI'}
+
+
+@dataclass
+class Loop:
+    header: int                     # Índice del bloque cabecera
+    body: set                       # Índices de los bloques (cabecera incluida)
+    latches: List[int] = field(default_factory=list)
+
+
+@dataclass
+class LoopStats:
+    loops: int = 0
+    hoisted: int = 0
+    reduced: int = 0
+
+
+def find_loops(cfg):
+    '''Lazos naturales de cfg, los interiores primero'''
+    dom = Dominators(cfg).solve()
+    loops = {}
+    for b in cfg.blocks:
+        if b.index in cfg.unreachable:
+            continue
+        for h in b.succs:
+            if not dom.dominates(h, b.index):
+                continue
+            loop = loops.setdefault(h, Loop(h, {h}))
+            loop.latches.append(b.index)
+            stack = [b.index]
+            while stack:
+                n = stack.pop()
+                if n not in loop.body:
+                    loop.body.add(n)
+                    stack.extend(cfg.preds[n])
+    return sorted(loops.values(), key=lambda loop: len(loop.body))
+
+
+def insert_preheader(func, cfg, loop):
+    '''
+    Agrega el preencabezado de loop a func.  Devuelve su etiqueta; el código
+    de func queda con el bloque vacío antes de la cabecera.
+    '''
+    blocks = cfg.blocks
+    header = blocks[loop.header]
+    label = f'{header.label}.pre'
+
+    for p in cfg.preds[loop.header]:
+        if p in loop.body:
+            continue
+        last = blocks[p].instrs[-1] if blocks[p].instrs else None
+        if last is not None and last.op in ('GOTO', 'CBRANCH'):
+            args = tuple(label if a == header.label else a for a in last.args)
+            blocks[p].instrs[-1] = Instruction(last.op, args)
+
+    # Un bloque del lazo que caía en la cabecera ahora caería en el
+    # preencabezado: salta explícitamente
+    if header.index > 0:
+        prev = blocks[header.index - 1]
+        last = prev.instrs[-1] if prev.instrs else None
+        if prev.index in loop.body and (last is None or last.op not in ('GOTO', 'CBRANCH', 'RETURN')):
+            prev.instrs.append(Instruction('GOTO', (header.label,)))
+
+    pre = BasicBlock(-1, label, [])
+    func.set_blocks(blocks[:header.index] + [pre] + blocks[header.index:])
+    return label
+
+
+def defined_in(cfg, body):
+    '''Variables y registros que escriben los bloques de body'''
+    names = set()
+    for n in body:
+        for instr in cfg.blocks[n].instrs:
+            names.update(instr.defs())
+            names.update(cfg.clobbers(instr))
+    return names
+
+
+def def_counts(func):
+    counts = {}
+    for instr in func.code:
+        for name in instr.defs():
+            counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def hoist(cfg, loop, pre):
+    '''Mueve las instrucciones invariantes de loop al bloque pre'''
+    counts = def_counts(cfg.func)
+    modified = defined_in(cfg, loop.body)
+    invariant = set()
+
+    def is_invariant(op):
+        if isinstance(op, (int, float)):
+            return True
+        return op in invariant or op not in modified
+
+    moved = []
+    changed = True
+    while changed:
+        changed = False
+        for n in sorted(loop.body):
+            block = cfg.blocks[n]
+            for instr in block.instrs:
+                if instr.op not in HOISTABLE or id(instr) in invariant:
+                    continue
+                dst = instr.args[-1]
+                if not isinstance(dst, Register) or counts.get(dst) != 1:
+                    continue
+                if all(is_invariant(op) for op in instr.args[:-1]):
+                    invariant.add(dst)
+                    invariant.add(id(instr))
+                    moved.append(instr)
+                    changed = True
+
+    if moved:
+        ids = {id(instr) for instr in moved}
+        for n in loop.body:
+            block = cfg.blocks[n]
+            block.instrs = [i for i in block.instrs if id(i) not in ids]
+        pre.instrs.extend(moved)
+    return len(moved)
+
+
+def induction_variables(cfg, loop):
+    '''
+    Variables de inducción básicas de loop: nombre -> (paso, posición) donde
+    posición es (bloque, índice) de la instrucción 'MOVI R, i' que la
+    actualiza
+    '''
+    defs = {}
+    for n in loop.body:
+        for k, instr in enumerate(cfg.blocks[n].instrs):
+            for name in instr.defs() + tuple(cfg.clobbers(instr)):
+                defs.setdefault(name, []).append((n, k, instr))
+
+    ivs = {}
+    for name, sites in defs.items():
+        if not isinstance(name, str) or len(sites) != 1:
+            continue
+        n, k, instr = sites[0]
+        if instr.op != 'MOVI' or not isinstance(instr.args[0], Register):
+            continue
+        src = defs.get(instr.args[0])
+        if not src or len(src) != 1:
+            continue
+        op, args = src[0][2].op, src[0][2].args
+        if op == 'ADDI' and args[0] == name and type(args[1]) is int:
+            step = args[1]
+        elif op == 'ADDI' and args[1] == name and type(args[0]) is int:
+            step = args[0]
+        elif op == 'SUBI' and args[0] == name and type(args[1]) is int:
+            step = -args[1]
+        else:
+            continue
+        ivs[name] = (step, (n, k))
+    return ivs
+
+
+def same_value(cfg, loop, at, site, uses):
+    '''
+    True si entre la instrucción at y cada uno de uses (posiciones (bloque,
+    índice) dentro de loop) no se puede pasar por site, el incremento de la
+    variable de inducción
+    '''
+    n, k = at
+    sn, sk = site
+    reached = set()
+    if sn != n or sk > k:
+        # Bloques alcanzables después del incremento sin volver a pasar por at
+        stack = [s for s in cfg.succs[sn] if s in loop.body]
+        while stack:
+            m = stack.pop()
+            if m not in reached and m != n:
+                reached.add(m)
+                stack.extend(s for s in cfg.succs[m] if s in loop.body)
+    for m, j in uses:
+        if m == n:
+            if j <= k or (sn == n and k < sk < j):
+                return False
+        elif m in reached or (m == sn and sn != n):
+            return False
+    return True
+
+
+def reduce_strength(cfg, loop, pre, counter):
+    '''
+    Reemplaza MULI i, c, R (i variable de inducción, c invariante) por una
+    variable que se actualiza con sumas.  counter numera las variables
+    nuevas de la función.
+    '''
+    func = cfg.func
+    ivs = induction_variables(cfg, loop)
+    if not ivs:
+        return 0
+    modified = defined_in(cfg, loop.body)
+    counts = def_counts(func)
+    all_uses = {}
+    for instr in func.code:
+        for op in instr.uses():
+            if isinstance(op, Register):
+                all_uses[op] = all_uses.get(op, 0) + 1
+
+    derived = {}                    # (i, c) -> variable
+    updates = {}                    # posición del incremento -> instrucciones
+    removed = set()
+    renames = {}
+    for n in sorted(loop.body):
+        block = cfg.blocks[n]
+        for k, instr in enumerate(block.instrs):
+            if instr.op != 'MULI' or not isinstance(instr.args[2], Register):
+                continue
+            a, b, dst = instr.args
+            if a in ivs and (type(b) is int or (b not in modified and not isinstance(b, Register))):
+                iv, c = a, b
+            elif b in ivs and (type(a) is int or (a not in modified and not isinstance(a, Register))):
+                iv, c = b, a
+            else:
+                continue
+            if counts.get(dst) != 1:
+                continue
+
+            # Todos los usos de dst deben estar en el lazo y ver el mismo
+            # valor de iv que la multiplicación
+            step, site = ivs[iv]
+            uses = [(m, j) for m in loop.body for j, use in enumerate(cfg.blocks[m].instrs)
+                    if dst in use.uses()]
+            if len(uses) != all_uses.get(dst, 0) or not same_value(cfg, loop, (n, k), site, uses):
+                continue
+
+            key = (iv, c)
+            if key not in derived:
+                var = f'$iv{counter[0]}'
+                counter[0] += 1
+                func.locals.append(IRVariable(var, 'int'))
+                derived[key] = var
+                pre.instrs.append(Instruction('MULI', (iv, c, var)))
+                if type(c) is int:
+                    inc = step * c
+                else:
+                    inc = f'$step{counter[0]}'
+                    counter[0] += 1
+                    func.locals.append(IRVariable(inc, 'int'))
+                    pre.instrs.append(Instruction('MULI', (step, c, inc)))
+                updates.setdefault(site, []).append(Instruction('ADDI', (var, inc, var)))
+            renames[dst] = derived[key]
+            removed.add(id(instr))
+
+    if not removed:
+        return 0
+    for n in loop.body:
+        block = cfg.blocks[n]
+        code = []
+        for k, instr in enumerate(block.instrs):
+            if id(instr) in removed:
+                continue
+            if any(op in renames for op in instr.uses()):
+                instr = Instruction(instr.op, tuple(rename(op, renames) for op in instr.args))
+            code.append(instr)
+            code.extend(updates.get((n, k), ()))
+        block.instrs = code
+    return len(removed)
+
+
+def rename(operand, renames):
+    if isinstance(operand, tuple):
+        return tuple(rename(op, renames) for op in operand)
+    if isinstance(operand, Register):
+        return renames.get(operand, operand)
+    return operand
+
+
+def optimize_loops(func):
+    '''
+    Optimiza los lazos de func, de adentro hacia afuera.  Devuelve un
+    LoopStats.
+    '''
+    stats = LoopStats()
+    done = set()
+    counter = [0]
+    while True:
+        cfg = CFG(func)
+        pending = [loop for loop in find_loops(cfg) if cfg.blocks[loop.header].label not in done]
+        if not pending:
+            return stats
+        loop = pending[0]
+        header = cfg.blocks[loop.header].label
+        done.add(header)
+        stats.loops += 1
+
+        # El preencabezado cambia los índices: se vuelve a construir el CFG
+        insert_preheader(func, cfg, loop)
+        cfg = CFG(func)
+        loop = next(l for l in find_loops(cfg) if cfg.blocks[l.header].label == header)
+        pre = cfg.blocks[loop.header - 1]
+
+        stats.hoisted += hoist(cfg, loop, pre)
+        stats.reduced += reduce_strength(cfg, loop, pre, counter)
+        func.set_blocks(cfg.blocks)
+
+
+def optimize_program(functions):
+    '''Optimiza los lazos de todas las funciones (dict nombre -> IRFunction)'''
+    return {name: optimize_loops(func) for name, func in functions.items()}
+
+
+def main(argv):
+    if len(argv) not in (2, 3) or (len(argv) == 3 and argv[2] != '--dump'):
+        print(f"Usage: python {argv[0]} filename [--dump]")
+        exit(1)
+
+    from plex import Lexer
+    from pparser import Parser
+    from intcode import IntermediateCodeGenerator, dump
+    from cleanup import cleanup_program
+
+    ast = Parser().parse(Lexer().tokenize_file(argv[1]))
+    gen = IntermediateCodeGenerator()
+    gen.generate_code(ast)
+    cleanup_program(gen.functions)
+    stats = optimize_program(gen.functions)
+    cleanup_program(gen.functions)
+
+    if len(argv) == 3:
+        print(dump(gen.functions))
+    print(f'{"function":<24} {"loops":>6} {"hoisted":>8} {"reduced":>8}')
+    for name, s in stats.items():
+        print(f'{name:<24} {s.loops:>6} {s.hoisted:>8} {s.reduced:>8}')
+
+
+if __name__ == '__main__':
+    import sys
+    main(sys.argv)
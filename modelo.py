@@ -1,59 +1,76 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields
 from typing import List, Any, Optional, Union
 
-@dataclass
+def astnode(cls):
+    '''
+    Como @dataclass, pero la clase usa __slots__ (sin __dict__ por instancia)
+    y guarda en _fields los nombres de sus campos en orden.  Los recorridos
+    genéricos del AST (ASTree, Checker.generic_visit) usan _fields.
+    '''
+    cls = dataclass(slots=True)(cls)
+    cls._fields = tuple(f.name for f in fields(cls) if not f.metadata.get('annotation'))
+    return cls
+
+def annotation():
+    '''
+    Campo que completa un pase posterior al parser (p.ej. resolve.py).  No
+    forma parte de _fields, de repr ni de la comparación entre nodos.
+    '''
+    return field(default=None, repr=False, compare=False, metadata={'annotation': True})
+
+@astnode
 class Node:
     pass
 
-@dataclass
+@astnode
 class Statement(Node):
     pass
 
-@dataclass
-class StatementList:
+@astnode
+class StatementList(Node):
     statements: List[str]
     date: str
     author: str
 
-@dataclass
+@astnode
 class DataType(Node):
     pass
 
-@dataclass
+@astnode
 class SimpleType(Node):
     name: str
 
-@dataclass
-class ArgList:
+@astnode
+class ArgList(Node):
     arguments: List[str]
     option: Optional[str]
     flag: bool
 
-@dataclass
+@astnode
 class Expression(Node):
     pass
 
-@dataclass
+@astnode
 class Literal(Expression):
     '''
     Un valor literal como 2, 2.5, o "dos"
     '''
     pass
 
-@dataclass
+@astnode
 class DataType(Node):
     pass
 
-@dataclass
+@astnode
 class Location(Statement):
     pass
 
 # Nodos Reales del AST
-@dataclass
+@astnode
 class Number(Literal):
     value: float
 
-@dataclass
+@astnode
 class Binop(Expression):
     '''
     Un operador binario como 2 + 3 o x * y
@@ -62,202 +79,208 @@ class Binop(Expression):
     left: Expression
     right: Expression
 
-@dataclass
+@astnode
 class UnaryOp(Node):
     op: str
     expr: Expression
 
-@dataclass
+@astnode
 class SimpleLocation(Location):
     name: str
 
-@dataclass
+@astnode
 class ReadLocation(Expression):
     location: Location
 
-@dataclass
+@astnode
 class WriteLocation(Statement):
     location: Location
     value: Expression
 
-@dataclass
-class TypeName:
+@astnode
+class TypeName(Node):
     base_type: str
     array_size: int = None
 
-@dataclass
-class Program:
+@astnode
+class Program(Node):
     funclist: List
 
     def __str__(self):
         return f"Program({self.funclist})"
 
-@dataclass
+@astnode
 class Program2(Node):
     declarations: List
 
-@dataclass
-class Function:
+@astnode
+class Function(Node):
     name: str  # Suponiendo que una función tiene un nombre
 
-@dataclass
-class CombinedFuncList:
+@astnode
+class CombinedFuncList(Node):
     funclist: List[Function]
 
     def __str__(self):
         return f"CombinedFuncList({self.funclist})"
 
-@dataclass
-class Parameter:
+@astnode
+class Parameter(Node):
     name: str
     datatype: TypeName 
 
-@dataclass
-class ParameterList:
+@astnode
+class ParameterList(Node):
     parameters: List[Parameter]
 
-@dataclass
-class VariableList:
+@astnode
+class VariableList(Node):
     declarations: List
 
-@dataclass
-class VarDef:
+@astnode
+class VarDef(Node):
     name: str
     value: str
     datatype: str
 
-@dataclass
+@astnode
 class ArrayLocation(Location):
     name: str
     index: Expression
+    depth: int = annotation()
+    slot: int = annotation()
 
-@dataclass
-class WriteStatement:
+@astnode
+class WriteStatement(Statement):
     expression: Any  # Aquí, 'Any' representa el tipo de la expresión que se va a escribir
 
     def __str__(self):
         return f"WRITE({self.expression})"
 
-@dataclass
-class ReadStatement:
+@astnode
+class ReadStatement(Statement):
     location: Location
 
-@dataclass
+@astnode
 class While(Statement):
     relation: Expression
     stmt: Statement
 
-@dataclass
+@astnode
 class Break(Statement):
     pass
 
-@dataclass
-class Location:
+@astnode
+class Location(Node):
     identifier: str
     index: Optional[Expression] = None
+    depth: int = annotation()         # Saltos de enlace estático (resolve.py)
+    slot: int = annotation()          # Posición en el marco (resolve.py)
 
-@dataclass
-class RelationalOperation:
+@astnode
+class RelationalOperation(Expression):
     left_operand: Expression
     operator: str  
     right_operand: Expression
 
-@dataclass
-class IfStatement:
+@astnode
+class IfStatement(Statement):
     condition: RelationalOperation
     then_body: Statement
     else_body: Optional[Statement] = None
 
-@dataclass
-class IfElseStatement:
+@astnode
+class IfElseStatement(Statement):
     condition: RelationalOperation
     then_body: Statement
     else_body: Optional[Statement] = None
 
-@dataclass
-class BeginEndBlock:
+@astnode
+class BeginEndBlock(Statement):
     stmtlist: List[Statement]
 
-@dataclass
-class AssignmentStatement:
+@astnode
+class AssignmentStatement(Statement):
     location: Location
     expression: Expression
 
-@dataclass
-class ReturnStatement:
+@astnode
+class ReturnStatement(Statement):
     expression: Expression
 
-@dataclass
-class SkipStatement:
+@astnode
+class SkipStatement(Statement):
     pass
 
-@dataclass
-class FunctionCall:
+@astnode
+class FunctionCall(Expression):
     identifier: str
     arguments: List[Expression]
+    target: int = annotation()        # Índice de la función llamada (resolve.py)
 
 
 
-@dataclass
-class ExprList:
+@astnode
+class ExprList(Node):
     expressions: List[Expression]
 
-@dataclass
-class IntegerNumber:
+@astnode
+class IntegerNumber(Expression):
     value: int
 
-@dataclass
-class FloatNumber:
+@astnode
+class FloatNumber(Expression):
     value: float
 
-@dataclass
-class Identifier:
+@astnode
+class Identifier(Expression):
     name: str
+    depth: int = annotation()
+    slot: int = annotation()
 
-@dataclass
-class IntConversion:
+@astnode
+class IntConversion(Expression):
     expression: Expression
 
-@dataclass
-class FloatConversion:
+@astnode
+class FloatConversion(Expression):
     expression: Expression
 
-@dataclass
+@astnode
 class TypeCast(Expression):
     conversion: Union[IntConversion, FloatConversion]
 
-@dataclass
+@astnode
 class TypeCast(Expression):
     name: str
     expr: Expression
 
-@dataclass
-class LogicalOperation:
+@astnode
+class LogicalOperation(Expression):
     operator: str
     left_operand: RelationalOperation
     right_operand: RelationalOperation
 
-@dataclass
-class NotOperation:
+@astnode
+class NotOperation(Expression):
     operand: Union[RelationalOperation, LogicalOperation]
 
-@dataclass
-class PrintStatement:
+@astnode
+class PrintStatement(Statement):
     string_expr: str
 
     def __str__(self):
         return f'PRINT("{self.string_expr}")'
 
-@dataclass
+@astnode
 class ArrayType(TypeName):
     name: str = "valor"
     dim: Expression = "valor"
 
-@dataclass
-class UnaryOperation:
-    def __init__(self, operator, operand):
-        self.operator = operator
-        self.operand = operand
+@astnode
+class UnaryOperation(Expression):
+    operator: str
+    operand: Expression
 
     def execute(self, symtable):
         if self.operator == '-':
@@ -271,17 +294,39 @@ class UnaryOperation:
 
 @dataclass
 class Visitor:
+    '''
+    Despacho de visit_<Clase> con cache por tipo.
+
+    Al crear cada subclase se arma _handlers (nombre de clase de nodo ->
+    función visit_*).  La primera vez que se visita un tipo de nodo se busca
+    su función y se guarda en _dispatch, un dict indexado por el tipo; las
+    visitas siguientes son una sola búsqueda en ese dict.
+    '''
+    _handlers = {}
+    _dispatch = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._handlers = {name[6:]: getattr(cls, name) for name in dir(cls) if name.startswith('visit_')}
+        cls._dispatch = {}
+
+    @classmethod
+    def handler(cls, nodetype):
+        func = cls._handlers.get(nodetype.__name__, cls.generic_visit)
+        cls._dispatch[nodetype] = func
+        return func
+
     def visit(self, node):
-        method_name = f"visit_{type(node).__name__}"
-        visitor_method = getattr(self, method_name, self.generic_visit)
-        return visitor_method(node)
+        func = self._dispatch.get(node.__class__) or self.handler(node.__class__)
+        return func(self, node)
 
     def generic_visit(self, node):
         raise NotImplementedError(f"No visit_{type(node).__name__} method defined")
 
-@dataclass
+@astnode
 class FunDefinition(Node):
     name: str
     parameters: List[Parameter]
     local_variables: List[VarDef]
     statements: List[Statement]
+    frame: Any = annotation()         # FrameLayout de la función (resolve.py)
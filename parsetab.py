@@ -0,0 +1,141 @@
+# parsetab.py
+'''
+Cache en disco de las tablas LALR(1) del parser.
+
+sly construye el autómata LALR(1) completo cada vez que se crea la clase
+Parser (es decir, en cada proceso que importa pparser.py).  Este módulo
+serializa las tablas action/goto, los estados por defecto y la lista de
+producciones la primera vez, y en los procesos siguientes las carga desde
+disco en lugar de regenerarlas.
+
+La cache se identifica con un hash de la gramática: los tokens, la tabla
+de precedencia, el símbolo inicial y cada una de las reglas (nombre de la
+producción y sus símbolos).  Si la gramática cambia, el hash cambia y las
+tablas se vuelven a construir.
+
+Variables de entorno:
+
+  PL0_PARSETAB    Ruta del archivo de cache (por defecto parsetab.pickle
+                  junto a este archivo).  Una cadena vacía desactiva la cache.
+'''
+import hashlib
+import os
+import pickle
+
+import sly
+from sly.yacc import _collect_grammar_rules
+
+CACHE_VERSION = 1
+
+DEFAULT_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parsetab.pickle')
+
+
+class CachedLRTable:
+    '''
+    Sustituto mínimo de sly.yacc.LRTable con lo único que usa Parser.parse()
+    '''
+    def __init__(self, lr_action, lr_goto, defaulted_states):
+        self.lr_action = lr_action
+        self.lr_goto = lr_goto
+        self.defaulted_states = defaulted_states
+
+    def __str__(self):
+        return '(tablas LALR cargadas desde la cache; no hay descripción de estados)'
+
+
+def cache_path():
+    return os.environ.get('PL0_PARSETAB', DEFAULT_CACHE)
+
+
+def collect_rules(definitions):
+    return [(name, value) for name, value in definitions
+            if callable(value) and hasattr(value, 'rules')]
+
+
+def grammar_signature(cls, rules):
+    '''
+    Calcula el hash que identifica la gramática de cls
+    '''
+    h = hashlib.sha256()
+    h.update(f'{CACHE_VERSION}:{sly.__version__}\n'.encode())
+    h.update(repr(sorted(cls.tokens)).encode())
+    h.update(repr(getattr(cls, 'precedence', ())).encode())
+    h.update(repr(getattr(cls, 'start', None)).encode())
+    for _, func in rules:
+        for _, _, _, prodname, syms in _collect_grammar_rules(func):
+            h.update(f'\n{prodname} -> {" ".join(syms)}'.encode())
+    return h.hexdigest()
+
+
+def production_list(grammar):
+    return [(p.name, p.prod) for p in grammar.Productions]
+
+
+def load(path, signature):
+    try:
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get('signature') != signature:
+        return None
+    return data
+
+
+def save(path, signature, grammar, lrtable):
+    data = {
+        'signature': signature,
+        'productions': production_list(grammar),
+        'lr_action': lrtable.lr_action,
+        'lr_goto': lrtable.lr_goto,
+        'defaulted_states': lrtable.defaulted_states,
+    }
+    tmp = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        # Un directorio de solo lectura no debe impedir compilar
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+
+def build(cls, definitions):
+    '''
+    Reemplazo de sly.Parser._build() que usa la cache de tablas.
+
+    La gramática (producciones y sus funciones) se reconstruye siempre porque
+    es barata y contiene las referencias a las funciones de cada regla; lo
+    que se evita es el cálculo de los conjuntos LALR(1) y el volcado de
+    depuración.
+    '''
+    rules = collect_rules(definitions)
+
+    if not cls._Parser__validate_specification():
+        raise sly.yacc.YaccError('Invalid parser specification')
+
+    cls._Parser__build_grammar(rules)
+
+    path = cache_path()
+    signature = grammar_signature(cls, rules)
+    data = load(path, signature) if path else None
+
+    if data is not None and data['productions'] == production_list(cls._grammar):
+        cls._lrtable = CachedLRTable(data['lr_action'], data['lr_goto'], data['defaulted_states'])
+        return
+
+    if not cls._Parser__build_lrtables():
+        raise sly.yacc.YaccError("Can't build parsing tables")
+
+    if path:
+        save(path, signature, cls._grammar, cls._lrtable)
+
+    if cls.debugfile:
+        with open(cls.debugfile, 'w') as f:
+            f.write(str(cls._grammar))
+            f.write('\n')
+            f.write(str(cls._lrtable))
+        cls.log.info('Parser debugging for %s written to %s', cls.__qualname__, cls.debugfile)
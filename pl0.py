@@ -18,6 +18,10 @@ optional arguments:
   --sym              Dump the symbol table
   -S, --asm          Store the generated assembly file
   -R, --exec         Execute the generated program
+  -E, --engine       Execution engine: vm (bytecode) or closure (default: vm)
+  --no-fold          Do not fold constants, clean up the IR or vectorize array loops
+  --memo             Memoize pure functions in an LRU cache per function
+  --memo-size N      Entries of each --memo cache (default 1024)
 '''
 from contextlib import redirect_stdout
 from rich       import print
@@ -25,6 +29,7 @@ from rich       import print
 from plex       import Lexer, print_lexer
 from pparser     import Parser
 from context    import Context
+from effects    import MEMO_SIZE
 from ASTree     import *
 
 import argparse
@@ -72,25 +77,63 @@ def parse_args():
     action='store_true',
     help='Dump the symbol table')
 
-  return cli.parse_args()
+  mutex.add_argument(
+    '-R', '--exec',
+    action='store_true',
+    help='Execute the generated program')
+
+  cli.add_argument(
+    '--no-fold',
+    action='store_true',
+    help='Do not fold constants, clean up the IR or vectorize array loops')
+
+  cli.add_argument(
+    '--memo',
+    action='store_true',
+    help='Memoize pure functions in an LRU cache per function and report hits and misses at exit')
+
+  cli.add_argument(
+    '--memo-size',
+    type=int,
+    default=MEMO_SIZE,
+    metavar='N',
+    help=f'Entries of each --memo cache (default {MEMO_SIZE})')
+
+  cli.add_argument(
+    '-E', '--engine',
+    choices=['vm', 'closure'],
+    default='vm',
+    help='Execution engine used by --exec and the REPL (default: vm)')
+
+  args = cli.parse_args()
+  if args.memo_size < 1:
+    cli.error('argument --memo-size: must be at least 1')
+  return args
 
 
 if __name__ == '__main__':
 
   args = parse_args()
-  context = Context()
-
-  if args.input: fname = args.input
+  context = Context(args.engine, optimize=not args.no_fold, memo=args.memo_size if args.memo else 0)
 
-  with open(fname, encoding='utf-8') as file:
-    source = file.read()
+  source = ''
+  if args.input:
+    fname = args.input
+    if not args.lex:          # --lex lee el archivo por partes
+      with open(fname, encoding='utf-8') as file:
+        source = file.read()
 
   if args.lex:
     flex = fname.split('.')[0] + '.lex'
     print(f'print lexer: {flex}')
     with open(flex, 'w', encoding='utf-8') as f:
       with redirect_stdout(f):
-        print_lexer(source)
+        print_lexer(Lexer().tokenize_file(fname))
+
+  elif args.exec:
+    context.parse(source)
+    context.check()
+    context.run()               # No ejecuta si check() informó errores
 
   elif args.dot or args.png:
     ast_instance = AST(Program)
@@ -111,19 +154,30 @@ if __name__ == '__main__':
 
     else:
       context.parse(source)
+      context.check()
       context.run()
 
   else:
-
+    # REPL: las líneas se acumulan hasta una línea en blanco.  Las funciones
+    # ingresadas se agregan al programa (o reemplazan a las del mismo nombre)
+    # y solo esas se vuelven a analizar y a revisar.  Mientras no haya main
+    # no se revisa (check() la exige) ni se ejecuta.
+    if source:
+      context.parse(source)
+    lines = []
     try:
       while True:
-        source = input('pl0 $ ')
-        context.parse(source)
-        if not context.have_errors:
-          for stmt in context.ast.stmts:
-            context.ast = stmt
-            context.run()
+        line = input('  ... ' if lines else 'pl0 $ ')
+        if line.strip():
+          lines.append(line)
+          continue
+        if not lines:
+          continue
+        context.define('\n'.join(lines))
+        lines = []
+        if not context.have_errors and 'main' in context.function_names():
+          context.check()
+          context.run()
 
     except EOFError:
       pass
-
@@ -1,5 +1,10 @@
 import sly
 import sys
+import codecs
+import io
+import mmap
+import os
+from contextlib import redirect_stdout
 from rich import print
 from rich.table import Table
 from rich.console import Console
@@ -19,27 +24,29 @@ class Lexer(sly.Lexer):
     literals = '"_[]."_'
     
     # Expresiones regulares para tokens
-    FUN = r'fun'
-    # VAR = r'var'
-    BEGIN = r'begin'
-    END = r'end'
-    RETURN = r'return'
-    SKIP = r'skip'
-    ELSE = r'else'
-    BREAK = r'break'
-    NOT = r'not'
-    OR = r'or'
-    AND = r'and'
-    IF = r'if'
-    INT = r'int'
-    FLOAT = r'float'
-    THEN = r'then'  
-    WHILE = r'while'
-    DO = r'do\b'
-    PRINT = r'print'
-    WRITE = r'\bwrite\b'
-    READ = r'read'
+    # Las palabras reservadas no tienen regex propia: se reconoce el
+    # identificador completo y luego se reclasifica por tabla (remapeo de sly),
+    # de modo que 'ender' o 'into' siguen siendo IDENT.
     IDENT = r'[A-Za-z][A-Za-z0-9_]*'
+    IDENT['fun'] = FUN
+    IDENT['begin'] = BEGIN
+    IDENT['end'] = END
+    IDENT['return'] = RETURN
+    IDENT['skip'] = SKIP
+    IDENT['else'] = ELSE
+    IDENT['break'] = BREAK
+    IDENT['not'] = NOT
+    IDENT['or'] = OR
+    IDENT['and'] = AND
+    IDENT['if'] = IF
+    IDENT['int'] = INT
+    IDENT['float'] = FLOAT
+    IDENT['then'] = THEN
+    IDENT['while'] = WHILE
+    IDENT['do'] = DO
+    IDENT['print'] = PRINT
+    IDENT['write'] = WRITE
+    IDENT['read'] = READ
 
     COMMENT = r'/\*(.|\n)*?\*/'
     LBRACKET = r'\['
@@ -68,6 +75,7 @@ class Lexer(sly.Lexer):
     def __init__(self):
         super().__init__()
         self.lineno = 1
+        self.error_count = 0
 
     @_(r'\d+\.\d+')
     def FNUMBER(self, t):
@@ -86,10 +94,11 @@ class Lexer(sly.Lexer):
     def NEWLINE(self, t):
         self.lineno += t.value.count('\n')
 
-    @_(r'\s*"[^"\\]*(\\.[^"\\]*)*"\s*')
+    @_(r'"[^"\\]*(\\.[^"\\]*)*"')
     def STRING(self, t):
-        t.value = t.value.strip('" \t\n\r')  # Elimina espacios en blanco y comillas alrededor de la cadena
+        t.value = t.value[1:-1]  # Elimina las comillas; los espacios de adentro son parte de la cadena
         t.lineno = self.lineno
+        self.lineno += t.value.count('\n')
         return t
 
     # Expresión regular para caracteres escapados en cadenas
@@ -114,9 +123,95 @@ class Lexer(sly.Lexer):
 
     def error(self, t):
         print(f"Lexer error: Unexpected character '{t.value[0]}' at line {self.lineno}")
+        self.error_count += 1
         self.index += 1 
         return None
 
+    def tokenize_stream(self, pieces, lineno=1):
+        '''
+        Igual que tokenize() pero sobre un texto que llega por partes
+        (cualquier iterable de str).  Los tokens se generan a medida que se
+        leen y conservan lineno/index absolutos; en memoria solo queda el
+        tramo que aún no se tokenizó.
+
+        Cada tramo se corta en el último salto de línea.  Si el corte cae
+        dentro de un comentario o de una cadena (el tramo deja un '/' '*'
+        contiguos o una comilla suelta) se lee la parte siguiente y se vuelve
+        a tokenizar el tramo completo.
+        '''
+        pieces = iter(pieces)
+        buf = ''
+        base = 0
+        eof = False
+        while True:
+            if not eof:
+                piece = next(pieces, None)
+                if piece is None:
+                    eof = True
+                else:
+                    buf += piece
+            cut = len(buf) if eof else buf.rfind('\n') + 1
+            if not cut:
+                if eof:
+                    return
+                continue
+
+            errors = self.error_count
+            out = io.StringIO()
+            with redirect_stdout(out):
+                tokens = list(self.tokenize(buf[:cut], lineno))
+            if not eof and not _complete(tokens):
+                self.error_count = errors
+                continue
+
+            sys.stdout.write(out.getvalue())
+            lineno = self.lineno
+            for tok in tokens:
+                tok.index += base
+                tok.end += base
+                yield tok
+            buf = buf[cut:]
+            base += cut
+
+    def tokenize_file(self, filename, chunksize=1 << 16, encoding='utf-8'):
+        '''
+        Tokeniza filename sin cargarlo completo (ver read_chunks)
+        '''
+        return self.tokenize_stream(read_chunks(filename, chunksize, encoding))
+
+
+def _complete(tokens):
+    '''
+    False si el tramo terminó con un comentario o una cadena sin cerrar
+    '''
+    prev = None
+    for tok in tokens:
+        if tok.type == '"':
+            return False
+        if tok.type == 'TIMES' and prev is not None and prev.type == 'DIVIDE' and prev.end == tok.index:
+            return False
+        prev = tok
+    return True
+
+
+def read_chunks(filename, chunksize=1 << 16, encoding='utf-8'):
+    '''
+    Lee filename con mmap y lo entrega decodificado en partes de chunksize
+    bytes.  Los saltos de línea se normalizan como en open() en modo texto.
+    '''
+    decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(), translate=True)
+    with open(filename, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for start in range(0, size, chunksize):
+                    text = decoder.decode(data[start:start + chunksize])
+                    if text:
+                        yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
 def print_lexer(tokens):
     console = Console()
 
@@ -143,14 +238,9 @@ def main():
         exit(1)
 
     filename = sys.argv[1]
-    with open(filename, 'r') as file:
-        text = file.read()
-
     lexer_sly = Lexer()
 
-    tokens = list(lexer_sly.tokenize(text))
-
-    print_lexer(tokens)
+    print_lexer(lexer_sly.tokenize_file(filename))
 
 
 if __name__ == '__main__':
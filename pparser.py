@@ -3,10 +3,14 @@ from plex import Lexer
 from modelo import *
 from rich import print
 from ASTree import *
+import parsetab
+import os
 import sys
 
 class Parser(sly.Parser):
-    debugfile = 'pl0.txt'
+    # El volcado de estados solo se escribe cuando las tablas se regeneran.
+    # PL0_PARSER_DEBUGFILE='' lo desactiva (por ejemplo, en producción).
+    debugfile = os.environ.get('PL0_PARSER_DEBUGFILE', 'pl0.txt') or None
 
     tokens = Lexer.tokens
 
@@ -23,6 +27,11 @@ class Parser(sly.Parser):
     ('nonassoc', 'FUN'),
 )
     
+    @classmethod
+    def _build(cls, definitions):
+        # Tablas LALR(1) desde la cache en disco (ver parsetab.py)
+        parsetab.build(cls, definitions)
+
     def __init__(self):
         self.symtable = {}
         self.error_count = 0
@@ -36,9 +45,12 @@ class Parser(sly.Parser):
     def program(self, p):
         return Program([p.stmt])
     
+    # Las listas se extienden en su lugar: p.x + [p.y] copiaría la lista en
+    # cada reducción (O(N²) para N elementos)
     @_('funclist function')
     def funclist(self, p):
-        return p.funclist + [p.function]
+        p.funclist.append(p.function)
+        return p.funclist
     
     @_('function')
     def funclist(self, p):
@@ -54,7 +66,8 @@ class Parser(sly.Parser):
     
     @_('parmlist COMMA parm')
     def parmlist(self, p):
-        return p.parmlist + [p.parm]
+        p.parmlist.append(p.parm)
+        return p.parmlist
     
     @_('parm')
     def parmlistitems(self, p):
@@ -100,9 +113,12 @@ class Parser(sly.Parser):
     def varlist(self, p):
         return [p.decllist1]
     
-    @_('decllist1 SEMICOLON varlist')
+    # Recursiva por izquierda: con 'decllist1 SEMICOLON varlist' cada
+    # declaración se anteponía con [d] + lista
+    @_('varlist decllist1 SEMICOLON')
     def varlist(self, p):
-        return [p.decllist1] + p.varlist
+        p.varlist.append(p.decllist1)
+        return p.varlist
     
     @_('vardecl')
     def decllist1(self, p):
@@ -131,7 +147,8 @@ class Parser(sly.Parser):
 
     @_('decllist SEMICOLON vardecl')
     def decllist(self, p):
-        return p.decllist + [p.vardecl]
+        p.decllist.append(p.vardecl)
+        return p.decllist
 
     @_('stmt')
     def stmtlist(self, p):
@@ -139,13 +156,13 @@ class Parser(sly.Parser):
     
     @_('stmtlist SEMICOLON stmt')
     def stmtlist(self, p):
-        return p.stmtlist + [p.stmt]
+        p.stmtlist.append(p.stmt)
+        return p.stmtlist
     
 
     @_('PRINT LPARENT STRING RPARENT')
     def stmt(self, p):
-        string_value = p.STRING
-        print(string_value)
+        return PrintStatement(p.STRING)
 
     @_('READ LPARENT location RPARENT')
     def stmt(self, p):
@@ -288,7 +305,7 @@ class Parser(sly.Parser):
     'expr DF expr'
     )
     def relop(self, p):
-        return RelationalOperation(p[1], p.expr0, p.expr1)
+        return RelationalOperation(p.expr0, p[1], p.expr1)
 
     @_('relop AND relop',
         'relop OR relop'
@@ -306,9 +323,11 @@ class Parser(sly.Parser):
     
     @_('exprlist COMMA expr')
     def exprlist(self, p):
-        return p.exprlist + [p.expr]
+        p.exprlist.append(p.expr)
+        return p.exprlist
     
     def error(self, p):
+        self.error_count += 1
         if p:
             print(f"Parser error: Unexpected token '{p.value}' of type '{p.type}' at line {p.lineno}")
             print(f"Context: {self.get_error_context(p)}")
@@ -330,12 +349,9 @@ def main(argv):
         exit(1)
 
     filename = sys.argv[1]
-    with open(filename, 'r') as file:
-        text = file.read()
-
     lexer_sly = Lexer()
     parser_sly = Parser()
-    result = parser_sly.parse(lexer_sly.tokenize(text))
+    result = parser_sly.parse(lexer_sly.tokenize_file(filename))
     ast_visitor = AST(result)
 
     # Realiza la visita al AST
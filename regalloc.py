@@ -0,0 +1,209 @@
+# regalloc.py
+'''
+Asignación de registros por barrido lineal
+==========================================
+IntermediateCodeGenerator numera los registros virtuales en todo el
+programa (register_counter solo crece), así que cada resultado intermedio
+tiene su propio Register.  Este pase los asigna a un banco fijo de nregs
+registros por tipo ('int' y 'float', como los bancos de enteros y de punto
+flotante de una máquina real), siguiendo a Poletto y Sarkar:
+
+  1. Intervalos de vida.  Las instrucciones se numeran en el orden del
+     código; cada uso en la posición 2p y cada definición en 2p+1, de modo
+     que un registro que muere en una instrucción puede reutilizarse para
+     el resultado de esa misma instrucción.  dataflow.Liveness extiende el
+     intervalo a todo bloque en el que el registro está vivo a la entrada
+     o a la salida (lazos incluidos).
+  2. Barrido.  Los intervalos se recorren por inicio; los que ya
+     terminaron liberan su registro.  Si no queda ninguno libre se derrama
+     el intervalo que termina más tarde (el actual o uno de los activos).
+  3. Reescritura.  Cada registro virtual se reemplaza por Register(k, tipo)
+     con k < nregs o, si se derramó, por una variable local '$spill{n}'
+     (un slot del marco).
+
+Después de asignar, la VM reserva solo los registros que se usan en cada
+función en lugar de un slot por cada registro virtual.  La presión de
+registros (máximo de registros vivos a la vez) se informa por función y
+por tipo.
+'''
+from dataclasses import dataclass, field
+from heapq import heappop, heappush
+from typing import Dict, List, Optional
+
+from intcode import Instruction, Register, IRVariable
+from dataflow import CFG, Liveness
+
+REGISTERS = 16                  # Tamaño por omisión de cada banco
+
+
+@dataclass
+class Interval:
+    reg: Register
+    start: int
+    end: int
+    phys: Optional[int] = None      # Registro asignado
+    spill: Optional[str] = None     # Variable local si se derramó
+
+
+@dataclass
+class Allocation:
+    function: str
+    nregs: int
+    virtual: int = 0                                    # Registros virtuales
+    pressure: Dict[str, int] = field(default_factory=dict)   # Máximo vivos por tipo
+    used: Dict[str, int] = field(default_factory=dict)       # Registros asignados por tipo
+    spills: List[Interval] = field(default_factory=list)
+
+
+def live_intervals(func):
+    '''Intervalos de los registros de func, ordenados por inicio'''
+    cfg = CFG(func)
+    live = Liveness(cfg).solve()
+    intervals = {}
+
+    def extend(reg, pos):
+        interval = intervals.get(reg)
+        if interval is None:
+            intervals[reg] = Interval(reg, pos, pos)
+        else:
+            interval.start = min(interval.start, pos)
+            interval.end = max(interval.end, pos)
+
+    p = 0
+    for b in cfg.blocks:
+        first = p
+        for instr in b.instrs:
+            for op in instr.uses():
+                if isinstance(op, Register):
+                    extend(op, 2 * p)
+            for op in instr.defs():
+                if isinstance(op, Register):
+                    extend(op, 2 * p + 1)
+            p += 1
+        last = max(first, p - 1)
+        for reg in live.decode(live.ins[b.index]):
+            if isinstance(reg, Register):
+                extend(reg, 2 * first)
+        for reg in live.decode(live.outs[b.index]):
+            if isinstance(reg, Register):
+                extend(reg, 2 * last + 1)
+    return sorted(intervals.values(), key=lambda i: (i.start, i.reg.num))
+
+
+def pressure(intervals):
+    '''Máximo de intervalos (ordenados por inicio) vivos a la vez'''
+    ends = []
+    most = 0
+    for interval in intervals:
+        while ends and ends[0] < interval.start:
+            heappop(ends)
+        heappush(ends, interval.end)
+        most = max(most, len(ends))
+    return most
+
+
+def linear_scan(intervals, nregs):
+    '''
+    Asigna phys a los intervalos (de un mismo tipo, ordenados por inicio) o
+    los marca para derramar (phys None).  Devuelve los registros usados.
+    '''
+    free = list(range(nregs - 1, -1, -1))
+    active = []                     # Ordenados por end
+    used = 0
+    for interval in intervals:
+        while active and active[0].end < interval.start:
+            free.append(active.pop(0).phys)
+
+        if free:
+            interval.phys = free.pop()
+            used = max(used, interval.phys + 1)
+            insert(active, interval)
+            continue
+
+        # Sin registros: se derrama el que termina más tarde
+        last = active[-1] if active else None
+        if last is not None and last.end > interval.end:
+            interval.phys, last.phys = last.phys, None
+            active.pop()
+            insert(active, interval)
+    return used
+
+
+def insert(active, interval):
+    n = len(active)
+    while n and active[n - 1].end > interval.end:
+        n -= 1
+    active.insert(n, interval)
+
+
+def rewrite(operand, mapping):
+    if isinstance(operand, Register):
+        return mapping[operand]
+    if isinstance(operand, tuple):
+        return tuple(rewrite(op, mapping) for op in operand)
+    return operand
+
+
+def allocate(func, nregs=REGISTERS):
+    '''
+    Asigna los registros de func a bancos de nregs registros y reescribe su
+    código.  Devuelve el Allocation con la presión y los derrames.
+    '''
+    intervals = live_intervals(func)
+    report = Allocation(func.name, nregs, virtual=len(intervals))
+    mapping = {}
+    for type in ('int', 'float'):
+        group = [i for i in intervals if i.reg.type == type]
+        report.pressure[type] = pressure(group)
+        report.used[type] = linear_scan(group, nregs)
+        for interval in group:
+            if interval.phys is not None:
+                mapping[interval.reg] = Register(interval.phys, type)
+            else:
+                interval.spill = f'$spill{len(report.spills)}'
+                func.locals.append(IRVariable(interval.spill, type))
+                mapping[interval.reg] = interval.spill
+                report.spills.append(interval)
+
+    func.code = [Instruction(instr.op, tuple(rewrite(op, mapping) for op in instr.args))
+                 for instr in func.code]
+    return report
+
+
+def allocate_program(functions, nregs=REGISTERS):
+    '''Asigna registros en todas las funciones (dict nombre -> IRFunction)'''
+    return {name: allocate(func, nregs) for name, func in functions.items()}
+
+
+def main(argv):
+    import argparse
+    from plex import Lexer
+    from pparser import Parser
+    from intcode import IntermediateCodeGenerator, dump
+    from cleanup import cleanup_program
+
+    cli = argparse.ArgumentParser(prog=argv[0], description='Linear-scan register allocation')
+    cli.add_argument('filename')
+    cli.add_argument('-k', '--registers', type=int, default=REGISTERS,
+                     help=f'registers per bank (default: {REGISTERS})')
+    cli.add_argument('--dump', action='store_true', help='print the rewritten IR')
+    args = cli.parse_args(argv[1:])
+
+    ast = Parser().parse(Lexer().tokenize_file(args.filename))
+    gen = IntermediateCodeGenerator()
+    gen.generate_code(ast)
+    cleanup_program(gen.functions)
+    reports = allocate_program(gen.functions, args.registers)
+
+    if args.dump:
+        print(dump(gen.functions))
+    print(f'{"function":<24} {"virtual":>7} {"press.i":>7} {"press.f":>7} '
+          f'{"used.i":>6} {"used.f":>6} {"spills":>6}')
+    for name, r in reports.items():
+        print(f'{name:<24} {r.virtual:>7} {r.pressure["int"]:>7} {r.pressure["float"]:>7} '
+              f'{r.used["int"]:>6} {r.used["float"]:>6} {len(r.spills):>6}')
+
+
+if __name__ == '__main__':
+    import sys
+    main(sys.argv)
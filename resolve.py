@@ -0,0 +1,216 @@
+# resolve.py
+'''
+Resolución de nombres
+=====================
+Pase sobre el AST que se ejecuta una vez, después del análisis semántico, y
+deja cada nombre resuelto a enteros para que las etapas siguientes no tengan
+que buscar en tablas de símbolos:
+
+  Identifier, Location, ArrayLocation   .depth  saltos de enlace estático
+                                                (0 = variable local)
+                                        .slot   posición en ese marco
+  FunctionCall                          .target índice de la función en
+                                                Resolver.frames
+  FunDefinition                         .frame  su FrameLayout
+
+FrameLayout.rettype es el tipo de retorno de la función según
+typesys.return_types(), para que el llamador sepa el tipo de la llamada
+antes de compilar el cuerpo de la función.
+
+La disposición de cada marco se calcula de antemano (FrameLayout), también
+para las funciones anidadas como merge dentro de mrgsort:
+
+  slot 0        enlace estático (marco de la función que la contiene)
+  slot 1        valor de retorno
+  slots 2..     parámetros y luego variables locales
+
+Las funciones de un mismo ámbito se declaran todas antes de resolver sus
+cuerpos, así que pueden llamarse entre sí sin importar el orden.
+'''
+from dataclasses import dataclass
+from typing import Optional
+
+from modelo import *
+from intcode import declarations, array_size
+from typesys import return_types
+
+LINK = 0
+RETVAL = 1
+FIRST = 2
+
+
+class ResolveError(Exception):
+    pass
+
+
+@dataclass
+class Variable:
+    name: str
+    type: str                       # 'int' o 'float'
+    size: Optional[int]             # Tamaño si es un arreglo
+    slot: int
+    param: bool = False
+
+
+class FrameLayout:
+    '''
+    Marco de una función: sus variables por slot y las funciones anidadas
+    que declara.  depth es el nivel de anidamiento (0 para las de nivel
+    superior) e index su posición en Resolver.frames.
+    '''
+    def __init__(self, node, parent, index):
+        self.node = node
+        self.name = node.name if parent is None else f'{parent.name}.{node.name}'
+        self.parent = parent
+        self.index = index
+        self.depth = parent.depth + 1 if parent else 0
+        self.variables = []
+        self.slots = {}             # nombre -> Variable
+        self.functions = {}         # nombre -> FrameLayout de las anidadas
+        self.nparams = 0
+        self.rettype = 'int'        # 'int' o 'float' (typesys.return_types)
+
+    @property
+    def size(self):
+        return FIRST + len(self.variables)
+
+    def add(self, name, type, size, param=False):
+        if name in self.slots:
+            raise ResolveError(f"'{name}' ya está definida en {self.name}")
+        var = Variable(name, type, size, FIRST + len(self.variables), param)
+        self.variables.append(var)
+        self.slots[name] = var
+        self.nparams += param
+        return var
+
+    def variable(self, depth, slot):
+        '''Variable en (depth, slot) vista desde este marco'''
+        frame = self
+        for _ in range(depth):
+            frame = frame.parent
+        return frame.variables[slot - FIRST]
+
+
+class Resolver(Visitor):
+    def __init__(self):
+        self.frames = []            # FrameLayout por índice
+        self.globals = {}           # nombre -> FrameLayout de nivel superior
+        self.frame = None
+
+    def resolve(self, program):
+        self.visit(program)
+        types = return_types(program)
+        for layout in self.frames:
+            layout.rettype = types.get(id(layout.node)) or 'int'
+        return self.frames
+
+    def declare(self, decls, parent, scope):
+        for decl in decls:
+            if not isinstance(decl, FunDefinition):
+                continue
+            if decl.name in scope:
+                raise ResolveError(f'La función {decl.name} ya está definida.')
+            layout = FrameLayout(decl, parent, len(self.frames))
+            for p in declarations(decl.parameters):
+                layout.add(p.name, p.datatype.base_type.lower(), array_size(p.datatype), param=True)
+            for v in declarations(decl.local_variables):
+                if not isinstance(v, FunDefinition):
+                    layout.add(v.name, v.datatype.base_type.lower(), array_size(v.datatype))
+            decl.frame = layout
+            self.frames.append(layout)
+            scope[decl.name] = layout
+
+    def lookup(self, name):
+        depth = 0
+        frame = self.frame
+        while frame is not None:
+            if name in frame.slots:
+                return depth, frame.slots[name].slot
+            frame = frame.parent
+            depth += 1
+        raise ResolveError(f'Variable no definida: {name}')
+
+    def lookup_function(self, name):
+        frame = self.frame
+        while frame is not None:
+            if name in frame.functions:
+                return frame.functions[name]
+            frame = frame.parent
+        if name in self.globals:
+            return self.globals[name]
+        raise ResolveError(f'Función no definida: {name}')
+
+    def generic_visit(self, node):
+        for name in node._fields:
+            value = getattr(node, name)
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, Node):
+                        self.visit(item)
+            elif isinstance(value, Node):
+                self.visit(value)
+
+    def visit_Program(self, node):
+        self.declare(node.funclist, None, self.globals)
+        for func in node.funclist:
+            self.visit(func)
+
+    def visit_FunDefinition(self, node):
+        layout = node.frame
+        outer, self.frame = self.frame, layout
+        decls = declarations(node.local_variables)
+        self.declare(decls, layout, layout.functions)
+        for decl in decls:
+            if isinstance(decl, FunDefinition):
+                self.visit(decl)
+        for stmt in node.statements:
+            if stmt is not None:
+                self.visit(stmt)
+        self.frame = outer
+
+    def visit_Identifier(self, node):
+        node.depth, node.slot = self.lookup(node.name)
+
+    def visit_Location(self, node):
+        node.depth, node.slot = self.lookup(node.identifier)
+
+    def visit_ArrayLocation(self, node):
+        node.depth, node.slot = self.lookup(node.name)
+        self.visit(node.index)
+
+    def visit_FunctionCall(self, node):
+        callee = self.lookup_function(node.identifier)
+        node.target = callee.index
+        self.generic_visit(node)
+
+
+def resolve(program):
+    '''
+    Resuelve program en su lugar.  Devuelve (frames, globals)
+    '''
+    resolver = Resolver()
+    resolver.resolve(program)
+    return resolver.frames, resolver.globals
+
+
+def main(argv):
+    if len(argv) != 2:
+        print(f"Usage: python {argv[0]} filename")
+        exit(1)
+
+    from plex import Lexer
+    from pparser import Parser
+
+    ast = Parser().parse(Lexer().tokenize_file(argv[1]))
+    frames, _ = resolve(ast)
+    for frame in frames:
+        print(f'[{frame.index}] {frame.name} -> {frame.rettype}  depth={frame.depth} size={frame.size} params={frame.nparams}')
+        for var in frame.variables:
+            size = f'[{var.size}]' if var.size is not None else ''
+            kind = 'param' if var.param else 'local'
+            print(f'    slot {var.slot}: {var.name}: {var.type}{size} ({kind})')
+
+
+if __name__ == '__main__':
+    import sys
+    main(sys.argv)
@@ -10,7 +10,12 @@ Este archivo implementa características básicas del sistema de tipos. Aquí
 
 Una forma de lograr todos estos objetivos es comenzar con algún tipo de enfoque basado en tablas. No es lo más sofisticado, pero funcionará como punto de partida.
 Puedes regresar y refactorizar el sistema de tipos más tarde.
+
+return_types() infiere sobre el AST el tipo de retorno de cada función
+('int' o 'float').  Lo usan checker.py, intcode.py y resolve.py, así que los
+tres tipan igual una llamada.
 '''
+from modelo import *
 
 # Set of valid typenames
 typenames = { 'int', 'float', 'bool' }
@@ -85,3 +90,116 @@ def check_unary_op(op, expr):
   # type or None if not supported.
   return _unary_ops.get((op, expr))
 
+
+# ---------------------------------------------------------------------
+#  Tipos de retorno
+# ---------------------------------------------------------------------
+
+def declarations(decls):
+  if decls is None:
+    return []
+  if isinstance(decls, (VariableList, ParameterList)):
+    decls = decls.declarations if isinstance(decls, VariableList) else decls.parameters
+  return decls
+
+
+def returns(node):
+  '''ReturnStatement del cuerpo de la función node (sin los de sus anidadas)'''
+  stack = [s for s in node.statements if s is not None]
+  while stack:
+    stmt = stack.pop()
+    if isinstance(stmt, list):
+      stack.extend(stmt)
+    elif isinstance(stmt, ReturnStatement):
+      yield stmt
+    elif isinstance(stmt, Node) and not isinstance(stmt, Expression):
+      stack.extend(getattr(stmt, name) for name in stmt._fields)
+
+
+class _Scope:
+  '''Variables (nombre -> tipo escalar) y funciones declaradas en un nivel'''
+  def __init__(self, parent, decls):
+    self.parent = parent
+    self.variables = {}
+    self.functions = {}
+    for decl in decls:
+      if isinstance(decl, FunDefinition):
+        self.functions.setdefault(decl.name, decl)
+      else:
+        base = decl.datatype.base_type.lower()
+        self.variables.setdefault(decl.name, 'float' if base == 'float' else 'int')
+
+  def lookup(self, name, kind):
+    scope = self
+    while scope is not None:
+      table = getattr(scope, kind)
+      if name in table:
+        return table[name]
+      scope = scope.parent
+    return None
+
+
+class _ReturnTypes:
+  def __init__(self, program):
+    self.types = {}             # id(FunDefinition) -> tipo (None mientras no se conoce)
+    self.scopes = {}            # id(FunDefinition) -> _Scope de su cuerpo
+    functions = []
+    self.declare(program.funclist, None, functions)
+    # Punto fijo: los tipos solo suben (None -> 'int' -> 'float'), así que
+    # las llamadas recursivas o mutuas se resuelven en pocas pasadas
+    changed = True
+    while changed:
+      changed = False
+      for node in functions:
+        type = self.infer(node)
+        if type != self.types.get(id(node)):
+          self.types[id(node)] = type
+          changed = True
+
+  def declare(self, decls, parent, functions):
+    scope = _Scope(parent, decls)
+    for decl in decls:
+      if isinstance(decl, FunDefinition):
+        inner = list(declarations(decl.parameters)) + list(declarations(decl.local_variables))
+        self.scopes[id(decl)] = self.declare(inner, scope, functions)
+        functions.append(decl)
+    return scope
+
+  def infer(self, node):
+    '''Tipo de node con los tipos conocidos hasta ahora de las que llama'''
+    try:
+      types = {self.expr(stmt.expression, self.scopes[id(node)]) for stmt in returns(node)
+               if stmt.expression is not None}
+    except RecursionError:
+      types = set()
+    if 'float' in types:
+      return 'float'
+    return 'int' if 'int' in types else None
+
+  def expr(self, node, scope):
+    if isinstance(node, (FloatNumber, FloatConversion)):
+      return 'float'
+    if isinstance(node, Binop):
+      types = (self.expr(node.left, scope), self.expr(node.right, scope))
+      return 'float' if 'float' in types else None if None in types else 'int'
+    if isinstance(node, UnaryOperation):
+      return self.expr(node.operand, scope)
+    if isinstance(node, (Identifier, ArrayLocation)):
+      return scope.lookup(node.name, 'variables')
+    if isinstance(node, Location):
+      return scope.lookup(node.identifier, 'variables')
+    if isinstance(node, FunctionCall):
+      callee = scope.lookup(node.identifier, 'functions')
+      return self.types.get(id(callee)) if callee is not None else None
+    return 'int'
+
+
+def return_types(program):
+  '''
+  Tipo de retorno de cada función de program (también las anidadas), por
+  id(FunDefinition): 'float' si algún return devuelve un float, 'int' si no,
+  y None si no devuelve ningún valor (o si solo devuelve llamadas
+  recursivas).  Se calcula antes de revisar o generar los cuerpos, así que
+  una llamada tiene tipo aunque la función esté más abajo en el fuente.
+  '''
+  return _ReturnTypes(program).types
@@ -0,0 +1,364 @@
+# vectorize.py
+'''
+Vectorización de bucles sobre arreglos
+======================================
+Reconoce en el AST bucles contados cuyo cuerpo opera elemento a elemento
+sobre arreglos, como la copia de merge en test3/mergesort.pl0:
+
+    while i < nitems do begin
+        nums[p + i] := temp[i];
+        i := i + 1
+    end
+
+El intérprete de clausuras (interp.py) ejecuta esos bucles como una
+operación de NumPy por sentencia sobre la vista de arrays.view(), sin
+copiar los arreglos.  Un bucle se reconoce si:
+
+  - la condición es i < límite o i <= límite, con i entera y el límite sin
+    accesos a arreglos ni llamadas
+  - la última sentencia del cuerpo es i := i + 1 y las demás son
+    asignaciones a elementos de arreglos o write(...)
+  - los índices son afines en i (c * i + e, e sin i) y las expresiones solo
+    usan +, -, *, signo, int(), float(), constantes, i, variables que el
+    cuerpo no asigna y elementos de arreglos
+
+En ejecución VectorLoop.run() además exige que los índices estén dentro de
+los arreglos, que un arreglo escrito solo se lea o escriba con el mismo
+índice (también cuando dos parámetros son el mismo arreglo) y que ningún
+valor entero pase de 64 bits: las cotas se propagan desde el máximo de cada
+tramo leído.  Si algo falla se devuelve False antes de modificar nada y el
+bucle corre de a un elemento como siempre, con los mismos errores.
+
+Sin NumPy no se vectoriza nada.
+'''
+from modelo import *
+from arrays import numpy, view
+
+VECTOR_MIN = 32             # Iteraciones mínimas para que convenga vectorizar
+
+_LIMIT = 2 ** 63
+
+
+class Fallback(Exception):
+    '''El bucle no se puede vectorizar en esta ejecución'''
+
+
+class Env:
+    '''Estado de una ejecución vectorial'''
+    def __init__(self, frame, start, count):
+        self.frame = frame
+        self.start = start
+        self.count = count
+        self.index = numpy.arange(start, start + count, dtype=numpy.int64)
+        self.bound = max(abs(start), abs(start + count))
+        self.pending = {}           # id(arreglo) -> (a, b, valores) escritos
+        self.reads = []             # (id(arreglo), a, b) de cada tramo leído
+
+
+def _variable(node):
+    return node.depth, node.slot
+
+
+def _assigned(stmt):
+    if isinstance(stmt, AssignmentStatement) and not isinstance(stmt.location, ArrayLocation):
+        return _variable(stmt.location)
+    return None
+
+
+def _uses(node, kinds):
+    '''True si node contiene algún nodo de las clases kinds'''
+    if isinstance(node, kinds):
+        return True
+    for name in getattr(node, '_fields', ()):
+        value = getattr(node, name)
+        items = value if isinstance(value, list) else [value]
+        if any(isinstance(item, Node) and _uses(item, kinds) for item in items):
+            return True
+    return False
+
+
+def _is_var(node, var):
+    return isinstance(node, (Identifier, Location)) and not isinstance(node, ArrayLocation) \
+        and _variable(node) == var
+
+
+class Matcher:
+    '''
+    Arma un VectorLoop para un While, compilando las partes escalares con el
+    Compiler de interp.py.  Devuelve None si el bucle no tiene la forma.
+    '''
+    def __init__(self, compiler):
+        self.compiler = compiler
+        self.var = None
+
+    def match(self, node):
+        test = node.relation
+        body = node.stmt.stmtlist if isinstance(node.stmt, BeginEndBlock) else [node.stmt]
+        body = [s for s in body if s is not None]
+        if not (isinstance(test, RelationalOperation) and test.operator in ('<', '<=')
+                and isinstance(test.left_operand, (Identifier, Location))
+                and not isinstance(test.left_operand, ArrayLocation)
+                and len(body) >= 2):
+            return None
+        self.var = _variable(test.left_operand)
+        if self.compiler.variable(test.left_operand)[2] != 'int':
+            return None
+
+        step = body[-1]
+        if not (_assigned(step) == self.var and isinstance(step.expression, Binop)
+                and step.expression.op == '+' and _is_var(step.expression.left, self.var)
+                and isinstance(step.expression.right, IntegerNumber)
+                and step.expression.right.value == 1):
+            return None
+        if _uses(test.right_operand, (ArrayLocation, FunctionCall)) or self.mentions(test.right_operand):
+            return None
+        limit, type = self.compiler.compile_expr(test.right_operand)
+        if type != 'int':
+            return None
+
+        stmts = []
+        try:
+            for stmt in body[:-1]:
+                if isinstance(stmt, AssignmentStatement) and isinstance(stmt.location, ArrayLocation):
+                    target = stmt.location
+                    array, atype = self.compiler.load(target)
+                    a, b = self.affine(target.index)
+                    value, vtype = self.expr(stmt.expression)
+                    if a == 0 or (atype == 'int' and vtype != 'int'):
+                        return None
+                    stmts.append(('store', array, a, b, value))
+                elif isinstance(stmt, WriteStatement):
+                    value, _ = self.expr(stmt.expression)
+                    stmts.append(('write', value))
+                else:
+                    return None
+        except Fallback:
+            return None
+        return VectorLoop(self.compiler, test.left_operand, limit, test.operator == '<=', stmts)
+
+    def mentions(self, node):
+        '''True si node lee la variable del bucle'''
+        if _is_var(node, self.var):
+            return True
+        for name in getattr(node, '_fields', ()):
+            value = getattr(node, name)
+            items = value if isinstance(value, list) else [value]
+            if any(isinstance(item, Node) and self.mentions(item) for item in items):
+                return True
+        return False
+
+    def invariant(self, node):
+        '''Clausura escalar de una expresión entera que no depende de i'''
+        if self.mentions(node) or _uses(node, (ArrayLocation, FunctionCall)):
+            raise Fallback()
+        value, type = self.compiler.compile_expr(node)
+        if type != 'int':
+            raise Fallback()
+        return value
+
+    def affine(self, node):
+        '''(a, b) de un índice a * i + b: a entero, b clausura invariante'''
+        if not self.mentions(node):
+            return 0, self.invariant(node)
+        if _is_var(node, self.var):
+            return 1, (lambda frame: 0)
+        if isinstance(node, Binop):
+            if node.op in ('+', '-'):
+                la, lb = self.affine(node.left)
+                ra, rb = self.affine(node.right)
+                if node.op == '+':
+                    return la + ra, (lambda frame: lb(frame) + rb(frame))
+                return la - ra, (lambda frame: lb(frame) - rb(frame))
+            if node.op == '*':
+                for const, other in ((node.left, node.right), (node.right, node.left)):
+                    if isinstance(const, IntegerNumber):
+                        a, b = self.affine(other)
+                        c = const.value
+                        return c * a, (lambda frame: c * b(frame))
+        if isinstance(node, UnaryOperation):
+            a, b = self.affine(node.operand)
+            if node.operator == '-':
+                return -a, (lambda frame: -b(frame))
+            return a, b
+        raise Fallback()
+
+    def expr(self, node):
+        '''
+        (evaluador, tipo).  El evaluador recibe un Env y devuelve (valor,
+        cota): valor es un escalar o un ndarray de env.count elementos y
+        cota el máximo valor absoluto si es entero (None si es float).
+        '''
+        if isinstance(node, (IntegerNumber, FloatNumber)):
+            value = node.value
+            bound = abs(value) if isinstance(node, IntegerNumber) else None
+            return (lambda env: (value, bound)), 'int' if bound is not None else 'float'
+
+        if _is_var(node, self.var):
+            return (lambda env: (env.index, env.bound)), 'int'
+
+        if isinstance(node, ArrayLocation):
+            array, type = self.compiler.load(node)
+            a, b = self.affine(node.index)
+
+            def element(env):
+                arr = array(env.frame)
+                start = b(env.frame)
+                env.reads.append((id(arr), a, start))
+                pending = env.pending.get(id(arr))
+                if pending is not None:
+                    if pending[:2] != (a, start):
+                        raise Fallback()
+                    values = pending[2]
+                else:
+                    values = _slice(arr, a, start, env)
+                if type != 'int':
+                    return values, None
+                return values, (max(abs(int(values.min())), abs(int(values.max())))
+                                if len(values) else 0)
+            return element, type
+
+        if isinstance(node, (Identifier, Location)):
+            load, type = self.compiler.load(node)
+            if type == 'int':
+                return (lambda env: (load(env.frame), abs(load(env.frame)))), type
+            if type == 'float':
+                return (lambda env: (load(env.frame), None)), type
+            raise Fallback()
+
+        if isinstance(node, Binop) and node.op in ('+', '-', '*'):
+            left, ltype = self.expr(node.left)
+            right, rtype = self.expr(node.right)
+            if 'float' in (ltype, rtype):
+                op = {'+': numpy.add, '-': numpy.subtract, '*': numpy.multiply}[node.op]
+                return (lambda env: (op(left(env)[0], right(env)[0]), None)), 'float'
+
+            def integer(env):
+                lvalue, lbound = left(env)
+                rvalue, rbound = right(env)
+                if node.op == '*':
+                    bound = lbound * rbound
+                else:
+                    bound = lbound + rbound
+                if bound >= _LIMIT:
+                    raise Fallback()
+                if node.op == '+':
+                    return numpy.add(lvalue, rvalue, dtype=numpy.int64), bound
+                if node.op == '-':
+                    return numpy.subtract(lvalue, rvalue, dtype=numpy.int64), bound
+                return numpy.multiply(lvalue, rvalue, dtype=numpy.int64), bound
+            return integer, 'int'
+
+        if isinstance(node, UnaryOperation) and node.operator in ('-', '+'):
+            operand, type = self.expr(node.operand)
+            if node.operator == '+':
+                return operand, type
+
+            def negate(env):
+                value, bound = operand(env)
+                return numpy.negative(value), bound
+            return negate, type
+
+        if isinstance(node, FloatConversion):
+            operand, _ = self.expr(node.expression)
+            return (lambda env: (numpy.asarray(operand(env)[0], dtype=numpy.float64), None)), 'float'
+
+        if isinstance(node, IntConversion):
+            operand, type = self.expr(node.expression)
+            if type == 'int':
+                return operand, type
+
+            def truncate(env):
+                value = numpy.asarray(operand(env)[0])
+                if value.size == 0:
+                    return value.astype(numpy.int64), 0
+                if not numpy.isfinite(value).all():
+                    raise Fallback()
+                bound = int(numpy.abs(value).max())
+                if bound >= _LIMIT // 2:
+                    raise Fallback()
+                return numpy.trunc(value).astype(numpy.int64), bound
+            return truncate, 'int'
+
+        raise Fallback()
+
+
+def _slice(arr, a, start, env):
+    '''Vista de los elementos arr[a * i + start] para los i del bucle'''
+    if not hasattr(arr, 'typecode'):
+        raise Fallback()
+    first = a * env.start + start
+    last = a * (env.start + env.count - 1) + start
+    if min(first, last) < 0 or max(first, last) >= len(arr):
+        raise Fallback()
+    if a == 0:
+        # Índice que no depende de i: el mismo elemento en cada iteración
+        return numpy.broadcast_to(view(arr)[first:first + 1], env.count)
+    stop = last + (1 if a > 0 else -1)
+    return view(arr)[first:stop if stop >= 0 else None:a]
+
+
+class VectorLoop:
+    '''Bucle reconocido por Matcher, con la variable i ya resuelta'''
+    def __init__(self, compiler, var, limit, inclusive, stmts):
+        self.load, _ = compiler.load(var)
+        self.hops, self.slot, _ = compiler.variable(var)
+        self.limit = limit
+        self.inclusive = inclusive
+        self.stmts = stmts
+
+    def run(self, frame, write):
+        '''
+        Ejecuta el bucle y devuelve True, o False sin efectos si hay que
+        ejecutarlo de a un elemento.  write escribe en la salida.
+        '''
+        start = self.load(frame)
+        stop = self.limit(frame) + (1 if self.inclusive else 0)
+        if type(start) is not int or type(stop) is not int or stop - start < VECTOR_MIN:
+            return False
+        env = Env(frame, start, stop - start)
+        stores = []
+        writes = []
+        try:
+            for stmt in self.stmts:
+                if stmt[0] == 'write':
+                    values = stmt[1](env)[0]
+                    writes.append(numpy.broadcast_to(values, env.count).tolist())
+                    continue
+                _, array, a, b, value = stmt
+                arr = array(frame)
+                first = b(frame)
+                target = _slice(arr, a, first, env)
+                previous = env.pending.get(id(arr))
+                if previous is not None and previous[:2] != (a, first):
+                    raise Fallback()
+                # Copia: el valor puede ser una vista de otro arreglo que una
+                # sentencia posterior escribe antes de que se aplique esta
+                values = numpy.array(numpy.broadcast_to(value(env)[0], env.count), copy=True)
+                if target.dtype == numpy.int64 and values.dtype != numpy.int64:
+                    raise Fallback()
+                env.pending[id(arr)] = (a, first, values)
+                stores.append((target, values))
+            # Un arreglo escrito solo se lee con el índice con que se escribe:
+            # si no, alguna iteración leería lo que escribió otra
+            for key, a, first in env.reads:
+                if key in env.pending and env.pending[key][:2] != (a, first):
+                    raise Fallback()
+        except (Fallback, OverflowError):
+            return False
+
+        for target, values in stores:
+            target[:] = values
+        if writes:
+            write(''.join(str(v) for row in zip(*writes) for v in row))
+        outer = frame
+        for _ in range(self.hops):
+            outer = outer[0]
+        outer[self.slot] = stop
+        return True
+
+
+def match(node, compiler):
+    '''VectorLoop para el While node, o None (también sin NumPy)'''
+    if numpy is None:
+        return None
+    return Matcher(compiler).match(node)
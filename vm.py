@@ -0,0 +1,565 @@
+# vm.py
+'''
+Máquina virtual de bytecode para PL0
+====================================
+Baja el código intermedio de intcode.IntermediateCodeGenerator a un bytecode
+compacto y lo ejecuta.
+
+Formato
+-------
+Cada función se convierte en un BytecodeFunction.  Su código es un
+array('i') con instrucciones de ancho fijo [op, a, b, c]; los operandos son
+índices de casillas (slots) del marco de la función, no nombres.
+
+El marco de activación es una lista de Python:
+
+  slot 0            enlace estático (marco de la función que la contiene)
+  slots 1..n        parámetros
+  siguientes        variables locales, registros temporales y constantes
+
+Las constantes se precargan en una plantilla (template) que se copia al crear
+cada marco, de modo que toda instrucción trabaja solo con casillas.  Los
+arreglos locales se crean en cada llamada; los arreglos pasados como argumento
+se comparten por referencia.
+
+Las variables de una función que contiene a otra (p.ej. nums de mrgsort usada
+dentro de merge) se leen y escriben con UPLOAD/UPSTORE siguiendo el enlace
+estático.
+
+Las llamadas no usan la pila de Python: CALL guarda (función, marco, pc) en
+una pila explícita y RET la desapila, así que la profundidad de recursión de
+un programa PL0 solo está limitada por la memoria.  Un CALL seguido de un
+RETURN de su resultado (return f(...)) se baja a TAILCALL, que reemplaza el
+marco actual en lugar de apilar uno nuevo; el RET que sigue solo se ejecuta
+si el resultado sale del caché de memoización (effects.py).
+'''
+from array import array
+import re
+import sys
+
+from intcode import IntermediateCodeGenerator
+from cleanup import cleanup_program
+from inline import inline_program
+from loops import optimize_program as optimize_loops
+from regalloc import allocate_program
+from effects import Memo, MISSING, memoizable, report
+from arrays import prototype, nonnegative, checked
+
+# Opcodes
+(MOV, ADD, SUB, MUL, IDIV, FDIV, NEG,
+ LT, LE, GT, GE, EQ, NE, AND, OR, NOT,
+ ITOF, FTOI, ALOAD, ASTORE,
+ JMP, JT, JF, CALL, RET,
+ READI, READF, WRITE, PRINT,
+ UPLOAD, UPSTORE, TAILCALL, ALOADC, ASTOREC) = range(34)
+
+opnames = ['MOV', 'ADD', 'SUB', 'MUL', 'IDIV', 'FDIV', 'NEG',
+           'LT', 'LE', 'GT', 'GE', 'EQ', 'NE', 'AND', 'OR', 'NOT',
+           'ITOF', 'FTOI', 'ALOAD', 'ASTORE',
+           'JMP', 'JT', 'JF', 'CALL', 'RET',
+           'READI', 'READF', 'WRITE', 'PRINT',
+           'UPLOAD', 'UPSTORE', 'TAILCALL', 'ALOADC', 'ASTOREC']
+
+# Traducción directa de las instrucciones de tres direcciones del IR
+_ir_ops = {
+    'MOVI': MOV, 'MOVF': MOV,
+    'ADDI': ADD, 'ADDF': ADD,
+    'SUBI': SUB, 'SUBF': SUB,
+    'MULI': MUL, 'MULF': MUL,
+    'DIVI': IDIV, 'DIVF': FDIV,
+    'NEGI': NEG, 'NEGF': NEG,
+    'LT': LT, 'LTE': LE, 'GT': GT, 'GTE': GE, 'EQ': EQ, 'NEQ': NE,
+    'AND': AND, 'OR': OR, 'NOT': NOT,
+    'ITOF': ITOF, 'FTOI': FTOI,
+}
+
+WIDTH = 4
+
+_escapes = {'n': '\n', 't': '\t', 'r': '\r', '"': '"', '\\': '\\'}
+
+
+def unescape(s):
+    return re.sub(r'\\(.)', lambda m: _escapes.get(m.group(1), m.group(0)), s)
+
+
+class VMError(Exception):
+    pass
+
+
+class BytecodeFunction:
+    def __init__(self, name, level, nparams):
+        self.name = name
+        self.level = level          # Profundidad de anidamiento (0 = nivel superior)
+        self.nparams = nparams
+        self.code = array('i')
+        self.template = [None]      # Valores iniciales del marco (slot 0 = enlace estático)
+        self.arrays = []            # (slot, prototipo en cero) de los arreglos locales
+        self.calls = []             # (función, saltos de enlace estático, slots de argumentos)
+        self.strings = []
+        self.slotnames = ['<link>']
+
+    @property
+    def nslots(self):
+        return len(self.template)
+
+    def __repr__(self):
+        return f'BytecodeFunction({self.name}, {len(self.code) // WIDTH} instrucciones)'
+
+
+# ---------------------------------------------------------------------
+#  Traducción IR -> bytecode
+# ---------------------------------------------------------------------
+
+class Lowering:
+    '''
+    Convierte un IRFunction en su BytecodeFunction
+    '''
+    def __init__(self, irfunc, functions, compiled):
+        self.ir = irfunc
+        self.functions = functions          # nombre -> IRFunction
+        self.compiled = compiled            # nombre -> BytecodeFunction
+        self.func = compiled[irfunc.name]
+        self.slots = {}
+        self.consts = {}
+        self.upslots = {}
+        self.labels = {}
+        self.fixups = []
+        self.safe = nonnegative(irfunc, functions)      # Índices que no hay que verificar
+
+        for var in irfunc.params:
+            self.new_slot(var.name)
+        for var in irfunc.locals:
+            slot = self.new_slot(var.name)
+            if var.size is not None:
+                self.func.arrays.append((slot, prototype(var.type, var.size)))
+            else:
+                self.func.template[slot] = 0.0 if var.type == 'float' else 0
+
+    def new_slot(self, name, value=None):
+        slot = len(self.func.template)
+        self.func.template.append(value)
+        self.func.slotnames.append(str(name))
+        self.slots[name] = slot
+        return slot
+
+    def const(self, value):
+        key = (type(value), value)
+        if key not in self.consts:
+            slot = len(self.func.template)
+            self.func.template.append(value)
+            self.func.slotnames.append(repr(value))
+            self.consts[key] = slot
+        return self.consts[key]
+
+    def scratch(self, name):
+        '''
+        Slot local donde se copia una variable no local mientras se usa
+        '''
+        if name not in self.upslots:
+            slot = len(self.func.template)
+            self.func.template.append(None)
+            self.func.slotnames.append(f'^{name}')
+            self.upslots[name] = slot
+        return self.upslots[name]
+
+    def nonlocal_var(self, name):
+        '''
+        Busca name en las funciones que contienen a esta.  Devuelve
+        (saltos, slot) o None si no es una variable visible.
+        '''
+        depth = 0
+        func = self.ir
+        while func is not None:
+            if func.lookup(name) is not None:
+                if depth == 0:
+                    return None
+                outer = self.compiled[func.name]
+                return depth, outer_slot(outer, name)
+            func = self.functions.get(func.parent)
+            depth += 1
+        return None
+
+    def emit(self, op, a=0, b=0, c=0):
+        self.func.code.extend((op, a, b, c))
+
+    def read(self, operand):
+        '''
+        Slot desde el que se lee operand (emitiendo un UPLOAD si es no local)
+        '''
+        if isinstance(operand, (int, float)):
+            return self.const(operand)
+        if operand in self.slots:
+            return self.slots[operand]
+        up = self.nonlocal_var(operand)
+        if up is not None:
+            slot = self.scratch(operand)
+            self.emit(UPLOAD, up[0], up[1], slot)
+            return slot
+        # Registro temporal
+        return self.new_slot(operand)
+
+    def write(self, operand):
+        '''
+        Slot en el que se escribe operand y, si es no local, la función que
+        emite el UPSTORE correspondiente después de la instrucción.
+        '''
+        if operand in self.slots:
+            return self.slots[operand], None
+        up = self.nonlocal_var(operand)
+        if up is not None:
+            slot = self.scratch(operand)
+            return slot, lambda: self.emit(UPSTORE, slot, up[0], up[1])
+        return self.new_slot(operand), None
+
+    def target(self, label):
+        self.fixups.append((len(self.func.code) + 1, label))
+        return 0
+
+    def lower(self):
+        code = self.ir.code
+        for n, instr in enumerate(code):
+            opcode, args = instr.op, instr.args
+            nxt = code[n + 1] if n + 1 < len(code) else None
+            fallthrough = nxt.args[0] if nxt is not None and nxt.op == 'LABEL' else None
+
+            if opcode == 'LABEL':
+                self.labels[args[0]] = len(self.func.code) // WIDTH
+
+            elif opcode == 'GOTO':
+                self.emit(JMP, self.target(args[0]))
+
+            elif opcode == 'CBRANCH':
+                test = self.read(args[0])
+                if fallthrough == args[1]:
+                    self.fixups.append((len(self.func.code) + 2, args[2]))
+                    self.emit(JF, test, 0)
+                elif fallthrough == args[2]:
+                    self.fixups.append((len(self.func.code) + 2, args[1]))
+                    self.emit(JT, test, 0)
+                else:
+                    self.fixups.append((len(self.func.code) + 2, args[2]))
+                    self.emit(JF, test, 0)
+                    self.emit(JMP, self.target(args[1]))
+
+            elif opcode in ('ALOADI', 'ALOADF'):
+                arr = self.read(args[0])
+                index = self.read(args[1])
+                dst, after = self.write(args[2])
+                self.emit(ALOADC if checked(args[1], self.safe) else ALOAD, arr, index, dst)
+                if after:
+                    after()
+
+            elif opcode in ('ASTOREI', 'ASTOREF'):
+                value = self.read(args[0])
+                arr = self.read(args[1])
+                index = self.read(args[2])
+                self.emit(ASTOREC if checked(args[2], self.safe) else ASTORE, value, arr, index)
+
+            elif opcode == 'CALL':
+                callee = self.compiled[args[0]]
+                argslots = tuple(self.read(arg) for arg in args[1])
+                hops = self.func.level - callee.level + 1
+                self.func.calls.append((callee, hops, argslots))
+                dst, after = self.write(args[2])
+                if nxt is not None and nxt.op == 'RETURN' and nxt.args[0] == args[2] and not after:
+                    # return f(...): el marco de esta función ya no se necesita
+                    self.emit(TAILCALL, len(self.func.calls) - 1, 0, dst)
+                else:
+                    self.emit(CALL, len(self.func.calls) - 1, 0, dst)
+                if after:
+                    after()
+
+            elif opcode == 'RETURN':
+                self.emit(RET, self.read(args[0]))
+
+            elif opcode in ('READI', 'READF'):
+                dst, after = self.write(args[0])
+                self.emit(READI if opcode == 'READI' else READF, dst)
+                if after:
+                    after()
+
+            elif opcode == 'WRITE':
+                self.emit(WRITE, self.read(args[0]))
+
+            elif opcode == 'PRINT':
+                self.func.strings.append(unescape(args[0]))
+                self.emit(PRINT, len(self.func.strings) - 1)
+
+            elif opcode in _ir_ops:
+                srcs = [self.read(op) for op in args[:-1]]
+                dst, after = self.write(args[-1])
+                a, b = (srcs + [0])[:2]
+                self.emit(_ir_ops[opcode], a, b, dst)
+                if after:
+                    after()
+
+            else:
+                raise VMError(f'Instrucción IR no soportada: {instr}')
+
+        # Retorno implícito al final de la función
+        self.emit(RET, self.const(0))
+
+        for pos, label in self.fixups:
+            self.func.code[pos] = self.labels[label] * WIDTH
+        return self.func
+
+
+def outer_slot(func, name):
+    return func.slotnames.index(name)
+
+
+def nesting_level(irfunc, functions):
+    level = 0
+    while irfunc.parent is not None:
+        irfunc = functions[irfunc.parent]
+        level += 1
+    return level
+
+
+def compile_program(functions):
+    '''
+    Baja todas las funciones (dict nombre -> IRFunction) a bytecode
+    '''
+    compiled = {name: BytecodeFunction(name, nesting_level(f, functions), len(f.params))
+                for name, f in functions.items()}
+    # Las funciones externas primero, para que sus slots existan al resolver
+    # los accesos no locales de las anidadas.
+    for name in sorted(functions, key=lambda n: compiled[n].level):
+        Lowering(functions[name], functions, compiled).lower()
+    return compiled
+
+
+def compile_ast(ast, optimize=False):
+    gen = IntermediateCodeGenerator()
+    gen.generate_code(ast)
+    if optimize:
+        cleanup_program(gen.functions)
+        inline_program(gen.functions)
+        cleanup_program(gen.functions)
+        optimize_loops(gen.functions)
+        cleanup_program(gen.functions)
+        allocate_program(gen.functions)
+    return compile_program(gen.functions)
+
+
+def disassemble(func):
+    lines = [f'{func.name}:']
+    code = func.code
+    for pc in range(0, len(code), WIDTH):
+        op, a, b, c = code[pc:pc + WIDTH]
+        lines.append(f'  {pc // WIDTH:4d}  {opnames[op]:<8s} {a:4d} {b:4d} {c:4d}')
+    return '\n'.join(lines)
+
+
+# ---------------------------------------------------------------------
+#  Intérprete
+# ---------------------------------------------------------------------
+
+class VM:
+    def __init__(self, context=None, stdin=None, stdout=None):
+        self.context = context
+        self.stdin = stdin or sys.stdin
+        self.stdout = stdout or sys.stdout
+        self.memo = {}              # BytecodeFunction -> effects.Memo
+
+    def interpret(self, ast):
+        optimize = getattr(self.context, 'optimize', False)
+        program = compile_ast(ast, optimize)
+        size = getattr(self.context, 'memo', 0)
+        if not size:
+            return self.run(program)
+        self.memo = {program[name]: Memo(name, size) for name in memoizable(ast) if name in program}
+        try:
+            return self.run(program)
+        finally:
+            if self.memo:
+                report(self.memo.values())
+
+    def run(self, program, entry='main'):
+        try:
+            if entry not in program:
+                raise VMError(f"No se encontró la función '{entry}'")
+            func = program[entry]
+            return self.execute(func, self.frame(func, None, ()))
+        except VMError as e:
+            if not self.context:
+                raise
+            self.context.error(str(e), 'runtime')
+        except (IndexError, ZeroDivisionError, ValueError, EOFError, OverflowError) as e:
+            if self.context:
+                self.context.error(str(e), 'runtime')
+            else:
+                raise VMError(str(e)) from e
+
+    def readline(self):
+        line = self.stdin.readline()
+        if not line:
+            raise EOFError('fin de la entrada en read()')
+        return line
+
+    def frame(self, func, link, args):
+        frame = func.template.copy()
+        frame[0] = link
+        frame[1:1 + len(args)] = args
+        for slot, proto in func.arrays:
+            frame[slot] = proto[:]
+        return frame
+
+    def execute(self, func, frame):
+        code = func.code
+        calls = func.calls
+        strings = func.strings
+        write = self.stdout.write
+        memo = self.memo
+        stack = []                  # (función, marco, pc del CALL, (Memo, clave) o None)
+        pc = 0
+        while True:
+            op = code[pc]
+            if op == MOV:
+                frame[code[pc+3]] = frame[code[pc+1]]
+            elif op == ADD:
+                frame[code[pc+3]] = frame[code[pc+1]] + frame[code[pc+2]]
+            elif op == SUB:
+                frame[code[pc+3]] = frame[code[pc+1]] - frame[code[pc+2]]
+            elif op == MUL:
+                frame[code[pc+3]] = frame[code[pc+1]] * frame[code[pc+2]]
+            elif op == JF:
+                if not frame[code[pc+1]]:
+                    pc = code[pc+2]
+                    continue
+            elif op == JMP:
+                pc = code[pc+1]
+                continue
+            elif op == LT:
+                frame[code[pc+3]] = frame[code[pc+1]] < frame[code[pc+2]]
+            elif op == LE:
+                frame[code[pc+3]] = frame[code[pc+1]] <= frame[code[pc+2]]
+            elif op == GT:
+                frame[code[pc+3]] = frame[code[pc+1]] > frame[code[pc+2]]
+            elif op == GE:
+                frame[code[pc+3]] = frame[code[pc+1]] >= frame[code[pc+2]]
+            elif op == EQ:
+                frame[code[pc+3]] = frame[code[pc+1]] == frame[code[pc+2]]
+            elif op == NE:
+                frame[code[pc+3]] = frame[code[pc+1]] != frame[code[pc+2]]
+            elif op == ALOAD:
+                frame[code[pc+3]] = frame[code[pc+1]][frame[code[pc+2]]]
+            elif op == ASTORE:
+                frame[code[pc+2]][frame[code[pc+3]]] = frame[code[pc+1]]
+            elif op == ALOADC:
+                index = frame[code[pc+2]]
+                if index < 0:
+                    raise IndexError('array index out of range')
+                frame[code[pc+3]] = frame[code[pc+1]][index]
+            elif op == ASTOREC:
+                index = frame[code[pc+3]]
+                if index < 0:
+                    raise IndexError('array index out of range')
+                frame[code[pc+2]][index] = frame[code[pc+1]]
+            elif op == JT:
+                if frame[code[pc+1]]:
+                    pc = code[pc+2]
+                    continue
+            elif op == CALL or op == TAILCALL:
+                callee, hops, argslots = calls[code[pc+1]]
+                args = [frame[s] for s in argslots]
+                pending = None
+                if memo and callee in memo:
+                    cache = memo[callee]
+                    key = cache.key(args)
+                    value = cache.get(key)
+                    if value is not MISSING:
+                        frame[code[pc+3]] = value
+                        pc += WIDTH
+                        continue
+                    # Un TAILCALL que hay que guardar pasa a ser un CALL
+                    pending = (cache, key)
+                link = frame
+                if callee.level == 0:
+                    link = None
+                else:
+                    for _ in range(hops):
+                        link = link[0]
+                if op == CALL or pending:
+                    stack.append((func, frame, pc, pending))
+                func = callee
+                frame = self.frame(callee, link, args)
+                code, calls, strings = func.code, func.calls, func.strings
+                pc = 0
+                continue
+            elif op == RET:
+                value = frame[code[pc+1]]
+                if not stack:
+                    return value
+                func, frame, pc, pending = stack.pop()
+                if pending:
+                    pending[0].put(pending[1], value)
+                code, calls, strings = func.code, func.calls, func.strings
+                frame[code[pc+3]] = value
+            elif op == IDIV:
+                x = frame[code[pc+1]]
+                y = frame[code[pc+2]]
+                q = x // y
+                if q < 0 and q * y != x:
+                    q += 1          # PL0 trunca hacia cero
+                frame[code[pc+3]] = q
+            elif op == FDIV:
+                frame[code[pc+3]] = frame[code[pc+1]] / frame[code[pc+2]]
+            elif op == NEG:
+                frame[code[pc+3]] = -frame[code[pc+1]]
+            elif op == AND:
+                frame[code[pc+3]] = bool(frame[code[pc+1]]) and bool(frame[code[pc+2]])
+            elif op == OR:
+                frame[code[pc+3]] = bool(frame[code[pc+1]]) or bool(frame[code[pc+2]])
+            elif op == NOT:
+                frame[code[pc+3]] = not frame[code[pc+1]]
+            elif op == ITOF:
+                frame[code[pc+3]] = float(frame[code[pc+1]])
+            elif op == FTOI:
+                frame[code[pc+3]] = int(frame[code[pc+1]])
+            elif op == UPLOAD:
+                link = frame
+                for _ in range(code[pc+1]):
+                    link = link[0]
+                frame[code[pc+3]] = link[code[pc+2]]
+            elif op == UPSTORE:
+                link = frame
+                for _ in range(code[pc+2]):
+                    link = link[0]
+                link[code[pc+3]] = frame[code[pc+1]]
+            elif op == READI:
+                frame[code[pc+1]] = int(self.readline())
+            elif op == READF:
+                frame[code[pc+1]] = float(self.readline())
+            elif op == WRITE:
+                value = frame[code[pc+1]]
+                write(str(int(value) if type(value) is bool else value))
+            elif op == PRINT:
+                write(strings[code[pc+1]])
+            else:
+                raise VMError(f'Opcode desconocido {op} en {func.name}')
+            pc += WIDTH
+
+
+def main(argv):
+    if len(argv) not in (2, 3) or (len(argv) == 3 and argv[2] != '--dis'):
+        print(f"Usage: python {argv[0]} filename [--dis]")
+        exit(1)
+
+    from plex import Lexer
+    from pparser import Parser
+
+    with open(argv[1], encoding='utf-8') as file:
+        text = file.read()
+
+    ast = Parser().parse(Lexer().tokenize(text))
+    program = compile_ast(ast)
+    if len(argv) == 3:
+        for func in program.values():
+            print(disassemble(func))
+        return
+    VM().run(program)
+
+
+if __name__ == '__main__':
+    main(sys.argv)